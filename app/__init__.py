@@ -6,6 +6,21 @@ from .config import Config
 from .extensions import db, migrate, jwt, login_manager, mail, cors, limiter, scheduler
 from .security import add_security_headers
 from .tasks import schedule_jobs
+from . import memo, metrics, pubsub, ratelimit, taskqueue, unread
+from .passwords import hasher as password_hasher
+from .ai.planner import planner as ai_planner
+from .ai.service import ai
+from .extraction.pool import pool as extraction_pool
+from .previews.cache import cache as preview_cache
+from .reminders.dispatcher import dispatcher as reminder_dispatcher
+from .resources import search as resource_search
+from .resources import importer as resource_importer
+from .resources import storage as resource_storage
+from .resources.access import tracker as access_tracker
+from .resources.embeddings import index as resource_embeddings
+from .resources.links import fetcher as link_fetcher
+from .sync import changes as sync_changes
+from .tags import index as tag_index
 
 
 def create_app() -> Flask:
@@ -24,13 +39,33 @@ def create_app() -> Flask:
     login_manager.init_app(app)
     mail.init_app(app)
     cors.init_app(app, resources={r"/api/*": {"origins": app.config.get("CORS_ORIGINS", "*")}})
+    ratelimit.configure(app)
     limiter.init_app(app)
     if app.config.get("RATELIMIT_DEFAULT"):
         limiter.default_limits = [app.config["RATELIMIT_DEFAULT"]]
 
+    reminder_dispatcher.init_app(app)
     if not scheduler.running:
         scheduler.start()
-    schedule_jobs()
+    schedule_jobs(app)
+    taskqueue.init_app(app)
+    metrics.init_app(app, db=db, limiter=limiter)
+    password_hasher.init_app(app)
+    memo.init_app(app)
+    pubsub.init_app(app)
+    unread.init_app(app)
+    sync_changes.init_app(app)
+    resource_search.init_app(app)
+    tag_index.init_app(app)
+    extraction_pool.init_app(app)
+    preview_cache.init_app(app)
+    resource_storage.init_app(app)
+    access_tracker.init_app(app)
+    resource_importer.init_app(app)
+    link_fetcher.init_app(app)
+    resource_embeddings.init_app(app)
+    ai.init_app(app)
+    ai_planner.init_app(app)
 
     from .auth.routes import bp as auth_bp
     from .goals.routes import bp as goals_bp
@@ -38,6 +73,8 @@ def create_app() -> Flask:
     from .analytics.routes import bp as analytics_bp
     from .reminders.routes import bp as reminders_bp
     from .reports.routes import bp as reports_bp
+    from .sync.routes import bp as sync_bp
+    from .tags.routes import bp as tags_bp
 
     app.register_blueprint(auth_bp, url_prefix="/api/v1/auth")
     app.register_blueprint(goals_bp, url_prefix="/api/v1/goals")
@@ -45,6 +82,8 @@ def create_app() -> Flask:
     app.register_blueprint(analytics_bp, url_prefix="/api/v1/analytics")
     app.register_blueprint(reminders_bp, url_prefix="/api/v1/reminders")
     app.register_blueprint(reports_bp, url_prefix="/api/v1/reports")
+    app.register_blueprint(sync_bp, url_prefix="/api/v1/sync")
+    app.register_blueprint(tags_bp, url_prefix="/api/v1/tags")
 
     @app.after_request
     def _set_headers(response):
@@ -57,6 +96,7 @@ def create_app() -> Flask:
 
     @app.errorhandler(429)
     def ratelimit_handler(e):
+        metrics.record_ratelimit_rejection()
         return jsonify({"message": "Too many requests"}), 429
 
     return app
\ No newline at end of file
@@ -0,0 +1,219 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models import Achievement, Goal, Milestone, Notification, ProgressLog, UserCounters
+
+
+# Domain events fed to the engine
+GOAL_COMPLETED = "goal_completed"
+GOAL_REOPENED = "goal_reopened"
+GOAL_DELETED = "goal_deleted"
+MILESTONE_COMPLETED = "milestone_completed"
+MILESTONE_REOPENED = "milestone_reopened"
+MILESTONE_DELETED = "milestone_deleted"
+PROGRESS_LOGGED = "progress_logged"
+
+
+@dataclass(frozen=True)
+class AchievementRule:
+    achievement_type: str
+    counter: str
+    threshold: int
+    title: str
+    message: str
+    badge_icon: Optional[str] = None
+
+
+RULES: List[AchievementRule] = [
+    AchievementRule(
+        "first_goal", "goals_completed", 1,
+        "🎯 First Goal Complete!",
+        "Congratulations on completing your first learning goal! This is just the beginning of your journey.",
+        "target",
+    ),
+    AchievementRule(
+        "goal_master", "goals_completed", 5,
+        "🏆 Goal Master!",
+        "Amazing! You've completed 5 learning goals. You're becoming a learning champion!",
+        "trophy",
+    ),
+    AchievementRule(
+        "learning_champion", "goals_completed", 10,
+        "🌟 Learning Champion!",
+        "Incredible! You've completed 10 learning goals. Your dedication is truly inspiring!",
+        "star",
+    ),
+    AchievementRule(
+        "week_streak", "current_streak", 7,
+        "🔥 Week Streak!",
+        "You've maintained a 7-day learning streak! Consistency is the key to success.",
+        "flame",
+    ),
+    AchievementRule(
+        "month_streak", "current_streak", 30,
+        "💪 Month Streak!",
+        "Outstanding! You've maintained a 30-day learning streak. You're unstoppable!",
+        "muscle",
+    ),
+    AchievementRule(
+        "century_streak", "current_streak", 100,
+        "🏅 Century Streak!",
+        "Legendary! 100 days of continuous learning. You're an inspiration to others!",
+        "medal",
+    ),
+]
+
+RULES_BY_COUNTER: Dict[str, List[AchievementRule]] = {}
+for _rule in RULES:
+    RULES_BY_COUNTER.setdefault(_rule.counter, []).append(_rule)
+
+
+def register_rule(rule: AchievementRule) -> None:
+    """Add a rule to the registry"""
+    RULES.append(rule)
+    RULES_BY_COUNTER.setdefault(rule.counter, []).append(rule)
+
+
+def rebuild_counters(user_id: int) -> UserCounters:
+    """Recompute a user's counters from their full history"""
+    return _recount(get_counters(user_id), user_id)
+
+
+def _recount(counters: UserCounters, user_id: int) -> UserCounters:
+    counters.goals_completed = db.session.scalar(
+        db.select(func.count(Goal.id)).where(Goal.user_id == user_id, Goal.is_completed == True)
+    ) or 0
+    counters.milestones_completed = db.session.scalar(
+        db.select(func.count(Milestone.id)).where(Milestone.user_id == user_id, Milestone.is_completed == True)
+    ) or 0
+    log_count, minutes = db.session.execute(
+        db.select(func.count(ProgressLog.id), func.coalesce(func.sum(ProgressLog.minutes), 0))
+        .where(ProgressLog.user_id == user_id)
+    ).one()
+    counters.progress_logs = log_count or 0
+    counters.minutes_total = minutes or 0
+
+    days = sorted({d if isinstance(d, date) else date.fromisoformat(d) for d in db.session.scalars(
+        db.select(func.date(ProgressLog.created_at)).where(ProgressLog.user_id == user_id).distinct()
+    )})
+    counters.current_streak = 0
+    counters.longest_streak = 0
+    counters.last_activity_date = None
+    for day in days:
+        _advance_streak(counters, day)
+    return counters
+
+
+def get_counters(user_id: int) -> UserCounters:
+    """Load a user's counters, building them on first use"""
+    counters = db.session.get(UserCounters, user_id, with_for_update=True)
+    if counters is not None:
+        return counters
+    # Build from committed history only; the pending change that raised
+    # the event is applied by record_event itself.
+    with db.session.no_autoflush:
+        counters = _recount(UserCounters(user_id=user_id), user_id)
+    try:
+        with db.session.begin_nested():
+            db.session.add(counters)
+            _award(user_id, _satisfied(counters))
+    except IntegrityError:
+        # A concurrent first request built them; use that row
+        return db.session.get(UserCounters, user_id, with_for_update=True)
+    return counters
+
+
+def _satisfied(counters: UserCounters) -> List[AchievementRule]:
+    return [r for r in RULES if getattr(counters, r.counter) >= r.threshold]
+
+
+def _advance_streak(counters: UserCounters, day: date) -> None:
+    last = counters.last_activity_date
+    if last is not None and day <= last:
+        return
+    if last is not None and day - last == timedelta(days=1):
+        counters.current_streak += 1
+    else:
+        counters.current_streak = 1
+    counters.last_activity_date = day
+    counters.longest_streak = max(counters.longest_streak, counters.current_streak)
+
+
+def record_event(user_id: int, event: str, minutes: int = 0, occurred_at: Optional[datetime] = None) -> List[Achievement]:
+    """Apply a domain event to the user's counters and award any rules it unlocks.
+
+    Runs inside the caller's transaction so counters stay consistent with
+    the change that produced the event; the caller commits.
+    """
+    counters = get_counters(user_id)
+    before = {rule.counter: getattr(counters, rule.counter) for rule in RULES}
+
+    if event == GOAL_COMPLETED:
+        counters.goals_completed += 1
+    elif event in (GOAL_REOPENED, GOAL_DELETED):
+        counters.goals_completed = max(counters.goals_completed - 1, 0)
+    elif event == MILESTONE_COMPLETED:
+        counters.milestones_completed += 1
+    elif event in (MILESTONE_REOPENED, MILESTONE_DELETED):
+        counters.milestones_completed = max(counters.milestones_completed - 1, 0)
+    elif event == PROGRESS_LOGGED:
+        counters.progress_logs += 1
+        counters.minutes_total += minutes
+        _advance_streak(counters, (occurred_at or datetime.utcnow()).date())
+    else:
+        raise ValueError(f"Unknown achievement event: {event}")
+
+    # Only rules whose threshold was crossed by this event can fire
+    crossed = []
+    for counter, old_value in before.items():
+        new_value = getattr(counters, counter)
+        if new_value <= old_value:
+            continue
+        crossed.extend(r for r in RULES_BY_COUNTER[counter] if old_value < r.threshold <= new_value)
+    return _award(user_id, crossed)
+
+
+def evaluate_all(user_id: int) -> List[Achievement]:
+    """Award every rule the user currently satisfies (used after a rebuild)"""
+    return _award(user_id, _satisfied(get_counters(user_id)))
+
+
+def _award(user_id: int, rules: Iterable[AchievementRule]) -> List[Achievement]:
+    rules = list(rules)
+    if not rules:
+        return []
+    already = set(db.session.scalars(
+        db.select(Achievement.achievement_type).where(
+            Achievement.user_id == user_id,
+            Achievement.achievement_type.in_([r.achievement_type for r in rules])
+        )
+    ))
+
+    awarded = []
+    for rule in rules:
+        if rule.achievement_type in already:
+            continue
+        achievement = Achievement(
+            user_id=user_id,
+            achievement_type=rule.achievement_type,
+            title=rule.title,
+            description=rule.message,
+            badge_icon=rule.badge_icon,
+        )
+        db.session.add(achievement)
+        db.session.add(Notification(
+            user_id=user_id,
+            title=rule.title,
+            message=rule.message,
+            notification_type="achievement",
+            metadata_json={"achievement_type": rule.achievement_type}
+        ))
+        awarded.append(achievement)
+        current_app.logger.info(f"Awarded achievement {rule.achievement_type} to user {user_id}")
+    return awarded
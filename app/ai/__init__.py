@@ -0,0 +1 @@
+# AI service layer: one Gemini client per process, or a local fake backend
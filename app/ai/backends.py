@@ -0,0 +1,102 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+
+@dataclass
+class Generation:
+    text: str
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    backend: str = ""
+    cached: bool = False
+
+
+class AIError(Exception):
+    pass
+
+
+class GeminiBackend:
+    """Holds one configured ``GenerativeModel``; safe to share between threads"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str, timeout: float = 60):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+        self.timeout = timeout
+
+    def generate(self, prompt: str, **options) -> Generation:
+        try:
+            response = self.model.generate_content(
+                prompt, generation_config=options or None, request_options={"timeout": self.timeout}
+            )
+            text = response.text
+        except Exception as e:
+            raise AIError(f"Gemini request failed: {e}") from e
+        usage = getattr(response, "usage_metadata", None)
+        return Generation(
+            text=text,
+            prompt_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", 0) or 0,
+            backend=self.name,
+        )
+
+    def stream(self, prompt: str, usage: dict, **options) -> Iterator[str]:
+        """Yield text chunks; token counts are written to ``usage`` at the end"""
+        try:
+            response = self.model.generate_content(
+                prompt, generation_config=options or None, stream=True, request_options={"timeout": self.timeout}
+            )
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise AIError(f"Gemini request failed: {e}") from e
+        metadata = getattr(response, "usage_metadata", None)
+        usage["prompt_tokens"] = getattr(metadata, "prompt_token_count", 0) or 0
+        usage["output_tokens"] = getattr(metadata, "candidates_token_count", 0) or 0
+
+
+def _count_tokens(text: str) -> int:
+    return len(text.split())
+
+
+class FakeBackend:
+    """Deterministic offline backend for tests and local development.
+
+    Answers come from ``responder(prompt)`` when one is set, otherwise a
+    canned reply derived from the prompt's hash; token counts are word counts.
+    """
+
+    name = "fake"
+
+    def __init__(self, responder: Optional[Callable[[str], str]] = None, delay: float = 0):
+        self.responder = responder
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _reply(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            threading.Event().wait(self.delay)
+        if self.responder is not None:
+            return self.responder(prompt)
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        return f"Fake response {digest} to: {' '.join(prompt.split()[:12])}"
+
+    def generate(self, prompt: str, **options) -> Generation:
+        text = self._reply(prompt)
+        return Generation(text, _count_tokens(prompt), _count_tokens(text), self.name)
+
+    def stream(self, prompt: str, usage: dict, **options) -> Iterator[str]:
+        text = self._reply(prompt)
+        for i, word in enumerate(text.split(" ")):
+            yield word if i == 0 else " " + word
+        usage["prompt_tokens"] = _count_tokens(prompt)
+        usage["output_tokens"] = _count_tokens(text)
@@ -2,10 +2,16 @@ from typing import Optional
 import google.generativeai as genai
 from flask import current_app
 
+from .backends import GeminiBackend
+from .service import AIUnavailable, ai
+
 
 def get_gemini_client() -> Optional[genai.GenerativeModel]:
-    api_key = current_app.config.get("GEMINI_API_KEY")
-    if not api_key:
+    """The process-wide Gemini model; configured once, not on every call"""
+    if not current_app.config.get("GEMINI_API_KEY"):
+        return None
+    try:
+        backend = ai.get_backend()
+    except AIUnavailable:
         return None
-    genai.configure(api_key=api_key)
-    return genai.GenerativeModel("gemini-1.5-pro")
\ No newline at end of file
+    return backend.model if isinstance(backend, GeminiBackend) else None
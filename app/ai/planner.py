@@ -0,0 +1,149 @@
+"""AI-generated study plans for goals.
+
+Generation runs on a small bounded executor. The request thread only
+relays chunks from a queue to the client as Server-Sent Events, gives up
+after ``AI_PLAN_TIMEOUT`` and cancels the generation as soon as the client
+disconnects, so an abandoned request stops consuming model tokens.
+"""
+import json
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import List, Optional
+
+from flask import Flask, current_app
+from marshmallow import ValidationError
+
+from ..extensions import db
+from ..models import Goal, Milestone
+from ..schemas import GoalPlanSchema
+from .backends import AIError
+from .service import ai
+
+
+class PlanError(Exception):
+    pass
+
+
+class PlanBusy(Exception):
+    pass
+
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+
+
+def build_prompt(goal: Goal, hours_per_week: Optional[float] = None, max_milestones: int = 12) -> str:
+    lines = [
+        "You are a study planner. Break the learning goal below into milestones and a weekly schedule.",
+        f"Goal: {goal.title}",
+        f"Category: {goal.category}",
+    ]
+    if goal.description:
+        lines.append(f"Description: {goal.description}")
+    if goal.estimated_hours:
+        lines.append(f"Estimated effort: {goal.estimated_hours} hours")
+    if goal.target_date:
+        lines.append(f"Today: {date.today().isoformat()}; target date: {goal.target_date.isoformat()}")
+    if hours_per_week:
+        lines.append(f"Available time: {hours_per_week:g} hours per week")
+    lines.append(
+        f"Reply with JSON only, no prose: {{\"milestones\": [{{\"title\", \"description\", \"week\", "
+        f"\"estimated_hours\"}}] (at most {max_milestones}, in order), \"schedule\": [{{\"week\", \"focus\", \"hours\"}}]}}"
+    )
+    return "\n".join(lines)
+
+
+def parse_plan(text: str) -> dict:
+    """Validate the model's JSON reply, tolerating code fences and surrounding prose"""
+    text = _FENCE_RE.sub("", text.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise PlanError("The model did not return a plan")
+    try:
+        return GoalPlanSchema().load(json.loads(text[start:end + 1]))
+    except (ValueError, ValidationError) as e:
+        raise PlanError(f"The model returned an invalid plan: {e}")
+
+
+def create_milestones(goal: Goal, plan: dict, max_milestones: int) -> List[int]:
+    """Append the plan's milestones to the goal in one bulk insert"""
+    last = db.session.scalar(
+        db.select(db.func.max(Milestone.order_index)).where(Milestone.goal_id == goal.id)
+    )
+    start = (last + 1) if last is not None else 0
+    rows = [
+        {
+            "user_id": goal.user_id,
+            "goal_id": goal.id,
+            "title": item["title"],
+            "description": item.get("description") or "",
+            "order_index": start + index,
+        }
+        for index, item in enumerate(plan["milestones"][:max_milestones])
+    ]
+    ids = db.session.scalars(db.insert(Milestone).returning(Milestone.id, sort_by_parameter_order=True), rows).all()
+    db.session.expire(goal, ["milestones"])
+    goal.progress = goal.calculate_progress()
+    db.session.commit()
+    return list(ids)
+
+
+class PlanGenerator:
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._admission = threading.BoundedSemaphore(8)
+        self.timeout = 120.0
+
+    def init_app(self, app: Flask) -> None:
+        workers = app.config.get("AI_PLAN_WORKERS", 4)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-plan")
+        # Running plus waiting jobs; beyond this new requests are turned away
+        self._admission = threading.BoundedSemaphore(workers + app.config.get("AI_PLAN_QUEUE", 4))
+        self.timeout = app.config.get("AI_PLAN_TIMEOUT", 120)
+        app.extensions["ai_planner"] = self
+
+    def start(self, prompt: str):
+        """Begin generating; returns ``(events queue, cancel event)``"""
+        if not self._admission.acquire(blocking=False):
+            raise PlanBusy("Too many plans are being generated; try again shortly")
+        events: "queue.Queue" = queue.Queue()
+        cancel = threading.Event()
+        cached = ai.cached(prompt)
+        if cached is not None:
+            events.put(("token", cached.text))
+            events.put(("end", None))
+            self._admission.release()
+            return events, cancel
+        try:
+            self._executor.submit(self._run, prompt, events, cancel, current_app.logger)
+        except RuntimeError:
+            self._admission.release()
+            raise
+        return events, cancel
+
+    def _run(self, prompt: str, events: "queue.Queue", cancel: threading.Event, logger) -> None:
+        stream = ai.stream(prompt)
+        try:
+            if cancel.is_set():
+                return
+            for chunk in stream:
+                if cancel.is_set():
+                    # Closing the stream below releases the AI slot
+                    return
+                events.put(("token", chunk))
+            events.put(("end", None))
+        except AIError as e:
+            events.put(("error", str(e)))
+        except Exception as e:
+            logger.error(f"Plan generation failed: {e}")
+            events.put(("error", "Plan generation failed"))
+        finally:
+            stream.close()
+            self._admission.release()
+
+
+planner = PlanGenerator()
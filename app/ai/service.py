@@ -0,0 +1,194 @@
+"""Shared entry point for AI calls.
+
+One backend per process (a configured Gemini model, or the fake one when
+``AI_BACKEND=fake``), at most ``AI_MAX_CONCURRENCY`` calls in flight, an
+in-memory TTL/LRU cache of results keyed by a hash of the normalized prompt,
+and token usage counters for metrics.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+
+from flask import Flask
+
+from ..metrics import AI_LATENCY, AI_QUEUE_TIME, AI_REQUESTS, AI_TOKENS
+from .backends import AIError, FakeBackend, GeminiBackend, Generation
+
+
+class AIUnavailable(AIError):
+    """No backend is configured"""
+
+
+class AIBusy(AIError):
+    """Every concurrency slot stayed taken for the whole queue timeout"""
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split())
+
+
+class ResultCache:
+    """Thread-safe LRU of generations that also expire after ``ttl`` seconds"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[str, Tuple[float, Generation]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Generation]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Generation) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class AIService:
+    def __init__(self):
+        self.backend = None
+        self.cache = ResultCache()
+        self.queue_timeout = 10.0
+        self._config: dict = {}
+        self._slots = threading.BoundedSemaphore(4)
+        self._lock = threading.Lock()
+        self._usage = {"requests": 0, "cache_hits": 0, "prompt_tokens": 0, "output_tokens": 0}
+
+    def init_app(self, app: Flask) -> None:
+        self._config = {
+            "backend": app.config.get("AI_BACKEND", "gemini"),
+            "api_key": app.config.get("GEMINI_API_KEY"),
+            "model": app.config.get("AI_MODEL", "gemini-1.5-pro"),
+            "timeout": app.config.get("AI_REQUEST_TIMEOUT", 60),
+        }
+        self.backend = None
+        self.cache = ResultCache(app.config.get("AI_CACHE_SIZE", 256), app.config.get("AI_CACHE_TTL", 3600))
+        self.queue_timeout = app.config.get("AI_QUEUE_TIMEOUT", 10)
+        self._slots = threading.BoundedSemaphore(app.config.get("AI_MAX_CONCURRENCY", 4))
+        app.extensions["ai"] = self
+
+    def get_backend(self):
+        """The process-wide backend, created on first use"""
+        if self.backend is None:
+            with self._lock:
+                if self.backend is None:
+                    if self._config.get("backend") == "fake":
+                        self.backend = FakeBackend()
+                    elif self._config.get("api_key"):
+                        self.backend = GeminiBackend(self._config["api_key"], self._config["model"], self._config["timeout"])
+                    else:
+                        raise AIUnavailable("AI is not configured; set GEMINI_API_KEY or AI_BACKEND=fake")
+        return self.backend
+
+    @property
+    def available(self) -> bool:
+        return self.backend is not None or self._config.get("backend") == "fake" or bool(self._config.get("api_key"))
+
+    def cache_key(self, prompt: str, options: dict) -> str:
+        raw = json.dumps(
+            [self._config.get("backend"), self._config.get("model"), normalize_prompt(prompt), options],
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def cached(self, prompt: str, **options) -> Optional[Generation]:
+        """A cached result for ``prompt``, without calling the backend"""
+        return self.cache.get(self.cache_key(prompt, options))
+
+    def _acquire(self) -> None:
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            AI_REQUESTS.labels(self._config.get("backend", ""), "busy").inc()
+            raise AIBusy("Too many AI requests in progress; try again shortly")
+        AI_QUEUE_TIME.observe(time.perf_counter() - start)
+
+    def _record(self, backend: str, prompt_tokens: int, output_tokens: int) -> None:
+        AI_TOKENS.labels(backend, "prompt").inc(prompt_tokens)
+        AI_TOKENS.labels(backend, "output").inc(output_tokens)
+        with self._lock:
+            self._usage["requests"] += 1
+            self._usage["prompt_tokens"] += prompt_tokens
+            self._usage["output_tokens"] += output_tokens
+
+    def generate(self, prompt: str, use_cache: bool = True, **options) -> Generation:
+        """Complete ``prompt``; identical prompts within the TTL are served from the cache"""
+        backend = self.get_backend()
+        key = self.cache_key(prompt, options)
+        if use_cache:
+            hit = self.cache.get(key)
+            if hit is not None:
+                AI_REQUESTS.labels(backend.name, "cached").inc()
+                with self._lock:
+                    self._usage["cache_hits"] += 1
+                return Generation(hit.text, hit.prompt_tokens, hit.output_tokens, hit.backend, cached=True)
+
+        self._acquire()
+        start = time.perf_counter()
+        try:
+            result = backend.generate(prompt, **options)
+        except AIError:
+            AI_REQUESTS.labels(backend.name, "error").inc()
+            raise
+        finally:
+            self._slots.release()
+            AI_LATENCY.labels(backend.name).observe(time.perf_counter() - start)
+        AI_REQUESTS.labels(backend.name, "ok").inc()
+        self._record(backend.name, result.prompt_tokens, result.output_tokens)
+        if use_cache:
+            self.cache.set(key, result)
+        return result
+
+    def stream(self, prompt: str, **options) -> Iterator[str]:
+        """Yield the completion in chunks, holding a concurrency slot until done or closed"""
+        backend = self.get_backend()
+        self._acquire()
+        start = time.perf_counter()
+        usage: Dict[str, int] = {}
+        parts = []
+        try:
+            for chunk in backend.stream(prompt, usage, **options):
+                parts.append(chunk)
+                yield chunk
+        except AIError:
+            AI_REQUESTS.labels(backend.name, "error").inc()
+            raise
+        finally:
+            self._slots.release()
+            AI_LATENCY.labels(backend.name).observe(time.perf_counter() - start)
+        AI_REQUESTS.labels(backend.name, "ok").inc()
+        self._record(backend.name, usage.get("prompt_tokens", 0), usage.get("output_tokens", 0))
+        self.cache.set(
+            self.cache_key(prompt, options),
+            Generation("".join(parts), usage.get("prompt_tokens", 0), usage.get("output_tokens", 0), backend.name),
+        )
+
+    def usage(self) -> dict:
+        with self._lock:
+            return dict(self._usage, cache_size=len(self.cache))
+
+
+ai = AIService()
@@ -5,7 +5,8 @@ from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
 from ..extensions import db
-from ..models import User
+from ..models import User, get_user, get_user_summary
+from ..passwords import HashingBusy
 from ..schemas import RegisterSchema, LoginSchema, ProfileUpdateSchema
 
 
@@ -24,7 +25,10 @@ class RegisterResource(Resource):
             name=data["name"].strip(),
             timezone=data.get("timezone", "UTC")
         )
-        user.set_password(data["password"])
+        try:
+            user.set_password(data["password"])
+        except HashingBusy as e:
+            return {"message": str(e)}, 503, {"Retry-After": "5"}
         db.session.add(user)
         try:
             db.session.commit()
@@ -41,10 +45,13 @@ class LoginResource(Resource):
         if errors:
             return {"errors": errors}, 400
         user = db.session.scalar(db.select(User).where(User.email == data["email"].lower().strip()))
-        if not user or not user.check_password(data["password"]):
-            return {"message": "Invalid credentials"}, 401
+        try:
+            if not user or not user.check_password(data["password"]):
+                return {"message": "Invalid credentials"}, 401
+        except HashingBusy as e:
+            return {"message": str(e)}, 503, {"Retry-After": "5"}
             
-        # Update last login
+        # Update last login; also saves a re-hashed password
         user.last_login = datetime.utcnow()
         db.session.commit()
         
@@ -78,7 +85,9 @@ class ProfileResource(Resource):
     @jwt_required()
     def get(self):
         user_id = int(get_jwt_identity())
-        user = db.get_or_404(User, user_id)
+        user = get_user(user_id)
+        if user is None:
+            return {"message": "Not found"}, 404
         return {
             "id": user.id,
             "email": user.email,
@@ -126,23 +135,27 @@ class PasswordChangeResource(Resource):
         if not current_password or not new_password:
             return {"message": "Current password and new password are required"}, 400
             
-        if not user.check_password(current_password):
-            return {"message": "Current password is incorrect"}, 400
-            
-        if len(new_password) < 8:
-            return {"message": "New password must be at least 8 characters long"}, 400
-            
-        user.set_password(new_password)
+        try:
+            if not user.check_password(current_password):
+                return {"message": "Current password is incorrect"}, 400
+                
+            if len(new_password) < 8:
+                return {"message": "New password must be at least 8 characters long"}, 400
+                
+            user.set_password(new_password)
+        except HashingBusy as e:
+            return {"message": str(e)}, 503, {"Retry-After": "5"}
         db.session.commit()
 class UserStatsResource(Resource):
     @jwt_required()
     def get(self):
         user_id = int(get_jwt_identity())
-        from ..models import get_user_summary
+        user = get_user(user_id)
+        if user is None:
+            return {"message": "Not found"}, 404
         stats = get_user_summary(user_id)
         
-        # Add additional stats
-        user = db.get_or_404(User, user_id)
+        # Add additional stats; streak and study time come from the request memo
         stats.update({
             "learning_streak": user.get_learning_streak(),
             "total_study_time": user.get_total_study_time(),
@@ -13,6 +13,7 @@ class Config:
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-jwt")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=2)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    JWT_TOKEN_LOCATION = ["headers"]
 
     MAIL_SERVER = os.getenv("MAIL_SERVER", "localhost")
     MAIL_PORT = int(os.getenv("MAIL_PORT", 1025))
@@ -24,6 +25,138 @@ class Config:
 
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*")
 
-    RATELIMIT_DEFAULT = os.getenv("RATELIMIT_DEFAULT", "200 per hour")
+    RATELIMIT_DEFAULT = os.getenv("RATELIMIT_DEFAULT", "200 per hour")  # per endpoint
+    RATELIMIT_APPLICATION = os.getenv("RATELIMIT_APPLICATION")  # optional budget shared by all endpoints
+    # Shared counters; unset uses sqlite:///<instance>/ratelimit.db, clusters use e.g. redis://host:6379
+    RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI")
+    RATELIMIT_STRATEGY = os.getenv("RATELIMIT_STRATEGY", "moving-window")
+    RATELIMIT_COSTS = None  # e.g. {"reports.exportdataresource": 20}; see ratelimit.DEFAULT_COSTS
 
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
\ No newline at end of file
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # Database-backed task queue
+    TASK_QUEUE_WORKER_THREADS = int(os.getenv("TASK_QUEUE_WORKER_THREADS", 1))
+    TASK_QUEUE_POLL_INTERVAL = float(os.getenv("TASK_QUEUE_POLL_INTERVAL", 2.0))
+    TASK_QUEUE_MAX_IDLE_INTERVAL = float(os.getenv("TASK_QUEUE_MAX_IDLE_INTERVAL", 30.0))
+    TASK_QUEUE_BATCH_SIZE = int(os.getenv("TASK_QUEUE_BATCH_SIZE", 10))
+    TASK_QUEUE_VISIBILITY_TIMEOUT = int(os.getenv("TASK_QUEUE_VISIBILITY_TIMEOUT", 300))
+    TASK_QUEUE_MAX_ATTEMPTS = int(os.getenv("TASK_QUEUE_MAX_ATTEMPTS", 3))
+    TASK_QUEUE_RETRY_BACKOFF = int(os.getenv("TASK_QUEUE_RETRY_BACKOFF", 30))
+
+    # Reminder dispatcher
+    REMINDER_DISPATCHER_ENABLED = os.getenv("REMINDER_DISPATCHER_ENABLED", "true").lower() == "true"
+    REMINDER_DISPATCH_HORIZON = int(os.getenv("REMINDER_DISPATCH_HORIZON", 3600))
+    REMINDER_SAFETY_POLL_INTERVAL = int(os.getenv("REMINDER_SAFETY_POLL_INTERVAL", 600))
+    REMINDER_DISPATCH_BATCH_SIZE = int(os.getenv("REMINDER_DISPATCH_BATCH_SIZE", 100))
+
+    # Notification retention; policies map "type:read|unread" to max age in days
+    NOTIFICATION_RETENTION_POLICIES = None  # None uses retention.DEFAULT_POLICIES
+    NOTIFICATION_RETENTION_CHUNK_SIZE = int(os.getenv("NOTIFICATION_RETENTION_CHUNK_SIZE", 500))
+    NOTIFICATION_RETENTION_PAUSE = float(os.getenv("NOTIFICATION_RETENTION_PAUSE", 0.2))
+    NOTIFICATION_ARCHIVE_DIR = os.getenv("NOTIFICATION_ARCHIVE_DIR")
+
+    # Notification stream (SSE)
+    NOTIFICATION_PUBSUB_URL = os.getenv("NOTIFICATION_PUBSUB_URL", "memory://")
+    SSE_HEARTBEAT_INTERVAL = int(os.getenv("SSE_HEARTBEAT_INTERVAL", 15))
+    SSE_MAX_DURATION = int(os.getenv("SSE_MAX_DURATION", 300))
+    SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", 5000))
+    SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", 100))
+    # Lifetime of the stream-only ?jwt= tokens EventSource clients connect with
+    SSE_TOKEN_EXPIRES = int(os.getenv("SSE_TOKEN_EXPIRES", 60))
+
+    # Bulk notification updates commit every this many rows
+    NOTIFICATION_BULK_CHUNK_SIZE = int(os.getenv("NOTIFICATION_BULK_CHUNK_SIZE", 1000))
+
+    # Delta sync (/api/v1/sync)
+    SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", 500))
+    SYNC_MAX_PAGE_SIZE = int(os.getenv("SYNC_MAX_PAGE_SIZE", 2000))
+    SYNC_SETTLE_SECONDS = int(os.getenv("SYNC_SETTLE_SECONDS", 5))
+    SYNC_TOMBSTONE_TTL_DAYS = int(os.getenv("SYNC_TOMBSTONE_TTL_DAYS", 30))
+
+    # Resource full-text search
+    SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", 200))
+
+    # Uploaded file content extraction (runs in child processes from the task queue)
+    EXTRACTION_MAX_PROCESSES = int(os.getenv("EXTRACTION_MAX_PROCESSES", 2))
+    EXTRACTION_LIMITS = None  # e.g. {"image": {"timeout": 300}}; see extraction.pool.DEFAULT_LIMITS
+    EXTRACTION_MAX_TEXT_CHARS = int(os.getenv("EXTRACTION_MAX_TEXT_CHARS", 200000))
+    EXTRACTION_OCR_LANG = os.getenv("EXTRACTION_OCR_LANG", "eng")
+
+    # Thumbnail previews (/api/v1/resources/<id>/preview?size=...)
+    PREVIEW_SIZES = {"small": 128, "medium": 320, "large": 1024}  # name -> longest edge in px
+    PREVIEW_FORMAT = os.getenv("PREVIEW_FORMAT", "webp")
+    PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", 80))
+    PREVIEW_CACHE_DIR = os.getenv("PREVIEW_CACHE_DIR")  # default: <instance>/previews
+    PREVIEW_CACHE_MAX_MB = int(os.getenv("PREVIEW_CACHE_MAX_MB", 1024))
+    PREVIEW_MAX_AGE = int(os.getenv("PREVIEW_MAX_AGE", 31536000))
+    PREVIEW_EAGER = os.getenv("PREVIEW_EAGER", "true").lower() == "true"
+
+    # File uploads (content-addressed under UPLOAD_DIR; resumable via /api/v1/resources/uploads)
+    UPLOAD_DIR = os.getenv("UPLOAD_DIR")  # default: <project>/uploads
+    UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", 2 * 1024 ** 3))
+    UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))  # suggested to clients
+    UPLOAD_MAX_CHUNK_BYTES = int(os.getenv("UPLOAD_MAX_CHUNK_BYTES", 16 * 1024 * 1024))
+    UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", 24))
+    UPLOAD_CHUNK_LEASE_SECONDS = int(os.getenv("UPLOAD_CHUNK_LEASE_SECONDS", 600))  # longest single chunk PUT
+
+    # File downloads (/api/v1/resources/<id>/file)
+    FILE_DOWNLOAD_MAX_AGE = int(os.getenv("FILE_DOWNLOAD_MAX_AGE", 3600))
+    FILE_DOWNLOAD_OFFLOAD = os.getenv("FILE_DOWNLOAD_OFFLOAD")  # "x-accel-redirect" (nginx) or "x-sendfile"
+    FILE_ACCEL_REDIRECT_PREFIX = os.getenv("FILE_ACCEL_REDIRECT_PREFIX", "/protected-uploads")
+
+    # Resource last_accessed is buffered in memory and written in batches
+    ACCESS_FLUSH_INTERVAL = float(os.getenv("ACCESS_FLUSH_INTERVAL", 5))
+    ACCESS_FLUSH_BATCH_SIZE = int(os.getenv("ACCESS_FLUSH_BATCH_SIZE", 500))
+
+    # Bulk resource import (/api/v1/resources/import, flask import-resources)
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+    IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 1000))
+
+    # Link metadata enrichment (title, description, favicon, canonical URL)
+    LINK_ENRICHMENT_ENABLED = os.getenv("LINK_ENRICHMENT_ENABLED", "true").lower() == "true"
+    LINK_ENRICH_BATCH_SIZE = int(os.getenv("LINK_ENRICH_BATCH_SIZE", 100))
+    LINK_FETCH_CONCURRENCY = int(os.getenv("LINK_FETCH_CONCURRENCY", 8))
+    LINK_FETCH_PER_HOST = int(os.getenv("LINK_FETCH_PER_HOST", 2))
+    LINK_FETCH_CONNECT_TIMEOUT = float(os.getenv("LINK_FETCH_CONNECT_TIMEOUT", 3))
+    LINK_FETCH_READ_TIMEOUT = float(os.getenv("LINK_FETCH_READ_TIMEOUT", 5))
+    LINK_FETCH_MAX_BYTES = int(os.getenv("LINK_FETCH_MAX_BYTES", 512 * 1024))
+    LINK_FETCH_ALLOW_PRIVATE = os.getenv("LINK_FETCH_ALLOW_PRIVATE", "false").lower() == "true"
+    LINK_METADATA_TTL_HOURS = int(os.getenv("LINK_METADATA_TTL_HOURS", 168))
+    LINK_METADATA_ERROR_TTL_HOURS = int(os.getenv("LINK_METADATA_ERROR_TTL_HOURS", 1))
+
+    # AI service (app.ai.service); AI_BACKEND=fake answers locally without an API key
+    AI_BACKEND = os.getenv("AI_BACKEND", "gemini")
+    AI_MODEL = os.getenv("AI_MODEL", "gemini-1.5-pro")
+    AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", 4))
+    AI_QUEUE_TIMEOUT = float(os.getenv("AI_QUEUE_TIMEOUT", 10))
+    AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", 60))
+    AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", 256))
+    AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", 3600))
+
+    # AI goal plans (app.ai.planner): generation workers, extra queued requests, overall deadline
+    AI_PLAN_WORKERS = int(os.getenv("AI_PLAN_WORKERS", 4))
+    AI_PLAN_QUEUE = int(os.getenv("AI_PLAN_QUEUE", 4))
+    AI_PLAN_TIMEOUT = float(os.getenv("AI_PLAN_TIMEOUT", 120))
+    AI_PLAN_MAX_MILESTONES = int(os.getenv("AI_PLAN_MAX_MILESTONES", 12))
+
+    # Related-resource suggestions (app.resources.embeddings): hashed vector size, text read per
+    # field, lowest cosine similarity returned, users whose matrices each process keeps in memory
+    EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", 256))
+    EMBEDDING_MAX_CHARS = int(os.getenv("EMBEDDING_MAX_CHARS", 20000))
+    EMBEDDING_MIN_SCORE = float(os.getenv("EMBEDDING_MIN_SCORE", 0.1))
+    EMBEDDING_CACHE_USERS = int(os.getenv("EMBEDDING_CACHE_USERS", 32))
+
+    # Password hashing (app.passwords): scheme (bcrypt, or argon2 with argon2-cffi installed), work
+    # factor, hashing threads, callers allowed to wait for one and how long they wait
+    PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")
+    PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", 12))
+    PASSWORD_ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", 3))
+    PASSWORD_ARGON2_MEMORY_KB = int(os.getenv("PASSWORD_ARGON2_MEMORY_KB", 65536))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 32))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", 5))
+
+    # Request-scoped memo of derived user metrics (app.memo); adds an X-Memo hits/misses header
+    MEMO_DEBUG = os.getenv("MEMO_DEBUG", "false").lower() == "true"
@@ -5,9 +5,10 @@ from flask_login import LoginManager
 from flask_mail import Mail
 from flask_cors import CORS
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from apscheduler.schedulers.background import BackgroundScheduler
 
+from .ratelimit import rate_limit_key, request_cost
+
 
 db = SQLAlchemy()
 migrate = Migrate()
@@ -15,5 +16,11 @@ jwt = JWTManager()
 login_manager = LoginManager()
 mail = Mail()
 cors = CORS()
-limiter = Limiter(key_func=get_remote_address, default_limits=None, headers_enabled=True)
+limiter = Limiter(
+    key_func=rate_limit_key,
+    default_limits=None,
+    default_limits_cost=request_cost,
+    application_limits_cost=request_cost,
+    headers_enabled=True,
+)
 scheduler = BackgroundScheduler()
\ No newline at end of file
@@ -0,0 +1 @@
+# Background content extraction for uploaded files
@@ -0,0 +1,146 @@
+"""Extractors run inside child processes by :mod:`app.extraction.pool`.
+
+Each takes a file path and returns ``{"text": str, "metadata": dict}``.
+Heavy libraries are imported here, never in the web process.
+"""
+import os
+from typing import Optional
+
+
+class ExtractionError(Exception):
+    """A failure that may succeed on retry (timeout, crash, out of memory)"""
+
+
+class InvalidContent(ExtractionError):
+    """The file itself can't be processed; retrying won't help"""
+
+
+EXTENSION_KINDS = {
+    "pdf": "pdf",
+    "png": "image",
+    "jpg": "image",
+    "jpeg": "image",
+    "gif": "image",
+    "mp4": "video",
+    "webm": "video",
+    "mp3": "audio",
+}
+
+
+def kind_for(path: str, content_type: Optional[str] = None) -> Optional[str]:
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    if extension in EXTENSION_KINDS:
+        return EXTENSION_KINDS[extension]
+    if content_type:
+        major = content_type.split("/", 1)[0]
+        if content_type == "application/pdf":
+            return "pdf"
+        if major in ("image", "video", "audio"):
+            return major
+    return None
+
+
+def extract_pdf(path: str, max_chars: int = 200_000, max_pages: int = 500, **options) -> dict:
+    from PyPDF2 import PdfReader
+    from PyPDF2.errors import PdfReadError
+
+    try:
+        reader = PdfReader(path)
+        if reader.is_encrypted and not reader.decrypt(""):
+            raise InvalidContent("PDF is password protected")
+        page_count = len(reader.pages)
+    except PdfReadError as e:
+        raise InvalidContent(f"Unreadable PDF: {e}")
+
+    parts, total = [], 0
+    for page in reader.pages[:max_pages]:
+        text = (page.extract_text() or "").strip()
+        if text:
+            parts.append(text)
+            total += len(text)
+        if total >= max_chars:
+            break
+
+    info = reader.metadata or {}
+    metadata = {"pages": page_count}
+    for key, field in (("title", "/Title"), ("author", "/Author")):
+        value = info.get(field)
+        metadata[key] = str(value) if value is not None else None
+    return {"text": "\n".join(parts)[:max_chars], "metadata": metadata}
+
+
+def extract_image(path: str, max_chars: int = 200_000, ocr_lang: str = "eng", ocr_timeout: int = 0, **options) -> dict:
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(path) as image:
+            metadata = {
+                "width": image.width,
+                "height": image.height,
+                "format": image.format,
+                "mode": image.mode,
+                "frames": getattr(image, "n_frames", 1),
+            }
+            image.seek(0)
+            frame = image.convert("RGB") if image.mode not in ("RGB", "L") else image.copy()
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise InvalidContent(f"Unreadable image: {e}")
+
+    text = ""
+    try:
+        import pytesseract
+
+        text = pytesseract.image_to_string(frame, lang=ocr_lang, timeout=ocr_timeout)
+        metadata["ocr"] = "done"
+    except ImportError:
+        metadata["ocr"] = "unavailable"
+    except Exception as e:
+        # TesseractNotFoundError and friends: keep the image metadata
+        if type(e).__name__ == "TesseractNotFoundError":
+            metadata["ocr"] = "unavailable"
+        else:
+            raise
+    return {"text": text.strip()[:max_chars], "metadata": metadata}
+
+
+def extract_video(path: str, **options) -> dict:
+    from moviepy.editor import VideoFileClip
+
+    try:
+        clip = VideoFileClip(path)
+    except (OSError, KeyError, IndexError) as e:
+        raise InvalidContent(f"Unreadable video: {e}")
+    try:
+        width, height = clip.size
+        metadata = {
+            "duration": round(clip.duration or 0, 3),
+            "fps": clip.fps,
+            "width": width,
+            "height": height,
+            "has_audio": clip.audio is not None,
+        }
+    finally:
+        clip.close()
+    return {"text": "", "metadata": metadata}
+
+
+def extract_audio(path: str, **options) -> dict:
+    from moviepy.editor import AudioFileClip
+
+    try:
+        clip = AudioFileClip(path)
+    except (OSError, KeyError, IndexError) as e:
+        raise InvalidContent(f"Unreadable audio: {e}")
+    try:
+        metadata = {"duration": round(clip.duration or 0, 3), "sample_rate": clip.fps, "channels": clip.nchannels}
+    finally:
+        clip.close()
+    return {"text": "", "metadata": metadata}
+
+
+EXTRACTORS = {
+    "pdf": extract_pdf,
+    "image": extract_image,
+    "video": extract_video,
+    "audio": extract_audio,
+}
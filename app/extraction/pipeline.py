@@ -0,0 +1,60 @@
+import os
+from datetime import datetime
+
+from flask import current_app
+
+from ..extensions import db
+from ..models import Resource
+from .extractors import ExtractionError, InvalidContent, kind_for
+from .pool import pool
+
+
+def _set_status(resource: Resource, status: str, **fields) -> dict:
+    metadata = dict(resource.metadata_json or {})
+    metadata["extraction"] = {"status": status, "updated_at": datetime.utcnow().isoformat(), **fields}
+    # Reassign so the JSON column is flagged as changed
+    resource.metadata_json = metadata
+    return metadata
+
+
+def extract_resource(resource_id: int) -> bool:
+    """Extract text and metadata from a resource's file.
+
+    Raises :class:`ExtractionError` for transient failures so the task queue
+    retries; unprocessable files are marked failed without a retry.
+    """
+    resource = db.session.get(Resource, resource_id)
+    if resource is None or not resource.path:
+        return False
+    if not os.path.exists(resource.path):
+        _set_status(resource, "failed", error="File is missing")
+        db.session.commit()
+        return False
+    kind = kind_for(resource.path, resource.file_type)
+    if kind is None:
+        _set_status(resource, "skipped")
+        db.session.commit()
+        return False
+
+    path = resource.path
+    # Don't hold a transaction open while the child process works
+    db.session.commit()
+    try:
+        result = pool.run(kind, path)
+    except InvalidContent as e:
+        _set_status(resource, "failed", kind=kind, error=str(e))
+        db.session.commit()
+        current_app.logger.info(f"Resource {resource_id} can't be extracted: {e}")
+        return False
+    except ExtractionError as e:
+        _set_status(resource, "error", kind=kind, error=str(e))
+        db.session.commit()
+        raise
+
+    text = result.get("text") or ""
+    metadata = _set_status(resource, "done", kind=kind, chars=len(text))
+    metadata[kind] = result.get("metadata") or {}
+    resource.metadata_json = dict(metadata)
+    resource.extracted_text = text or None
+    db.session.commit()
+    return True
@@ -0,0 +1,143 @@
+import multiprocessing
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from flask import Flask
+
+from ..metrics import EXTRACTION_DURATION, EXTRACTIONS
+from .extractors import EXTRACTORS, ExtractionError, InvalidContent
+
+
+# Per-kind limits; config key EXTRACTION_LIMITS overrides individual entries
+DEFAULT_LIMITS = {
+    "pdf": {"timeout": 60, "memory_mb": 512, "concurrency": 2},
+    "image": {"timeout": 120, "memory_mb": 1024, "concurrency": 1},
+    "video": {"timeout": 30, "memory_mb": 1024, "concurrency": 2},
+    "audio": {"timeout": 30, "memory_mb": 1024, "concurrency": 2},
+    "preview": {"timeout": 30, "memory_mb": 1024, "concurrency": 2},
+}
+
+
+def _child(conn, kind: str, func: Callable, args: tuple, kwargs: dict, memory_mb: Optional[int]) -> None:
+    try:
+        if memory_mb:
+            import resource
+
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            limit = memory_mb * 1024 * 1024
+            if hard != resource.RLIM_INFINITY:
+                limit = min(limit, hard)
+            # Also applies to tesseract/ffmpeg subprocesses started from here
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        conn.send(("ok", func(*args, **kwargs)))
+    except InvalidContent as e:
+        conn.send(("invalid", str(e)))
+    except MemoryError:
+        conn.send(("error", f"{kind} extraction exceeded {memory_mb} MB"))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+class ExtractionPool:
+    """Runs extractors in child processes with per-kind caps.
+
+    Every job gets its own process so a job that overruns its timeout can
+    be killed without disturbing the others; a global cap bounds how many
+    run at once and a per-kind cap keeps e.g. OCR from starving PDFs.
+    """
+
+    def __init__(self):
+        self.limits: Dict[str, dict] = {kind: dict(limits) for kind, limits in DEFAULT_LIMITS.items()}
+        self.options: dict = {}
+        self._global = threading.BoundedSemaphore(2)
+        self._per_kind = {kind: threading.BoundedSemaphore(l["concurrency"]) for kind, l in self.limits.items()}
+        self._context = None
+
+    def init_app(self, app: Flask) -> None:
+        for kind, overrides in (app.config.get("EXTRACTION_LIMITS") or {}).items():
+            self.limits.setdefault(kind, {}).update(overrides)
+        self._global = threading.BoundedSemaphore(app.config.get("EXTRACTION_MAX_PROCESSES", 2))
+        self._per_kind = {
+            kind: threading.BoundedSemaphore(limits.get("concurrency", 1)) for kind, limits in self.limits.items()
+        }
+        self.options = {
+            "max_chars": app.config.get("EXTRACTION_MAX_TEXT_CHARS", 200_000),
+            "ocr_lang": app.config.get("EXTRACTION_OCR_LANG", "eng"),
+        }
+        app.extensions["extraction_pool"] = self
+
+    def _get_context(self):
+        if self._context is None:
+            # Forking a threaded web/worker process is unsafe; forkserver
+            # children start from a clean process with the extractors preloaded.
+            methods = multiprocessing.get_all_start_methods()
+            self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            if "forkserver" in methods:
+                self._context.set_forkserver_preload(["app.extraction.extractors", "app.previews.render"])
+        return self._context
+
+    def run(self, kind: str, path: str) -> dict:
+        """Extract ``path`` in a child process, raising ExtractionError on failure"""
+        if kind not in EXTRACTORS:
+            raise InvalidContent(f"No extractor for {kind} files")
+        options = dict(self.options)
+        if kind == "image":
+            # Let tesseract give up just before the hard kill
+            options["ocr_timeout"] = max(self.limits[kind].get("timeout", 60) - 5, 1)
+        return self.call(kind, EXTRACTORS[kind], path, **options)
+
+    def call(self, kind: str, func: Callable, *args, **kwargs):
+        """Run a module-level ``func`` in a child process under ``kind``'s limits"""
+        limits = self.limits[kind]
+        timeout = limits.get("timeout", 60)
+
+        with self._global, self._per_kind[kind]:
+            start = time.perf_counter()
+            try:
+                result = self._run_child(kind, func, args, kwargs, timeout, limits.get("memory_mb"))
+            except InvalidContent:
+                EXTRACTIONS.labels(kind, "invalid").inc()
+                raise
+            except ExtractionError:
+                EXTRACTIONS.labels(kind, "error").inc()
+                raise
+            finally:
+                EXTRACTION_DURATION.labels(kind).observe(time.perf_counter() - start)
+        EXTRACTIONS.labels(kind, "success").inc()
+        return result
+
+    def _run_child(self, kind: str, func: Callable, args: tuple, kwargs: dict, timeout: float, memory_mb: Optional[int]):
+        context = self._get_context()
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_child, args=(sender, kind, func, args, kwargs, memory_mb), name=f"extract-{kind}", daemon=True
+        )
+        process.start()
+        sender.close()
+        try:
+            if not receiver.poll(timeout):
+                process.kill()
+                raise ExtractionError(f"{kind} extraction timed out after {timeout}s")
+            try:
+                status, *payload = receiver.recv()
+            except EOFError:
+                # Killed before replying, e.g. by the OOM killer or a segfault
+                process.join(1)
+                raise ExtractionError(f"{kind} extractor exited with code {process.exitcode}")
+        finally:
+            receiver.close()
+            process.join(1)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        if status == "invalid":
+            raise InvalidContent(payload[0])
+        if status == "error":
+            raise ExtractionError(payload[0])
+        return payload[0]
+
+
+pool = ExtractionPool()
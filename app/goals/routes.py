@@ -1,10 +1,19 @@
-from flask import Blueprint, request
+import json
+import queue
+import time
+
+from flask import Blueprint, Response, current_app, request, stream_with_context
 from flask_restful import Api, Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from marshmallow import ValidationError
 
+from ..achievements import record_event, rebuild_counters, GOAL_COMPLETED, GOAL_REOPENED, MILESTONE_COMPLETED, MILESTONE_REOPENED, MILESTONE_DELETED, PROGRESS_LOGGED
+from ..ai.planner import PlanBusy, PlanError, build_prompt, create_milestones, parse_plan, planner
+from ..ai.service import ai
 from ..extensions import db
 from ..models import Goal, ProgressLog, Milestone
-from ..schemas import GoalCreateSchema, GoalUpdateSchema, ProgressLogSchema, MilestoneCreateSchema, MilestoneUpdateSchema
+from ..schemas import GoalCreateSchema, GoalUpdateSchema, GoalPlanRequestSchema, ProgressLogSchema, MilestoneCreateSchema, MilestoneUpdateSchema
+from ..tags.index import filter_by_tags, parse_tag_filter
 
 
 bp = Blueprint("goals", __name__)
@@ -39,6 +48,10 @@ class GoalsListResource(Resource):
             
         if priority:
             query = query.where(Goal.priority == priority)
+            
+        tags, match_all = parse_tag_filter(request.args)
+        if tags:
+            query = filter_by_tags(query, Goal, _user_id(), tags, match_all)
         
         goals = db.session.scalars(query.order_by(Goal.created_at.desc())).all()
         
@@ -149,9 +162,11 @@ class GoalResource(Resource):
             goal.completed_at = datetime.utcnow()
             goal.progress = 100.0
             goal.status = "completed"
+            record_event(goal.user_id, GOAL_COMPLETED)
         elif "is_completed" in data and not data["is_completed"] and goal.is_completed:
             goal.completed_at = None
             goal.status = "active"
+            record_event(goal.user_id, GOAL_REOPENED)
             
         for key in ["title", "description", "category", "priority", "status", "progress", "target_date", "estimated_hours", "tags", "is_completed"]:
             if key in data:
@@ -164,7 +179,11 @@ class GoalResource(Resource):
         goal = db.get_or_404(Goal, goal_id)
         if goal.user_id != _user_id():
             return {"message": "Not found"}, 404
+        user_id = goal.user_id
         db.session.delete(goal)
+        db.session.flush()
+        # The goal takes its milestones and progress logs with it, streak days included
+        rebuild_counters(user_id)
         db.session.commit()
         return {"message": "deleted"}, 200
 
@@ -191,6 +210,7 @@ class GoalProgressResource(Resource):
         
         # Update goal's actual hours
         goal.actual_hours += data["minutes"] / 60.0
+        record_event(goal.user_id, PROGRESS_LOGGED, minutes=data["minutes"])
         
         db.session.commit()
         return {"message": "logged"}, 201
@@ -258,8 +278,10 @@ class MilestoneResource(Resource):
         if "is_completed" in data and data["is_completed"] and not milestone.is_completed:
             from datetime import datetime
             milestone.completed_at = datetime.utcnow()
+            record_event(milestone.user_id, MILESTONE_COMPLETED)
         elif "is_completed" in data and not data["is_completed"] and milestone.is_completed:
             milestone.completed_at = None
+            record_event(milestone.user_id, MILESTONE_REOPENED)
             
         for key in ["title", "description", "is_completed", "order_index"]:
             if key in data:
@@ -280,6 +302,8 @@ class MilestoneResource(Resource):
         if milestone.user_id != _user_id() or milestone.goal_id != goal_id:
             return {"message": "Not found"}, 404
             
+        if milestone.is_completed:
+            record_event(milestone.user_id, MILESTONE_DELETED)
         db.session.delete(milestone)
         db.session.commit()
         
@@ -301,9 +325,98 @@ class GoalCategoriesResource(Resource):
         return list(categories)
         
         return {"id": milestone.id}, 201
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class GoalPlanResource(Resource):
+    @jwt_required()
+    def post(self, goal_id: int):
+        """Stream an AI-suggested milestone plan as Server-Sent Events.
+
+        Events: ``token`` (raw model output as it arrives), ``plan`` (the
+        validated plan), ``created`` (ids of milestones added when
+        ``create_milestones`` is set), ``error`` and finally ``done``.
+        Generation runs on the planner's pool, but the response holds this
+        worker until the stream ends, so serve it from gevent or threaded
+        workers.
+        """
+        goal = db.get_or_404(Goal, goal_id)
+        if goal.user_id != _user_id():
+            return {"message": "Not found"}, 404
+        try:
+            options = GoalPlanRequestSchema().load(request.get_json(silent=True) or {})
+        except ValidationError as e:
+            return {"errors": e.messages}, 400
+        if not ai.available:
+            return {"message": "AI features are not configured"}, 503
+
+        config = current_app.config
+        max_milestones = config.get("AI_PLAN_MAX_MILESTONES", 12)
+        prompt = build_prompt(goal, options["hours_per_week"], max_milestones)
+        try:
+            events, cancel = planner.start(prompt)
+        except PlanBusy as e:
+            return {"message": str(e)}, 503, {"Retry-After": "10"}
+        # Don't pin a pooled connection while the model is generating
+        db.session.remove()
+
+        def stream():
+            heartbeat = config.get("SSE_HEARTBEAT_INTERVAL", 15)
+            deadline = time.monotonic() + planner.timeout
+            parts = []
+            try:
+                yield f"retry: {config.get('SSE_RETRY_MS', 5000)}\n\n"
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        yield _sse("error", {"message": "Plan generation timed out"})
+                        return
+                    try:
+                        kind, payload = events.get(timeout=min(heartbeat, remaining))
+                    except queue.Empty:
+                        if time.monotonic() < deadline:
+                            yield ": heartbeat\n\n"
+                        continue
+                    if kind == "token":
+                        parts.append(payload)
+                        yield _sse("token", {"text": payload})
+                    elif kind == "error":
+                        yield _sse("error", {"message": payload})
+                        return
+                    else:
+                        break
+
+                try:
+                    plan = parse_plan("".join(parts))
+                except PlanError as e:
+                    yield _sse("error", {"message": str(e)})
+                    return
+                yield _sse("plan", plan)
+                if options["create_milestones"]:
+                    target = db.session.get(Goal, goal_id)
+                    if target is None:
+                        yield _sse("error", {"message": "Goal no longer exists"})
+                        return
+                    ids = create_milestones(target, plan, max_milestones)
+                    yield _sse("created", {"milestone_ids": ids, "progress": target.progress})
+                yield _sse("done", {})
+            finally:
+                # Runs on completion and when the client disconnects mid-stream
+                cancel.set()
+
+        response = Response(stream_with_context(stream()), mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+
 api.add_resource(GoalsListResource, "/")
 api.add_resource(GoalResource, "/<int:goal_id>")
 api.add_resource(GoalProgressResource, "/<int:goal_id>/progress")
 api.add_resource(GoalMilestonesResource, "/<int:goal_id>/milestones")
 api.add_resource(MilestoneResource, "/<int:goal_id>/milestones/<int:milestone_id>")
-api.add_resource(GoalCategoriesResource, "/categories")
\ No newline at end of file
+api.add_resource(GoalCategoriesResource, "/categories")
+api.add_resource(GoalPlanResource, "/<int:goal_id>/plan")
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""Request-scoped memoization of derived per-user values.
+
+Streaks, study totals, goal counts and the ``User`` row are read by several
+helpers during one request; :func:`memoize` keeps each result on ``flask.g``
+so the second caller gets it for free. The memo lives only as long as the
+request and is dropped whenever the session flushes, commits or rolls
+back, so a request that writes and then reads sees fresh values. Outside a request
+(tasks, CLI) values are always computed.
+
+With ``MEMO_DEBUG`` (or debug mode) responses carry an ``X-Memo`` header
+with the request's hit and miss counts.
+"""
+from typing import Callable, Hashable, TypeVar
+
+from flask import Flask, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+T = TypeVar("T")
+
+
+def memoize(key: Hashable, compute: Callable[[], T]) -> T:
+    if not has_request_context():
+        return compute()
+    memo = g.setdefault("_memo", {})
+    if key in memo:
+        g._memo_hits = g.get("_memo_hits", 0) + 1
+        return memo[key]
+    g._memo_misses = g.get("_memo_misses", 0) + 1
+    value = memo[key] = compute()
+    return value
+
+
+def clear() -> None:
+    if has_request_context():
+        g.pop("_memo", None)
+
+
+def stats() -> dict:
+    return {"hits": g.get("_memo_hits", 0), "misses": g.get("_memo_misses", 0)}
+
+
+def _clear_on_write(session: Session, *args) -> None:
+    clear()
+
+
+def _after_request(response: Response) -> Response:
+    if "_memo_hits" in g or "_memo_misses" in g:
+        counts = stats()
+        current_app.logger.debug(f"Memo for {request.endpoint}: {counts}")
+        if current_app.config.get("MEMO_DEBUG") or current_app.debug:
+            response.headers["X-Memo"] = f"hits={counts['hits']}, misses={counts['misses']}"
+    return response
+
+
+def init_app(app: Flask) -> None:
+    for name in ("after_flush", "after_commit", "after_rollback"):
+        if not event.contains(Session, name, _clear_on_write):
+            event.listen(Session, name, _clear_on_write)
+    app.after_request(_after_request)
@@ -0,0 +1,197 @@
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable
+
+from flask import Flask, Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+
+# Under gunicorn set PROMETHEUS_MULTIPROC_DIR (before the app is imported) so
+# every worker writes to shared mmap files that /metrics aggregates.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled",
+    ["blueprint", "endpoint", "method", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ["blueprint", "endpoint", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+JOB_RUNS = Counter("job_runs_total", "Background job runs", ["job", "status"])
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Background job duration", ["job"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0),
+)
+JOB_ROWS = Counter("job_rows_processed_total", "Rows processed by background jobs", ["job"])
+
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connections checked out of the SQLAlchemy pool")
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections currently checked out", multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections open beyond the pool size", multiprocess_mode="livemax",
+)
+
+EMAILS_SENT = Counter("emails_sent_total", "Emails sent", ["status"])
+EMAIL_LATENCY = Histogram(
+    "email_send_duration_seconds", "Time spent sending an email",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+RATELIMIT_REJECTIONS = Counter("ratelimit_rejections_total", "Requests rejected by the rate limiter", ["endpoint"])
+
+SSE_SUBSCRIBERS = Gauge(
+    "sse_subscribers", "Open notification stream connections", multiprocess_mode="livesum",
+)
+
+RETENTION_DELETED = Counter(
+    "notification_retention_deleted_total", "Notifications deleted by retention", ["policy"],
+)
+RETENTION_ARCHIVED = Counter(
+    "notification_retention_archived_total", "Notifications archived before deletion", ["policy"],
+)
+
+EXTRACTIONS = Counter("content_extractions_total", "File content extractions", ["kind", "status"])
+EXTRACTION_DURATION = Histogram(
+    "content_extraction_duration_seconds", "Time spent extracting file content", ["kind"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+
+AI_REQUESTS = Counter("ai_requests_total", "AI generation requests", ["backend", "status"])
+AI_TOKENS = Counter("ai_tokens_total", "AI tokens used", ["backend", "kind"])
+AI_LATENCY = Histogram(
+    "ai_request_duration_seconds", "Time spent waiting for the AI backend", ["backend"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+AI_QUEUE_TIME = Histogram(
+    "ai_queue_wait_seconds", "Time AI requests wait for a concurrency slot",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+)
+
+PASSWORD_HASHES = Counter("password_hash_operations_total", "Password hash operations", ["operation", "status"])
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "Time spent hashing or verifying a password", ["operation"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+PASSWORD_HASH_QUEUE_TIME = Histogram(
+    "password_hash_queue_wait_seconds", "Time password operations wait for a hashing worker",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+def track_job(name: str, func: Callable) -> Callable:
+    """Wrap a background job to record runs, duration and rows processed.
+
+    Jobs may return the number of rows they processed.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            rows = func(*args, **kwargs)
+        except Exception:
+            JOB_RUNS.labels(name, "failure").inc()
+            raise
+        finally:
+            JOB_DURATION.labels(name).observe(time.perf_counter() - start)
+        # Jobs swallow their own errors and return None on failure
+        JOB_RUNS.labels(name, "success" if rows is not None else "failure").inc()
+        if rows:
+            JOB_ROWS.labels(name).inc(rows)
+        return rows
+    return wrapper
+
+
+@contextmanager
+def track_email():
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EMAILS_SENT.labels("failure").inc()
+        raise
+    else:
+        EMAILS_SENT.labels("success").inc()
+    finally:
+        EMAIL_LATENCY.observe(time.perf_counter() - start)
+
+
+def _request_labels():
+    return request.blueprint or "", request.endpoint or "unmatched", request.method
+
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+
+
+def _after_request(response: Response) -> Response:
+    start = g.pop("_metrics_start", None)
+    if start is not None:
+        blueprint, endpoint, method = _request_labels()
+        HTTP_LATENCY.labels(blueprint, endpoint, method).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(blueprint, endpoint, method, str(response.status_code)).inc()
+    return response
+
+
+def record_ratelimit_rejection() -> None:
+    RATELIMIT_REJECTIONS.labels(request.endpoint or "unmatched").inc()
+
+
+def _instrument_pool(engine) -> None:
+    pool = engine.pool
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+        DB_POOL_CHECKOUTS.inc()
+        DB_POOL_CHECKED_OUT.inc()
+        overflow = getattr(pool, "overflow", None)
+        if callable(overflow):
+            DB_POOL_OVERFLOW.set(max(overflow(), 0))
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_conn, conn_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+
+def metrics_view():
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app: Flask, db=None, limiter=None) -> None:
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+    if limiter is not None:
+        limiter.exempt(metrics_view)
+    if db is not None:
+        with app.app_context():
+            _instrument_pool(db.engine)
+
+
+def child_exit(server, worker) -> None:
+    """gunicorn ``child_exit`` hook: drop live gauges of a dead worker"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(worker.pid)
+
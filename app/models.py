@@ -1,11 +1,12 @@
 from datetime import datetime
 from typing import Optional
 
-from passlib.hash import bcrypt
 from sqlalchemy import func
 from sqlalchemy.dialects.sqlite import JSON
 
 from .extensions import db
+from .memo import memoize
+from .passwords import hasher
 
 
 class User(db.Model):
@@ -32,13 +33,20 @@ class User(db.Model):
     notifications = db.relationship("Notification", backref="user", lazy=True, cascade="all, delete-orphan")
 
     def set_password(self, password: str) -> None:
-        self.password_hash = bcrypt.hash(password)
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password: str) -> bool:
-        return bcrypt.verify(password, self.password_hash)
+        """Verify ``password``, upgrading an outdated hash in place (the caller commits)"""
+        ok, new_hash = hasher.verify(password, self.password_hash)
+        if ok and new_hash:
+            self.password_hash = new_hash
+        return ok
     
     def get_learning_streak(self) -> int:
         """Calculate current learning streak in days"""
+        return memoize(("learning_streak", self.id), self._compute_learning_streak)
+
+    def _compute_learning_streak(self) -> int:
         progress_logs = db.session.query(ProgressLog).filter_by(user_id=self.id).order_by(ProgressLog.created_at.desc()).all()
         if not progress_logs:
             return 0
@@ -58,12 +66,14 @@ class User(db.Model):
     
     def get_total_study_time(self) -> int:
         """Get total study time in minutes"""
-        total = db.session.query(func.sum(ProgressLog.minutes)).filter_by(user_id=self.id).scalar()
-        return total or 0
+        return total_minutes(self.id)
 
 
 class Goal(db.Model):
     __tablename__ = "goals"
+    __table_args__ = (
+        db.Index("ix_goals_user_updated", "user_id", "updated_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
@@ -111,6 +121,9 @@ class Goal(db.Model):
 
 class Milestone(db.Model):
     __tablename__ = "milestones"
+    __table_args__ = (
+        db.Index("ix_milestones_user_updated", "user_id", "updated_at"),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
@@ -124,6 +137,9 @@ class Milestone(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 class Resource(db.Model):
     __tablename__ = "resources"
+    __table_args__ = (
+        db.Index("ix_resources_user_updated", "user_id", "updated_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
@@ -141,12 +157,17 @@ class Resource(db.Model):
     file_size = db.Column(db.Integer, nullable=True)  # In bytes
     file_type = db.Column(db.String(100), nullable=True)
     metadata_json = db.Column(JSON, nullable=True)
+    extracted_text = db.Column(db.Text, nullable=True)  # Text pulled from uploaded files, for search
+    file_sha256 = db.Column(db.String(64), db.ForeignKey("stored_files.sha256"), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 
 class ProgressLog(db.Model):
     __tablename__ = "progress_logs"
+    __table_args__ = (
+        db.Index("ix_progress_logs_user_updated", "user_id", "updated_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
@@ -156,6 +177,7 @@ class ProgressLog(db.Model):
     notes = db.Column(db.Text, nullable=True)
     activity_type = db.Column(db.String(50), default='study', nullable=False)  # study, reading, practice, etc.
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     milestone = db.relationship("Milestone", backref="progress_logs")
 
@@ -169,11 +191,28 @@ class Reminder(db.Model):
     title = db.Column(db.String(200), nullable=False)
     message = db.Column(db.Text, nullable=True)
     reminder_type = db.Column(db.String(50), nullable=False)  # daily, weekly, custom, deadline
-    frequency = db.Column(db.String(50), nullable=True)  # For recurring reminders
+    frequency = db.Column(db.String(255), nullable=True)  # For recurring reminders, as entered
+    recurrence = db.Column(JSON, nullable=True)  # Normalized rule, see reminders.recurrence
+    occurrence_count = db.Column(db.Integer, default=0, nullable=False)
     next_reminder = db.Column(db.DateTime, nullable=False)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
+    email_enabled = db.Column(db.Boolean, default=True, nullable=False)
+    in_app_enabled = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_reminders_active_next", "is_active", "next_reminder"),
+        db.Index("ix_reminders_user_updated", "user_id", "updated_at"),
+    )
+
+
 class Notification(db.Model):
     __tablename__ = "notifications"
+    __table_args__ = (
+        db.Index("ix_notifications_retention", "notification_type", "is_read", "created_at"),
+        db.Index("ix_notifications_user_updated", "user_id", "updated_at"),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
@@ -184,11 +223,16 @@ class Notification(db.Model):
     action_url = db.Column(db.String(500), nullable=True)
     metadata_json = db.Column(JSON, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     read_at = db.Column(db.DateTime, nullable=True)
-    email_enabled = db.Column(db.Boolean, default=True, nullable=False)
-    in_app_enabled = db.Column(db.Boolean, default=True, nullable=False)
+
+
 class Achievement(db.Model):
     __tablename__ = "achievements"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "achievement_type", name="uq_achievements_user_type"),
+        db.Index("ix_achievements_user_updated", "user_id", "updated_at"),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
@@ -201,21 +245,198 @@ class Achievement(db.Model):
     user = db.relationship("User", backref="achievements")
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class Tag(db.Model):
+    """A user's tag; ``name`` is normalized (see tags.index.normalize_tag)"""
+    __tablename__ = "tags"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "name", name="uq_tags_user_name"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+resource_tags = db.Table(
+    "resource_tags",
+    db.Column("resource_id", db.Integer, db.ForeignKey("resources.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("tag_id", db.Integer, db.ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    db.Index("ix_resource_tags_tag", "tag_id", "resource_id"),
+)
+
+goal_tags = db.Table(
+    "goal_tags",
+    db.Column("goal_id", db.Integer, db.ForeignKey("goals.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("tag_id", db.Integer, db.ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    db.Index("ix_goal_tags_tag", "tag_id", "goal_id"),
+)
+
+
+class UserCounters(db.Model):
+    """Incrementally maintained per-user totals used by the achievement engine"""
+    __tablename__ = "user_counters"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    goals_completed = db.Column(db.Integer, default=0, nullable=False)
+    milestones_completed = db.Column(db.Integer, default=0, nullable=False)
+    progress_logs = db.Column(db.Integer, default=0, nullable=False)
+    minutes_total = db.Column(db.Integer, default=0, nullable=False)
+    current_streak = db.Column(db.Integer, default=0, nullable=False)
+    longest_streak = db.Column(db.Integer, default=0, nullable=False)
+    last_activity_date = db.Column(db.Date, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class NotificationCounter(db.Model):
+    """Per-user unread notification count, kept in step with the notifications table"""
+    __tablename__ = "notification_counters"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    unread = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class SyncTombstone(db.Model):
+    """Records a deleted row so delta sync can tell clients to drop it"""
+    __tablename__ = "sync_tombstones"
+    __table_args__ = (
+        db.Index("ix_sync_tombstones_user_deleted", "user_id", "deleted_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    entity = db.Column(db.String(50), nullable=False)  # table name of the deleted row
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class StoredFile(db.Model):
+    """A content-addressed upload, shared by every resource with the same bytes"""
+    __tablename__ = "stored_files"
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class LinkMetadata(db.Model):
+    """Fetched page metadata, shared by every resource linking to the same normalized URL"""
+    __tablename__ = "link_metadata"
+
+    url_hash = db.Column(db.String(64), primary_key=True)  # sha256 of the normalized URL
+    url = db.Column(db.Text, nullable=False)
+    title = db.Column(db.String(500), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    favicon = db.Column(db.String(1024), nullable=True)
+    canonical_url = db.Column(db.String(1024), nullable=True)
+    status_code = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.String(255), nullable=True)
+    etag = db.Column(db.String(255), nullable=True)
+    last_modified = db.Column(db.String(100), nullable=True)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ResourceEmbedding(db.Model):
+    """Hashed bag-of-words vector of a resource, for related-resource suggestions"""
+    __tablename__ = "resource_embeddings"
+    __table_args__ = (
+        # Counts and "changed since" refreshes read only this index, not the vectors
+        db.Index("ix_resource_embeddings_user_model_updated", "user_id", "model", "updated_at"),
+    )
+
+    resource_id = db.Column(db.Integer, db.ForeignKey("resources.id", ondelete="CASCADE"), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    model = db.Column(db.String(50), nullable=False)  # vectorizer that produced it, e.g. "hash-256-v1"
+    vector = db.Column(db.LargeBinary, nullable=False)  # L2-normalized float32
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class UploadSession(db.Model):
+    """A resumable chunked upload in progress"""
+    __tablename__ = "upload_sessions"
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, default=0, nullable=False)
+    # Lease held by the request currently writing the chunk at ``received``
+    writer = db.Column(db.String(32), nullable=True)
+    writing_until = db.Column(db.DateTime, nullable=True)
+    fields = db.Column(JSON, nullable=True)  # category, goal_id, tags for the resource
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
+
+
+class QueuedTask(db.Model):
+    __tablename__ = "task_queue"
+    __table_args__ = (
+        db.Index("ix_task_queue_claim", "status", "run_at", "priority"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, index=True)
+    args = db.Column(JSON, nullable=True)
+    priority = db.Column(db.Integer, default=0, nullable=False)  # higher runs first
+    status = db.Column(db.String(20), default="queued", nullable=False)  # queued, running, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=3, nullable=False)
+    dedupe_key = db.Column(db.String(200), nullable=True, unique=True)  # at most one task per key
+    run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+def get_user(user_id: int) -> Optional[User]:
+    """The user's row, loaded at most once per request"""
+    return memoize(("user", user_id), lambda: db.session.get(User, user_id))
+
+
+def total_minutes(user_id: int) -> int:
+    """Total study time in minutes"""
+    return memoize(("total_minutes", user_id), lambda: db.session.scalar(
+        db.select(func.coalesce(func.sum(ProgressLog.minutes), 0)).where(ProgressLog.user_id == user_id)
+    ) or 0)
+
+
+def goal_counts(user_id: int) -> dict:
+    """Total, completed and overdue goal counts"""
+    def compute():
+        return {
+            "total": db.session.scalar(db.select(func.count(Goal.id)).where(Goal.user_id == user_id)) or 0,
+            "completed": db.session.scalar(db.select(func.count(Goal.id)).where(Goal.user_id == user_id, Goal.is_completed == True)) or 0,
+            "overdue": db.session.scalar(db.select(func.count(Goal.id)).where(
+                Goal.user_id == user_id,
+                Goal.is_completed == False,
+                Goal.target_date < datetime.utcnow().date()
+            )) or 0,
+        }
+    return dict(memoize(("goal_counts", user_id), compute))
+
+
 def get_user_summary(user_id: int) -> dict:
-    goals_total = db.session.scalar(db.select(func.count(Goal.id)).where(Goal.user_id == user_id)) or 0
-    goals_completed = db.session.scalar(db.select(func.count(Goal.id)).where(Goal.user_id == user_id, Goal.is_completed == True)) or 0
-    goals_overdue = db.session.scalar(db.select(func.count(Goal.id)).where(
-        Goal.user_id == user_id, 
-        Goal.is_completed == False,
-        Goal.target_date < datetime.utcnow().date()
-    )) or 0
+    return dict(memoize(("user_summary", user_id), lambda: _compute_user_summary(user_id)))
+
+
+def _compute_user_summary(user_id: int) -> dict:
+    goals = goal_counts(user_id)
+    goals_total, goals_completed, goals_overdue = goals["total"], goals["completed"], goals["overdue"]
     resources_total = db.session.scalar(db.select(func.count(Resource.id)).where(Resource.user_id == user_id)) or 0
-    minutes_total = db.session.scalar(db.select(func.coalesce(func.sum(ProgressLog.minutes), 0)).where(ProgressLog.user_id == user_id)) or 0
+    minutes_total = total_minutes(user_id)
     milestones_total = db.session.scalar(db.select(func.count(Milestone.id)).where(Milestone.user_id == user_id)) or 0
     milestones_completed = db.session.scalar(db.select(func.count(Milestone.id)).where(Milestone.user_id == user_id, Milestone.is_completed == True)) or 0
     
     # Get learning streak
-    user = db.session.get(User, user_id)
+    user = get_user(user_id)
     streak = user.get_learning_streak() if user else 0
     
     return {
@@ -0,0 +1,118 @@
+"""Password hashing on a small bounded thread pool.
+
+bcrypt and argon2 are deliberately slow and release the GIL while they
+run, so a burst of logins hashed in request threads would take every CPU.
+Here at most ``PASSWORD_HASH_WORKERS`` hashes run at once; up to
+``PASSWORD_HASH_MAX_QUEUE`` more wait for a worker, and callers that can't
+get in within ``PASSWORD_HASH_QUEUE_TIMEOUT`` seconds get
+:class:`HashingBusy` instead of tying up their thread.
+
+The scheme and work factor come from config. Hashes made with another
+scheme or a lower cost still verify and are reported for re-hashing.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from flask import Flask
+from passlib.context import CryptContext
+
+from .metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_QUEUE_TIME, PASSWORD_HASHES
+
+
+# Always accepted for verification so switching schemes doesn't lock anyone out
+KNOWN_SCHEMES = ("argon2", "bcrypt")
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def build_context(scheme: str = "bcrypt", bcrypt_rounds: int = 12, argon2_time_cost: int = 3,
+                  argon2_memory_kb: int = 65536) -> CryptContext:
+    schemes = [scheme] + [s for s in KNOWN_SCHEMES if s != scheme]
+    return CryptContext(
+        schemes=schemes,
+        default=scheme,
+        deprecated="auto",
+        # min_* makes hashes below the configured cost count as outdated
+        bcrypt__rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        argon2__rounds=argon2_time_cost,
+        argon2__min_rounds=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_kb,
+    )
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.context = build_context()
+        self.queue_timeout = 5.0
+        self._workers = 2
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._admission = threading.BoundedSemaphore(2 + 32)
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        scheme = app.config.get("PASSWORD_HASH_SCHEME", "bcrypt")
+        if scheme == "argon2":
+            try:
+                import argon2  # noqa: F401
+            except ImportError:
+                app.logger.warning("PASSWORD_HASH_SCHEME=argon2 needs argon2-cffi; using bcrypt")
+                scheme = "bcrypt"
+        self.context = build_context(
+            scheme,
+            app.config.get("PASSWORD_BCRYPT_ROUNDS", 12),
+            app.config.get("PASSWORD_ARGON2_TIME_COST", 3),
+            app.config.get("PASSWORD_ARGON2_MEMORY_KB", 65536),
+        )
+        self.queue_timeout = app.config.get("PASSWORD_HASH_QUEUE_TIMEOUT", 5)
+        self._workers = app.config.get("PASSWORD_HASH_WORKERS", 2)
+        self._admission = threading.BoundedSemaphore(self._workers + app.config.get("PASSWORD_HASH_MAX_QUEUE", 32))
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+        app.extensions["password_hasher"] = self
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="password-hash")
+            return self._executor
+
+    def _run(self, operation: str, func: Callable, *args):
+        if not self._admission.acquire(timeout=self.queue_timeout):
+            PASSWORD_HASHES.labels(operation, "busy").inc()
+            raise HashingBusy("Too many password operations in progress; try again shortly")
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            PASSWORD_HASH_QUEUE_TIME.observe(started - submitted)
+            try:
+                return func(*args)
+            finally:
+                PASSWORD_HASH_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+        try:
+            future = self._get_executor().submit(job)
+        except RuntimeError:
+            self._admission.release()
+            raise
+        future.add_done_callback(lambda _: self._admission.release())
+        result = future.result()
+        PASSWORD_HASHES.labels(operation, "ok").inc()
+        return result
+
+    def hash(self, password: str) -> str:
+        return self._run("hash", self.context.hash, password)
+
+    def verify(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """Check ``password``; on success also return a new hash if the stored one is outdated"""
+        return self._run("verify", self.context.verify_and_update, password, password_hash)
+
+
+hasher = PasswordHasher()
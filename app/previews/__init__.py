@@ -0,0 +1 @@
+# Thumbnail previews for uploaded files
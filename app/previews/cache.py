@@ -0,0 +1,101 @@
+"""Content-addressed on-disk thumbnail cache.
+
+Files live at ``<root>/ab/cd/<sha256>-<px>.<fmt>`` keyed by the digest of
+the source file, so identical uploads share thumbnails and a key never
+changes meaning. Hits bump the file's mtime (at most hourly) and the
+least recently used files are evicted once the cache exceeds its size cap.
+"""
+import os
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from flask import Flask, current_app
+
+
+# Evict down to this fraction of the cap so every write doesn't trigger a scan
+LOW_WATER = 0.9
+TOUCH_INTERVAL = 3600
+
+
+class PreviewCache:
+    def __init__(self):
+        self.root: Optional[str] = None
+        self.max_bytes = 1024 * 1024 * 1024
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.root = os.path.abspath(app.config.get("PREVIEW_CACHE_DIR") or os.path.join(app.instance_path, "previews"))
+        self.max_bytes = int(app.config.get("PREVIEW_CACHE_MAX_MB", 1024)) * 1024 * 1024
+        self._size = None
+        app.extensions["preview_cache"] = self
+
+    def path_for(self, digest: str, size: int, fmt: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}-{size}.{fmt}")
+
+    def lookup(self, path: str) -> bool:
+        """Whether ``path`` is cached, marking it recently used"""
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        if time.time() - mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def added(self, paths: Iterable[str]) -> None:
+        """Account for newly written files, evicting if over the cap"""
+        added = 0
+        for path in paths:
+            try:
+                added += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += added
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self) -> int:
+        """Remove least recently used files until under the low-water mark"""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * LOW_WATER) if total > self.max_bytes else total
+            removed = 0
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._size = total
+        if removed:
+            current_app.logger.info(f"Evicted {removed} cached previews")
+        return removed
+
+
+cache = PreviewCache()
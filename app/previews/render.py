@@ -0,0 +1,122 @@
+"""Thumbnail rendering, run inside child processes by :mod:`app.extraction.pool`.
+
+The source is decoded once and every requested size is written from it.
+Pillow can't rasterize PDFs: the first page is rendered with poppler's
+``pdftoppm`` when it is installed, otherwise the largest image embedded in
+the first page is used.
+"""
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import List, Tuple
+
+from ..extraction.extractors import InvalidContent
+
+
+def _load_image(path: str, max_size: int):
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        image = Image.open(path)
+        # JPEGs can decode straight to a reduced scale, much cheaper than resizing later
+        image.draft("RGB", (max_size, max_size))
+        image.seek(0)
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise InvalidContent(f"Unreadable image: {e}")
+    return image
+
+
+def _load_pdf(path: str, max_size: int):
+    from PIL import Image
+
+    pdftoppm = shutil.which("pdftoppm")
+    if pdftoppm:
+        with tempfile.TemporaryDirectory() as tmp:
+            prefix = os.path.join(tmp, "page")
+            result = subprocess.run(
+                [pdftoppm, "-f", "1", "-l", "1", "-png", "-singlefile", "-scale-to", str(max_size), path, prefix],
+                capture_output=True,
+            )
+            if result.returncode == 0:
+                with Image.open(prefix + ".png") as page:
+                    page.load()
+                    return page.copy()
+
+    from PyPDF2 import PdfReader
+    from PyPDF2.errors import PdfReadError
+
+    try:
+        reader = PdfReader(path)
+        if reader.is_encrypted and not reader.decrypt(""):
+            raise InvalidContent("PDF is password protected")
+        images = list(reader.pages[0].images) if reader.pages else []
+    except PdfReadError as e:
+        raise InvalidContent(f"Unreadable PDF: {e}")
+    except Exception as e:
+        # PyPDF2 raises assorted errors on odd image encodings
+        raise InvalidContent(f"PDF page images unreadable: {e}")
+    if not images:
+        raise InvalidContent("No preview for PDF: first page has no images and pdftoppm is not installed")
+    best = max(images, key=lambda embedded: len(embedded.data))
+    image = Image.open(io.BytesIO(best.data))
+    image.load()
+    return image
+
+
+def _load_video(path: str, max_size: int):
+    from moviepy.editor import VideoFileClip
+    from PIL import Image
+
+    try:
+        clip = VideoFileClip(path, audio=False)
+    except (OSError, KeyError, IndexError) as e:
+        raise InvalidContent(f"Unreadable video: {e}")
+    try:
+        # Skip the first second, often a black or title frame
+        duration = clip.duration or 0
+        frame = clip.get_frame(min(1.0, duration / 2))
+    finally:
+        clip.close()
+    return Image.fromarray(frame)
+
+
+LOADERS = {
+    "image": _load_image,
+    "pdf": _load_pdf,
+    "video": _load_video,
+}
+
+
+def _flatten(image):
+    from PIL import Image
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB") if image.mode != "RGB" else image
+
+
+def render_previews(path: str, kind: str, targets: List[Tuple[int, str]], fmt: str = "webp", quality: int = 80) -> List[str]:
+    """Write a thumbnail of ``path`` for each ``(max_size, out_path)`` target"""
+    from PIL import Image
+
+    if kind not in LOADERS:
+        raise InvalidContent(f"No preview for {kind} files")
+    largest = max(size for size, _ in targets)
+    image = _flatten(LOADERS[kind](path, largest))
+
+    written = []
+    # Largest first so each size is downscaled from the previous one
+    for size, out_path in sorted(targets, reverse=True):
+        image.thumbnail((size, size), Image.LANCZOS)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        tmp_path = f"{out_path}.{os.getpid()}.tmp"
+        image.save(tmp_path, format=fmt.upper(), quality=quality)
+        os.replace(tmp_path, out_path)
+        written.append(out_path)
+    return written
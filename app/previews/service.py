@@ -0,0 +1,131 @@
+import hashlib
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from flask import current_app
+
+from ..extensions import db
+from ..extraction.extractors import ExtractionError, InvalidContent, kind_for
+from ..extraction.pool import pool
+from ..models import Resource
+from .cache import cache
+from .render import LOADERS, render_previews
+
+
+DEFAULT_SIZES = {"small": 128, "medium": 320, "large": 1024}
+
+# Digest -> lock, so concurrent requests for a new file render it once
+_render_locks: Dict[str, threading.Lock] = {}
+_render_locks_guard = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def preview_sizes() -> Dict[str, int]:
+    return current_app.config.get("PREVIEW_SIZES") or DEFAULT_SIZES
+
+
+def preview_kind(resource: Resource) -> Optional[str]:
+    if not resource.path:
+        return None
+    kind = kind_for(resource.path, resource.file_type)
+    return kind if kind in LOADERS else None
+
+
+def source_digest(resource: Resource) -> str:
+    """SHA-256 of the resource's file; computed once for files uploaded before content addressing"""
+    digest = resource.file_sha256 or (resource.metadata_json or {}).get("sha256")
+    if not digest:
+        digest = file_digest(resource.path)
+        resource.metadata_json = {**(resource.metadata_json or {}), "sha256": digest}
+    return digest
+
+
+def _set_status(resource: Resource, status: str, **fields) -> None:
+    preview = {"status": status, "updated_at": datetime.utcnow().isoformat(), **fields}
+    resource.metadata_json = {**(resource.metadata_json or {}), "preview": preview}
+
+
+def _render(path: str, kind: str, digest: str) -> None:
+    fmt = current_app.config.get("PREVIEW_FORMAT", "webp")
+    targets = [(px, cache.path_for(digest, px, fmt)) for px in sorted(set(preview_sizes().values()))]
+    with _render_locks_guard:
+        lock = _render_locks.setdefault(digest, threading.Lock())
+    try:
+        with lock:
+            missing = [(px, out) for px, out in targets if not os.path.exists(out)]
+            if missing:
+                written = pool.call(
+                    "preview", render_previews, path, kind, missing,
+                    fmt=fmt, quality=current_app.config.get("PREVIEW_QUALITY", 80)
+                )
+                cache.added(written)
+    finally:
+        with _render_locks_guard:
+            _render_locks.pop(digest, None)
+
+
+def get_preview(resource: Resource, size: str) -> Optional[str]:
+    """Path of the cached ``size`` thumbnail, rendering all sizes on a miss.
+
+    Returns None when the file can't have a preview; raises
+    :class:`ExtractionError` when rendering failed but may succeed later.
+    """
+    kind = preview_kind(resource)
+    if kind is None or not os.path.exists(resource.path):
+        return None
+    if (resource.metadata_json or {}).get("preview", {}).get("status") == "failed":
+        return None
+    had_digest = bool(resource.file_sha256 or (resource.metadata_json or {}).get("sha256"))
+    digest = source_digest(resource)
+    fmt = current_app.config.get("PREVIEW_FORMAT", "webp")
+    path = cache.path_for(digest, preview_sizes()[size], fmt)
+    if cache.lookup(path):
+        if not had_digest:
+            db.session.commit()
+        return path
+
+    source = resource.path
+    # Don't hold a transaction open while the child process works
+    db.session.commit()
+    try:
+        _render(source, kind, digest)
+    except InvalidContent as e:
+        _set_status(resource, "failed", error=str(e))
+        db.session.commit()
+        current_app.logger.info(f"Resource {resource.id} has no preview: {e}")
+        return None
+    return path
+
+
+def generate_previews(resource_id: int) -> bool:
+    """Render every thumbnail size for a freshly uploaded resource"""
+    resource = db.session.get(Resource, resource_id)
+    if resource is None:
+        return False
+    kind = preview_kind(resource)
+    if kind is None or not os.path.exists(resource.path):
+        return False
+    digest = source_digest(resource)
+    source = resource.path
+    db.session.commit()
+    try:
+        _render(source, kind, digest)
+    except InvalidContent as e:
+        _set_status(resource, "failed", error=str(e))
+        db.session.commit()
+        return False
+    except ExtractionError as e:
+        current_app.logger.warning(f"Preview rendering for resource {resource_id} failed: {e}")
+        raise
+    _set_status(resource, "done")
+    db.session.commit()
+    return True
@@ -0,0 +1,145 @@
+import json
+import queue
+import threading
+from collections import defaultdict
+from typing import Dict, Set
+
+from flask import Flask, current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .metrics import SSE_SUBSCRIBERS
+from .models import Notification
+
+
+def serialize_notification(n: Notification) -> dict:
+    return {
+        "id": n.id,
+        "title": n.title,
+        "message": n.message,
+        "notification_type": n.notification_type,
+        "is_read": n.is_read,
+        "action_url": n.action_url,
+        "metadata": n.metadata_json,
+        "created_at": n.created_at.isoformat(),
+        "read_at": n.read_at.isoformat() if n.read_at else None,
+    }
+
+
+class MemoryBackend:
+    """Delivers events to subscribers in this process only"""
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, user_id: int, payload: dict) -> None:
+        self.deliver(user_id, payload)
+
+    def close(self) -> None:
+        pass
+
+
+class RedisBackend:
+    """Fans events out to every process through a Redis channel"""
+
+    def __init__(self, url: str, deliver, channel: str = "notifications"):
+        import redis
+
+        self.deliver = deliver
+        self.channel = channel
+        self.client = redis.Redis.from_url(url)
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{channel: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def _on_message(self, message) -> None:
+        data = json.loads(message["data"])
+        self.deliver(data["user_id"], data["payload"])
+
+    def publish(self, user_id: int, payload: dict) -> None:
+        self.client.publish(self.channel, json.dumps({"user_id": user_id, "payload": payload}))
+
+    def close(self) -> None:
+        self._thread.stop()
+        self._pubsub.close()
+
+
+class NotificationHub:
+    """Per-user subscriber queues fed by a pluggable backend"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[queue.Queue]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self.backend = MemoryBackend(self._deliver)
+        self.queue_size = 100
+
+    def init_app(self, app: Flask) -> None:
+        self.queue_size = app.config.get("SSE_QUEUE_SIZE", 100)
+        url = app.config.get("NOTIFICATION_PUBSUB_URL", "memory://")
+        if url.startswith("redis"):
+            self.backend.close()
+            self.backend = RedisBackend(url, self._deliver)
+        app.extensions["notification_hub"] = self
+
+    def subscribe(self, user_id: int) -> queue.Queue:
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[user_id].add(q)
+        SSE_SUBSCRIBERS.inc()
+        return q
+
+    def unsubscribe(self, user_id: int, q: queue.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None and q in subscribers:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[user_id]
+                SSE_SUBSCRIBERS.dec()
+
+    def publish(self, user_id: int, payload: dict) -> None:
+        self.backend.publish(user_id, payload)
+
+    def _deliver(self, user_id: int, payload: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for q in subscribers:
+            try:
+                q.put_nowait(payload)
+            except queue.Full:
+                # A stalled client resumes from Last-Event-ID on reconnect
+                pass
+
+
+hub = NotificationHub()
+
+
+def _collect_new_notifications(session: Session, flush_context) -> None:
+    new = [obj for obj in session.new if isinstance(obj, Notification)]
+    if new:
+        pending = session.info.setdefault("published_notifications", [])
+        # Serialize now: after commit the objects are expired and can't load
+        pending.extend((n.user_id, serialize_notification(n)) for n in new)
+
+
+def _publish_after_commit(session: Session) -> None:
+    pending = session.info.pop("published_notifications", None)
+    if not pending:
+        return
+    for user_id, payload in pending:
+        try:
+            hub.publish(user_id, payload)
+        except Exception as e:
+            current_app.logger.error(f"Failed to publish notification {payload['id']}: {e}")
+
+
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("published_notifications", None)
+
+
+def init_app(app: Flask) -> None:
+    hub.init_app(app)
+    if not event.contains(Session, "after_flush", _collect_new_notifications):
+        event.listen(Session, "after_flush", _collect_new_notifications)
+        event.listen(Session, "after_commit", _publish_after_commit)
+        event.listen(Session, "after_rollback", _discard_after_rollback)
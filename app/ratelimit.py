@@ -0,0 +1,210 @@
+"""Rate-limit keys, request costs and a shared SQLite counter store.
+
+Flask-Limiter's default in-process memory store gives every worker its own
+counters, so N workers allow N times ``RATELIMIT_DEFAULT`` and a restart
+forgets everything. :class:`SQLiteStorage` registers a ``sqlite:///path``
+storage scheme that every worker on a node shares through one WAL-mode
+database file; clusters point ``RATELIMIT_STORAGE_URI`` at a networked
+store supported by ``limits`` instead (``redis://``, ``memcached://``, ...).
+
+Authenticated requests are limited per JWT identity, anonymous ones per
+client address, and each request counts ``RATELIMIT_COSTS[endpoint]``
+against the moving window (1 when unlisted).
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+from flask import Flask, current_app, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from flask_limiter.util import get_remote_address
+from jwt.exceptions import PyJWTError
+from limits.storage import MovingWindowSupport, Storage
+
+
+# Endpoint -> units one request consumes; RATELIMIT_COSTS entries override these
+DEFAULT_COSTS = {
+    "reports.exportdataresource": 10,
+    "resources.resourceimportresource": 10,
+    "goals.goalplanresource": 5,
+    "auth.loginresource": 3,
+    "auth.registerresource": 3,
+}
+
+# Expired rows are swept at most this often per process
+PURGE_INTERVAL = 60
+
+
+def rate_limit_key() -> str:
+    """JWT identity for authenticated requests, client address otherwise"""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except (JWTExtendedException, PyJWTError):
+        # Expired or malformed tokens are rejected by the view itself
+        identity = None
+    if identity is not None:
+        return f"user:{identity}"
+    return f"ip:{get_remote_address()}"
+
+
+def request_cost() -> int:
+    overrides = current_app.config.get("RATELIMIT_COSTS") or {}
+    return int(overrides.get(request.endpoint, DEFAULT_COSTS.get(request.endpoint, 1)))
+
+
+class SQLiteStorage(Storage, MovingWindowSupport):
+    """Fixed and moving window counters in a SQLite file shared by local workers.
+
+    Every check-and-increment runs in a ``BEGIN IMMEDIATE`` transaction, so
+    concurrent workers serialize on the database write lock and never both
+    take the last unit of a window.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS ratelimit_counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS ratelimit_entries (key TEXT NOT NULL, ts REAL NOT NULL, amount INTEGER NOT NULL, expires_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_ratelimit_entries_key_ts ON ratelimit_entries (key, ts)",
+        "CREATE INDEX IF NOT EXISTS ix_ratelimit_entries_expires ON ratelimit_entries (expires_at)",
+    ]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, timeout: float = 5.0, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        # sqlite:///relative.db or sqlite:////absolute/path.db, as with SQLAlchemy URLs
+        self.path = uri.split("://", 1)[1][1:] or ":memory:"
+        self.timeout = float(timeout)
+        self._local = threading.local()
+        self._last_purge = 0.0
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        # Per thread, and re-opened in forked workers rather than shared with the parent
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def _purge(self, conn: sqlite3.Connection, now: float) -> None:
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        conn.execute("DELETE FROM ratelimit_entries WHERE expires_at <= ?", (now,))
+        conn.execute("DELETE FROM ratelimit_counters WHERE expires_at <= ?", (now,))
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        conn = self._transaction()
+        try:
+            conn.execute(
+                """
+                INSERT INTO ratelimit_counters (key, value, expires_at) VALUES (?1, ?2, ?3 + ?4)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = CASE WHEN expires_at <= ?3 THEN excluded.value ELSE value + excluded.value END,
+                    expires_at = CASE WHEN expires_at <= ?3 THEN excluded.expires_at ELSE expires_at END
+                """,
+                (key, amount, now, expiry),
+            )
+            value = conn.execute("SELECT value FROM ratelimit_counters WHERE key = ?", (key,)).fetchone()[0]
+            self._purge(conn, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def get(self, key: str) -> int:
+        row = self._connection().execute(
+            "SELECT value FROM ratelimit_counters WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = self._connection().execute(
+            "SELECT expires_at FROM ratelimit_counters WHERE key = ?", (key,)
+        ).fetchone()
+        return max(row[0], time.time()) if row else time.time()
+
+    def acquire_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        conn = self._transaction()
+        try:
+            conn.execute("DELETE FROM ratelimit_entries WHERE key = ? AND ts <= ?", (key, now - expiry))
+            used = conn.execute(
+                "SELECT COALESCE(SUM(amount), 0) FROM ratelimit_entries WHERE key = ?", (key,)
+            ).fetchone()[0]
+            acquired = used + amount <= limit
+            if acquired:
+                conn.execute(
+                    "INSERT INTO ratelimit_entries (key, ts, amount, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, now, amount, now + expiry),
+                )
+            self._purge(conn, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return acquired
+
+    def get_moving_window(self, key: str, limit: int, expiry: int) -> Tuple[float, int]:
+        now = time.time()
+        oldest, used = self._connection().execute(
+            "SELECT MIN(ts), COALESCE(SUM(amount), 0) FROM ratelimit_entries WHERE key = ? AND ts > ?",
+            (key, now - expiry),
+        ).fetchone()
+        return (oldest if oldest is not None else now), used
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        conn = self._transaction()
+        try:
+            count = conn.execute("DELETE FROM ratelimit_entries").rowcount
+            count += conn.execute("DELETE FROM ratelimit_counters").rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def clear(self, key: str) -> None:
+        conn = self._transaction()
+        try:
+            conn.execute("DELETE FROM ratelimit_entries WHERE key = ?", (key,))
+            conn.execute("DELETE FROM ratelimit_counters WHERE key = ?", (key,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def configure(app: Flask) -> None:
+    """Default to a node-local shared store; call before ``limiter.init_app``"""
+    if not app.config.get("RATELIMIT_STORAGE_URI"):
+        app.config["RATELIMIT_STORAGE_URI"] = "sqlite:///" + os.path.join(app.instance_path, "ratelimit.db")
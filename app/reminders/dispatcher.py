@@ -0,0 +1,153 @@
+import heapq
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask, current_app
+
+from ..extensions import db
+from ..metrics import track_job
+from ..models import Reminder
+
+
+class ReminderDispatcher:
+    """Fires reminders at their ``next_reminder`` time instead of polling.
+
+    Keeps a heap of reminders due within ``REMINDER_DISPATCH_HORIZON`` and
+    sleeps until the earliest one. Routes call :meth:`notify` after a
+    reminder is created, updated or deleted; a slow safety poll reloads the
+    horizon to pick up changes made by other processes.
+    """
+
+    def __init__(self):
+        self.app: Optional[Flask] = None
+        self._heap: List[Tuple[datetime, int]] = []
+        self._scheduled: Dict[int, datetime] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self._needs_reload = True
+        self._last_reload: Optional[datetime] = None
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        self.horizon = timedelta(seconds=app.config.get("REMINDER_DISPATCH_HORIZON", 3600))
+        self.safety_poll = timedelta(seconds=app.config.get("REMINDER_SAFETY_POLL_INTERVAL", 600))
+        self.batch_size = app.config.get("REMINDER_DISPATCH_BATCH_SIZE", 100)
+        app.extensions["reminder_dispatcher"] = self
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="reminder-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+
+    def notify(self, reminder_id: int, next_reminder: Optional[datetime], is_active: bool = True) -> None:
+        """Record a reminder change; pass ``next_reminder=None`` for deletes"""
+        with self._cond:
+            if next_reminder is None or not is_active:
+                self._scheduled.pop(reminder_id, None)
+                return
+            if next_reminder > datetime.utcnow() + self.horizon:
+                self._scheduled.pop(reminder_id, None)
+                return
+            self._scheduled[reminder_id] = next_reminder
+            heapq.heappush(self._heap, (next_reminder, reminder_id))
+            # Wake the loop in case this is now the earliest reminder
+            self._cond.notify()
+
+    def refresh(self) -> None:
+        """Reload the horizon from the database on the next loop iteration"""
+        with self._cond:
+            self._needs_reload = True
+            self._cond.notify()
+
+    def _reload(self) -> None:
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            db.select(Reminder.id, Reminder.next_reminder).where(
+                Reminder.is_active == True,
+                Reminder.next_reminder <= now + self.horizon
+            ).order_by(Reminder.next_reminder)
+        ).all()
+        with self._cond:
+            self._scheduled = {row.id: row.next_reminder for row in rows}
+            self._heap = [(when, reminder_id) for reminder_id, when in self._scheduled.items()]
+            heapq.heapify(self._heap)
+            self._needs_reload = False
+            self._last_reload = now
+
+    def _pop_due(self, now: datetime) -> List[int]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, reminder_id = heapq.heappop(self._heap)
+            # Skip stale heap entries left behind by updates and deletes
+            if self._scheduled.get(reminder_id) != when:
+                continue
+            del self._scheduled[reminder_id]
+            due.append(reminder_id)
+        return due
+
+    def _next_wakeup(self, now: datetime) -> float:
+        wake_at = self._last_reload + self.safety_poll
+        if self._heap:
+            wake_at = min(wake_at, self._heap[0][0])
+        return max((wake_at - now).total_seconds(), 0)
+
+    def _dispatch(self, reminder_ids: List[int]) -> None:
+        from ..tasks import process_reminders
+
+        run = track_job("process_reminders", process_reminders)
+        for i in range(0, len(reminder_ids), self.batch_size):
+            run(reminder_ids[i:i + self.batch_size])
+
+    def _run(self) -> None:
+        while True:
+            with self.app.app_context():
+                try:
+                    now = datetime.utcnow()
+                    if self._needs_reload or now >= self._last_reload + self.safety_poll:
+                        self._reload()
+                    with self._cond:
+                        due = self._pop_due(datetime.utcnow())
+                    if due:
+                        self._dispatch(due)
+                except Exception as e:
+                    current_app.logger.error(f"Reminder dispatcher error: {e}")
+                    # Retry on the next safety poll rather than spinning
+                    self._needs_reload = False
+                    self._last_reload = datetime.utcnow()
+                finally:
+                    db.session.remove()
+
+            with self._cond:
+                if self._stop:
+                    return
+                if not self._needs_reload:
+                    self._cond.wait(self._next_wakeup(datetime.utcnow()))
+                if self._stop:
+                    return
+
+
+dispatcher = ReminderDispatcher()
+
+
+def notify_reminder_changed(reminder: Reminder) -> None:
+    """Tell the in-process dispatcher about a committed reminder change"""
+    if dispatcher.running:
+        dispatcher.notify(reminder.id, reminder.next_reminder, reminder.is_active)
+
+
+def notify_reminder_deleted(reminder_id: int) -> None:
+    if dispatcher.running:
+        dispatcher.notify(reminder_id, None)
@@ -0,0 +1,285 @@
+"""Recurrence rules for reminders.
+
+Rules are validated and compiled once, when a reminder is created or
+updated, into a normalized dict stored in ``Reminder.recurrence``::
+
+    {"freq": "weekly", "interval": 2, "byweekday": [0, 2], "byhour": [9],
+     "byminute": [0], "until": "2025-12-31T00:00:00", "count": None,
+     "tz": "Europe/Berlin", "dtstart": "2025-01-06T09:00:00"}
+
+``dtstart`` is in the rule's local time, ``until`` in UTC. Accepted inputs
+are RRULE-style strings (``FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;BYHOUR=9``)
+and the legacy "N hours/days/weeks" shorthand.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+FREQUENCIES = ("hourly", "daily", "weekly")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+MAX_INTERVAL = 1000
+
+# Upper bound on candidate steps when searching for the next occurrence
+_MAX_STEPS = 5000
+
+
+class RecurrenceError(ValueError):
+    pass
+
+
+def _parse_int_list(value: str, low: int, high: int, name: str) -> List[int]:
+    try:
+        items = sorted({int(v) for v in value.split(",") if v.strip()})
+    except ValueError:
+        raise RecurrenceError(f"{name} must be a comma-separated list of integers")
+    if not items or items[0] < low or items[-1] > high:
+        raise RecurrenceError(f"{name} values must be between {low} and {high}")
+    return items
+
+
+def _parse_until(value: str) -> str:
+    value = value.strip().upper()
+    for fmt in ("%Y%m%dT%H%M%SZ", "%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            return datetime.strptime(value, fmt).isoformat()
+        except ValueError:
+            pass
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise RecurrenceError("UNTIL must be a date or UTC timestamp")
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+def _parse_shorthand(text: str) -> Dict:
+    parts = text.lower().split()
+    if parts and parts[0] == "every":
+        parts = parts[1:]
+    if len(parts) == 1:
+        parts = ["1"] + parts
+    if len(parts) != 2:
+        raise RecurrenceError("Frequency must look like '3 days' or 'FREQ=DAILY;INTERVAL=3'")
+    try:
+        amount = int(parts[0])
+    except ValueError:
+        raise RecurrenceError(f"Invalid interval: {parts[0]}")
+    unit = parts[1].rstrip("s")
+    units = {"hour": "hourly", "day": "daily", "week": "weekly"}
+    if unit not in units:
+        raise RecurrenceError(f"Unsupported unit: {parts[1]}")
+    return {"freq": units[unit], "interval": amount}
+
+
+def _parse_rrule(text: str) -> Dict:
+    rule: Dict = {}
+    for part in text.split(";"):
+        if not part.strip():
+            continue
+        if "=" not in part:
+            raise RecurrenceError(f"Malformed rule part: {part}")
+        key, value = (p.strip() for p in part.split("=", 1))
+        key = key.upper()
+        if key == "FREQ":
+            rule["freq"] = value.lower()
+        elif key == "INTERVAL":
+            try:
+                rule["interval"] = int(value)
+            except ValueError:
+                raise RecurrenceError("INTERVAL must be an integer")
+        elif key == "BYDAY":
+            days = [d.strip().upper() for d in value.split(",") if d.strip()]
+            if not days or any(d not in WEEKDAYS for d in days):
+                raise RecurrenceError("BYDAY must list weekdays like MO,WE,FR")
+            rule["byweekday"] = sorted({WEEKDAYS.index(d) for d in days})
+        elif key == "BYHOUR":
+            rule["byhour"] = _parse_int_list(value, 0, 23, "BYHOUR")
+        elif key == "BYMINUTE":
+            rule["byminute"] = _parse_int_list(value, 0, 59, "BYMINUTE")
+        elif key == "UNTIL":
+            rule["until"] = _parse_until(value)
+        elif key == "COUNT":
+            try:
+                rule["count"] = int(value)
+            except ValueError:
+                raise RecurrenceError("COUNT must be an integer")
+        elif key == "TZID":
+            rule["tz"] = value
+        else:
+            raise RecurrenceError(f"Unsupported rule part: {key}")
+    if "freq" not in rule:
+        raise RecurrenceError("FREQ is required")
+    return rule
+
+
+@lru_cache(maxsize=1024)
+def _parse_frequency(text: str) -> Dict:
+    text = text.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[6:]
+    if "=" in text:
+        return _parse_rrule(text)
+    return _parse_shorthand(text)
+
+
+def compile_rule(reminder_type: str, frequency: Optional[str], dtstart: datetime, tz: Optional[str] = None) -> Optional[Dict]:
+    """Validate a reminder's schedule and return its normalized rule.
+
+    ``dtstart`` is the first occurrence in UTC. Returns None for one-shot
+    (deadline) reminders. Raises :class:`RecurrenceError` on invalid input.
+    """
+    if reminder_type == "deadline":
+        return None
+    if frequency:
+        rule = dict(_parse_frequency(frequency))
+    elif reminder_type == "daily":
+        rule = {"freq": "daily"}
+    elif reminder_type == "weekly":
+        rule = {"freq": "weekly"}
+    else:
+        raise RecurrenceError("Custom reminders require a frequency")
+
+    if rule["freq"] not in FREQUENCIES:
+        raise RecurrenceError(f"FREQ must be one of {', '.join(f.upper() for f in FREQUENCIES)}")
+    rule.setdefault("interval", 1)
+    if not 1 <= rule["interval"] <= MAX_INTERVAL:
+        raise RecurrenceError(f"INTERVAL must be between 1 and {MAX_INTERVAL}")
+    if rule.get("count") is not None and rule["count"] < 1:
+        raise RecurrenceError("COUNT must be at least 1")
+    if rule.get("count") is not None and rule.get("until"):
+        raise RecurrenceError("COUNT and UNTIL cannot both be set")
+
+    rule["tz"] = rule.get("tz") or tz or "UTC"
+    try:
+        zone = ZoneInfo(rule["tz"])
+    except (ZoneInfoNotFoundError, ValueError):
+        raise RecurrenceError(f"Unknown timezone: {rule['tz']}")
+
+    if dtstart.tzinfo is None:
+        dtstart = dtstart.replace(tzinfo=timezone.utc)
+    rule["dtstart"] = dtstart.astimezone(zone).replace(tzinfo=None, microsecond=0).isoformat()
+    for key in ("byweekday", "byhour", "byminute", "until", "count"):
+        rule.setdefault(key, None)
+    return rule
+
+
+class CompiledRule:
+    """A normalized rule with everything needed to step through occurrences"""
+
+    def __init__(self, rule: Dict):
+        self.freq = rule["freq"]
+        self.interval = rule["interval"]
+        self.zone = ZoneInfo(rule["tz"])
+        self.dtstart = datetime.fromisoformat(rule["dtstart"])
+        self.byweekday = set(rule["byweekday"]) if rule.get("byweekday") else None
+        self.byhour = set(rule["byhour"]) if rule.get("byhour") else None
+        self.hours = rule.get("byhour") or [self.dtstart.hour]
+        self.minutes = rule.get("byminute") or [self.dtstart.minute]
+        self.until = datetime.fromisoformat(rule["until"]) if rule.get("until") else None
+        self.count = rule.get("count")
+
+    def _to_utc(self, local: datetime) -> datetime:
+        return local.replace(tzinfo=self.zone).astimezone(timezone.utc).replace(tzinfo=None)
+
+    def _candidates(self, after_local: datetime) -> Iterable[datetime]:
+        start = self.dtstart
+        if self.freq == "hourly":
+            step = timedelta(hours=self.interval)
+            k = max(int((after_local - start) / step) - 1, 0)
+            for i in range(k, k + _MAX_STEPS):
+                candidate = start + i * step
+                if self.byweekday is None or candidate.weekday() in self.byweekday:
+                    if self.byhour is None or candidate.hour in self.byhour:
+                        yield candidate
+            return
+
+        if self.freq == "daily":
+            period_start = start.date()
+            period_days = self.interval
+            days_in_period = [0]
+        else:
+            period_start = start.date() - timedelta(days=start.weekday())
+            period_days = 7 * self.interval
+            days_in_period = sorted(self.byweekday or {start.weekday()})
+
+        k = max((after_local.date() - period_start).days // period_days - 1, 0)
+        for i in range(k, k + _MAX_STEPS):
+            base = period_start + timedelta(days=i * period_days)
+            for offset in days_in_period:
+                day: date = base + timedelta(days=offset)
+                if self.freq == "daily" and self.byweekday is not None and day.weekday() not in self.byweekday:
+                    continue
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        yield datetime.combine(day, time(hour, minute))
+
+    def next_after(self, after: datetime, sent: int = 0) -> Optional[datetime]:
+        """First occurrence strictly after ``after`` (naive UTC), or None when exhausted.
+
+        ``sent`` is the number of occurrences already delivered, for COUNT.
+        """
+        if self.count is not None and sent >= self.count:
+            return None
+        after_local = after.replace(tzinfo=timezone.utc).astimezone(self.zone).replace(tzinfo=None)
+        for candidate in self._candidates(after_local):
+            if candidate < self.dtstart:
+                continue
+            occurrence = self._to_utc(candidate)
+            if occurrence <= after:
+                continue
+            if self.until is not None and occurrence > self.until:
+                return None
+            return occurrence
+        return None
+
+    def upcoming(self, after: datetime, limit: int = 5, sent: int = 0) -> List[datetime]:
+        occurrences = []
+        while len(occurrences) < limit:
+            after = self.next_after(after, sent + len(occurrences))
+            if after is None:
+                break
+            occurrences.append(after)
+        return occurrences
+
+
+_compiled: Dict[tuple, CompiledRule] = {}
+
+
+def _cache_key(rule: Dict) -> tuple:
+    return tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in sorted(rule.items()))
+
+
+def get_compiled(rule: Dict) -> CompiledRule:
+    key = _cache_key(rule)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        if len(_compiled) > 4096:
+            _compiled.clear()
+        compiled = _compiled[key] = CompiledRule(rule)
+    return compiled
+
+
+def rule_for(reminder) -> Optional[CompiledRule]:
+    """Compiled rule for a reminder, compiling legacy rows on the fly"""
+    rule = reminder.recurrence
+    if rule is None:
+        if reminder.reminder_type == "deadline":
+            return None
+        try:
+            rule = compile_rule(reminder.reminder_type, reminder.frequency, reminder.next_reminder)
+        except RecurrenceError:
+            # Legacy rows predate validation; keep the old daily fallback
+            rule = compile_rule("daily", None, reminder.next_reminder)
+    return get_compiled(rule)
+
+
+def next_occurrences(reminders: Iterable, after: datetime) -> Dict[int, Optional[datetime]]:
+    """Next fire time for each reminder once the current occurrence is sent"""
+    result = {}
+    for reminder in reminders:
+        rule = rule_for(reminder)
+        result[reminder.id] = rule.next_after(after, (reminder.occurrence_count or 0) + 1) if rule else None
+    return result
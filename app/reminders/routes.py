@@ -1,11 +1,21 @@
-from flask import Blueprint, request
+import json
+import queue
+import time
+
+from flask import Blueprint, Response, current_app, request, stream_with_context
 from flask_restful import Api, Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity, get_jwt_request_location, jwt_required
 from datetime import datetime, timedelta
+from marshmallow import ValidationError
 
-from ..extensions import db
-from ..models import Reminder, Notification
-from ..schemas import ReminderCreateSchema, ReminderUpdateSchema
+from ..extensions import db, jwt
+from ..models import Reminder, Notification, User
+from ..pubsub import hub, serialize_notification
+from ..schemas import NotificationBulkSchema, ReminderCreateSchema, ReminderUpdateSchema
+from ..sync.changes import record_tombstones
+from ..unread import adjust_unread, get_unread_count
+from .dispatcher import notify_reminder_changed, notify_reminder_deleted
+from .recurrence import rule_for
 
 bp = Blueprint("reminders", __name__)
 api = Api(bp)
@@ -15,6 +25,10 @@ def _user_id() -> int:
     return int(get_jwt_identity())
 
 
+def _user_timezone() -> str:
+    return db.session.scalar(db.select(User.timezone).where(User.id == _user_id())) or "UTC"
+
+
 class RemindersListResource(Resource):
     @jwt_required()
     def get(self):
@@ -41,10 +55,10 @@ class RemindersListResource(Resource):
     
     @jwt_required()
     def post(self):
-        data = request.get_json() or {}
-        errors = ReminderCreateSchema().validate(data)
-        if errors:
-            return {"errors": errors}, 400
+        try:
+            data = ReminderCreateSchema(context={"timezone": _user_timezone()}).load(request.get_json() or {})
+        except ValidationError as e:
+            return {"errors": e.messages}, 400
             
         reminder = Reminder(
             user_id=_user_id(),
@@ -52,6 +66,7 @@ class RemindersListResource(Resource):
             message=data.get("message", ""),
             reminder_type=data["reminder_type"],
             frequency=data.get("frequency"),
+            recurrence=data["recurrence"],
             next_reminder=data["next_reminder"],
             goal_id=data.get("goal_id"),
             email_enabled=data.get("email_enabled", True),
@@ -59,6 +74,7 @@ class RemindersListResource(Resource):
         )
         db.session.add(reminder)
         db.session.commit()
+        notify_reminder_changed(reminder)
         
         return {"id": reminder.id}, 201
 
@@ -70,13 +86,16 @@ class ReminderResource(Resource):
         if reminder.user_id != _user_id():
             return {"message": "Not found"}, 404
             
+        rule = rule_for(reminder)
         return {
             "id": reminder.id,
             "title": reminder.title,
             "message": reminder.message,
             "reminder_type": reminder.reminder_type,
             "frequency": reminder.frequency,
+            "recurrence": reminder.recurrence,
             "next_reminder": reminder.next_reminder.isoformat(),
+            "upcoming": [dt.isoformat() for dt in rule.upcoming(reminder.next_reminder, sent=reminder.occurrence_count + 1)] if rule and reminder.is_active else [],
             "is_active": reminder.is_active,
             "email_enabled": reminder.email_enabled,
             "in_app_enabled": reminder.in_app_enabled,
@@ -90,16 +109,20 @@ class ReminderResource(Resource):
         if reminder.user_id != _user_id():
             return {"message": "Not found"}, 404
             
-        data = request.get_json() or {}
-        errors = ReminderUpdateSchema().validate(data)
-        if errors:
-            return {"errors": errors}, 400
+        try:
+            data = ReminderUpdateSchema(context={"reminder": reminder, "timezone": _user_timezone()}).load(request.get_json() or {})
+        except ValidationError as e:
+            return {"errors": e.messages}, 400
             
-        for key in ["title", "message", "reminder_type", "frequency", "next_reminder", "is_active", "email_enabled", "in_app_enabled"]:
+        if "recurrence" in data:
+            # A new schedule restarts COUNT
+            reminder.occurrence_count = 0
+        for key in ["title", "message", "reminder_type", "frequency", "recurrence", "next_reminder", "is_active", "email_enabled", "in_app_enabled"]:
             if key in data:
                 setattr(reminder, key, data[key])
                 
         db.session.commit()
+        notify_reminder_changed(reminder)
         return {"message": "updated"}, 200
     
     @jwt_required()
@@ -110,6 +133,7 @@ class ReminderResource(Resource):
             
         db.session.delete(reminder)
         db.session.commit()
+        notify_reminder_deleted(reminder_id)
         return {"message": "deleted"}, 200
 
 
@@ -120,20 +144,104 @@ class NotificationsListResource(Resource):
             db.select(Notification).where(Notification.user_id == _user_id()).order_by(Notification.created_at.desc()).limit(50)
         ).all()
         
-        return [
-            {
-                "id": n.id,
-                "title": n.title,
-                "message": n.message,
-                "notification_type": n.notification_type,
-                "is_read": n.is_read,
-                "action_url": n.action_url,
-                "metadata": n.metadata_json,
-                "created_at": n.created_at.isoformat(),
-                "read_at": n.read_at.isoformat() if n.read_at else None,
-            }
-            for n in notifications
-        ]
+        return [serialize_notification(n) for n in notifications]
+
+
+def _sse_event(payload: dict) -> str:
+    return f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+
+
+# Claim marking the short-lived tokens EventSource passes as ?jwt=
+STREAM_SCOPE = "notifications:stream"
+STREAM_ENDPOINT = "reminders.notificationstreamresource"
+
+
+@jwt.token_verification_loader
+def _check_token_scope(jwt_header, jwt_data) -> bool:
+    # Stream tokens travel in URLs and logs, so they open the stream and nothing else
+    scope = jwt_data.get("scope")
+    return scope is None or (scope == STREAM_SCOPE and request.endpoint == STREAM_ENDPOINT)
+
+
+class NotificationStreamTokenResource(Resource):
+    @jwt_required()
+    def post(self):
+        """Short-lived token for opening the notification stream from EventSource"""
+        expires = current_app.config.get("SSE_TOKEN_EXPIRES", 60)
+        token = create_access_token(
+            identity=get_jwt_identity(),
+            expires_delta=timedelta(seconds=expires),
+            additional_claims={"scope": STREAM_SCOPE},
+        )
+        return {"token": token, "expires_in": expires}, 200
+
+
+class NotificationStreamResource(Resource):
+    @jwt_required(locations=["headers", "query_string"])
+    def get(self):
+        """Server-Sent Events stream of new notifications"""
+        if get_jwt_request_location() == "query_string" and get_jwt().get("scope") != STREAM_SCOPE:
+            return {"message": "Use a token from /notifications/stream-token in the query string"}, 401
+        user_id = _user_id()
+        config = current_app.config
+        heartbeat = config.get("SSE_HEARTBEAT_INTERVAL", 15)
+        max_duration = config.get("SSE_MAX_DURATION", 300)
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+
+        # Subscribe before reading the backlog so nothing slips in between
+        subscription = hub.subscribe(user_id)
+        backlog = []
+        if last_event_id and last_event_id.isdigit():
+            backlog = [
+                serialize_notification(n)
+                for n in db.session.scalars(
+                    db.select(Notification).where(
+                        Notification.user_id == user_id,
+                        Notification.id > int(last_event_id)
+                    ).order_by(Notification.id).limit(100)
+                )
+            ]
+        # Don't pin a pooled connection for the lifetime of the stream
+        db.session.remove()
+
+        def stream():
+            sent_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+            deadline = time.monotonic() + max_duration
+            try:
+                yield f"retry: {config.get('SSE_RETRY_MS', 5000)}\n\n"
+                for payload in backlog:
+                    sent_id = max(sent_id, payload["id"])
+                    yield _sse_event(payload)
+                while time.monotonic() < deadline:
+                    try:
+                        payload = subscription.get(timeout=heartbeat)
+                    except queue.Empty:
+                        yield ": heartbeat\n\n"
+                        continue
+                    if payload["id"] <= sent_id:
+                        continue
+                    sent_id = payload["id"]
+                    yield _sse_event(payload)
+                # Ending the response makes the client reconnect with Last-Event-ID,
+                # which frees this worker thread periodically.
+            finally:
+                hub.unsubscribe(user_id, subscription)
+
+        response = Response(stream_with_context(stream()), mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+
+class UnreadCountResource(Resource):
+    @jwt_required()
+    def get(self):
+        """Unread badge count; clients poll with If-None-Match"""
+        unread = get_unread_count(_user_id())
+        response = Response(json.dumps({"unread": unread}), mimetype="application/json")
+        response.set_etag(f"unread-{_user_id()}-{unread}")
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response.make_conditional(request)
 
 
 class NotificationResource(Resource):
@@ -152,36 +260,96 @@ class NotificationResource(Resource):
         return {"message": "marked as read"}, 200
 
 
+def _bulk_filters(data: dict) -> list:
+    conditions = [Notification.user_id == _user_id()]
+    if data["notification_type"]:
+        conditions.append(Notification.notification_type == data["notification_type"])
+    if data["before"]:
+        conditions.append(Notification.created_at < data["before"])
+    return conditions
+
+
+def _bulk_chunks(conditions: list, ids, chunk_size: int):
+    """Yield id-range clauses splitting a bulk statement into committed chunks"""
+    if ids is not None:
+        ids = sorted(set(ids))
+        for i in range(0, len(ids), chunk_size):
+            yield Notification.id.in_(ids[i:i + chunk_size])
+        return
+    last_id = 0
+    while True:
+        chunk = db.session.scalars(
+            db.select(Notification.id).where(*conditions, Notification.id > last_id)
+            .order_by(Notification.id).limit(chunk_size)
+        ).all()
+        if not chunk:
+            return
+        yield Notification.id.between(last_id + 1, chunk[-1])
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1]
+
+
 class NotificationsBulkResource(Resource):
+    """Mark read or delete notifications by ``ids``, ``notification_type`` and/or
+    ``before`` (created before this timestamp); an empty body selects all."""
+
+    def _load(self):
+        return NotificationBulkSchema().load(request.get_json(silent=True) or {})
+
     @jwt_required()
     def put(self):
-        """Mark all notifications as read"""
-        notifications = db.session.scalars(
-            db.select(Notification).where(
-                Notification.user_id == _user_id(),
-                Notification.is_read == False
-            )
-        ).all()
-        
-        for notification in notifications:
-            notification.is_read = True
-            notification.read_at = datetime.utcnow()
-            
-        db.session.commit()
-        return {"message": f"Marked {len(notifications)} notifications as read"}, 200
-    
+        """Mark notifications as read"""
+        try:
+            data = self._load()
+        except ValidationError as e:
+            return {"errors": e.messages}, 400
+
+        user_id = _user_id()
+        conditions = _bulk_filters(data) + [Notification.is_read == False]
+        now = datetime.utcnow()
+        updated = 0
+        for chunk in _bulk_chunks(conditions, data["ids"], current_app.config["NOTIFICATION_BULK_CHUNK_SIZE"]):
+            count = db.session.execute(
+                db.update(Notification).where(*conditions, chunk)
+                .values(is_read=True, read_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            adjust_unread(db.session.connection(), {user_id: -count})
+            db.session.commit()
+            updated += count
+        return {"message": f"Marked {updated} notifications as read", "updated": updated}, 200
+
     @jwt_required()
     def delete(self):
-        """Delete all notifications"""
-        db.session.execute(
-            db.delete(Notification).where(Notification.user_id == _user_id())
-        )
-        db.session.commit()
-        return {"message": "All notifications deleted"}, 200
+        """Delete notifications"""
+        try:
+            data = self._load()
+        except ValidationError as e:
+            return {"errors": e.messages}, 400
+
+        user_id = _user_id()
+        conditions = _bulk_filters(data)
+        deleted = 0
+        for chunk in _bulk_chunks(conditions, data["ids"], current_app.config["NOTIFICATION_BULK_CHUNK_SIZE"]):
+            record_tombstones(db.session.connection(), Notification, conditions + [chunk])
+            # The unread delta comes from the rows actually deleted, not a count taken beforehand
+            was_read = db.session.scalars(
+                db.delete(Notification).where(*conditions, chunk)
+                .returning(Notification.is_read)
+                .execution_options(synchronize_session=False)
+            ).all()
+            adjust_unread(db.session.connection(), {user_id: -was_read.count(False)})
+            db.session.commit()
+            deleted += len(was_read)
+        return {"message": f"Deleted {deleted} notifications", "deleted": deleted}, 200
 
 
 api.add_resource(RemindersListResource, "/")
 api.add_resource(ReminderResource, "/<int:reminder_id>")
 api.add_resource(NotificationsListResource, "/notifications")
 api.add_resource(NotificationResource, "/notifications/<int:notification_id>")
-api.add_resource(NotificationsBulkResource, "/notifications/bulk")
\ No newline at end of file
+api.add_resource(NotificationsBulkResource, "/notifications/bulk")
+api.add_resource(NotificationStreamResource, "/notifications/stream")
+api.add_resource(NotificationStreamTokenResource, "/notifications/stream-token")
+api.add_resource(UnreadCountResource, "/notifications/unread-count")
\ No newline at end of file
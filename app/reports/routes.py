@@ -7,7 +7,8 @@ import csv
 from io import StringIO
 
 from ..extensions import db
-from ..models import Goal, Resource as ResourceModel, ProgressLog, User, get_user_summary
+from ..models import Goal, Resource as ResourceModel, ProgressLog, get_user, get_user_summary
+from ..resources.access import isoformat, tracker as access_tracker
 
 bp = Blueprint("reports", __name__)
 api = Api(bp)
@@ -21,7 +22,9 @@ class ProgressReportResource(Resource):
     @jwt_required()
     def get(self):
         user_id = _user_id()
-        user = db.get_or_404(User, user_id)
+        user = get_user(user_id)
+        if user is None:
+            return {"message": "Not found"}, 404
         
         # Get date range from query params
         start_date = request.args.get('start_date')
@@ -200,7 +203,7 @@ class ExportDataResource(Resource):
                     "is_favorite": r.is_favorite,
                     "goal_id": r.goal_id,
                     "created_at": r.created_at.isoformat(),
-                    "last_accessed": r.last_accessed.isoformat() if r.last_accessed else None
+                    "last_accessed": isoformat(access_tracker.last_accessed(r))
                 }
                 for r in resources
             ]
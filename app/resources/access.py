@@ -0,0 +1,151 @@
+import atexit
+import heapq
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import Flask, current_app
+
+from ..extensions import db
+from ..models import Resource
+
+
+def isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class AccessTracker:
+    """Buffers resource ``last_accessed`` updates in memory.
+
+    Repeat views of a resource coalesce into its latest timestamp, and a
+    background thread writes them every ``ACCESS_FLUSH_INTERVAL`` seconds
+    (and at exit) as batched UPDATEs, so viewing a resource no longer needs
+    a write transaction. Readers overlay the pending timestamps via
+    :meth:`last_accessed`.
+    """
+
+    def __init__(self):
+        self.app: Optional[Flask] = None
+        self.interval = 5.0
+        self.batch_size = 500
+        self._pending: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        self.interval = app.config.get("ACCESS_FLUSH_INTERVAL", 5)
+        self.batch_size = app.config.get("ACCESS_FLUSH_BATCH_SIZE", 500)
+        app.extensions["access_tracker"] = self
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="access-tracker", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval + 5)
+        self._thread = None
+
+    def record(self, resource_id: int, when: Optional[datetime] = None) -> None:
+        when = when or datetime.utcnow()
+        with self._lock:
+            if self._pending.get(resource_id, when) <= when:
+                self._pending[resource_id] = when
+        if not self.running and self.app is not None:
+            self.start()
+
+    def last_accessed(self, resource: Resource) -> Optional[datetime]:
+        """The resource's last access, including views not yet written"""
+        pending = self._pending.get(resource.id)
+        if pending is None or (resource.last_accessed and resource.last_accessed >= pending):
+            return resource.last_accessed
+        return pending
+
+    def recent(self, query, limit: Optional[int] = None) -> List[Resource]:
+        """Run a Resource select most recently accessed first, counting buffered views.
+
+        The database orders the rows; only resources with views still
+        buffered in this process are re-placed.
+        """
+        ordered = query.order_by(
+            Resource.last_accessed.desc().nulls_last(), Resource.created_at.desc(), Resource.id.desc()
+        )
+        rows = db.session.scalars(ordered.limit(limit) if limit else ordered).all()
+        with self._lock:
+            pending = dict(self._pending)
+        if not pending:
+            return rows
+        if limit:
+            # A buffered view can lift a row from beyond the limit into it
+            seen = {r.id for r in rows}
+            missing = [resource_id for resource_id in pending if resource_id not in seen]
+            if missing:
+                rows += db.session.scalars(query.where(Resource.id.in_(missing))).all()
+        viewed = sorted(
+            (r for r in rows if r.id in pending), key=lambda r: self.last_accessed(r) or datetime.min, reverse=True
+        )
+        if not viewed:
+            return rows[:limit] if limit else rows
+        viewed_ids = {r.id for r in viewed}
+        rest = [r for r in rows if r.id not in viewed_ids]
+        merged = list(heapq.merge(viewed, rest, key=lambda r: self.last_accessed(r) or datetime.min, reverse=True))
+        return merged[:limit] if limit else merged
+
+    def flush(self) -> int:
+        """Write buffered accesses; returns how many resources were updated"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        rows = [{"rid": resource_id, "ts": when} for resource_id, when in pending.items()]
+        table = Resource.__table__
+        # Core executemany: one prepared UPDATE run for every row in a batch
+        statement = (
+            db.update(table)
+            .where(
+                table.c.id == db.bindparam("rid"),
+                # Other processes may have written a later view
+                db.or_(table.c.last_accessed.is_(None), table.c.last_accessed < db.bindparam("ts"))
+            )
+            # A view isn't an edit: keep updated_at (and delta sync) unchanged
+            .values(last_accessed=db.bindparam("ts"), updated_at=table.c.updated_at)
+        )
+        try:
+            for i in range(0, len(rows), self.batch_size):
+                db.session.connection().execute(statement, rows[i:i + self.batch_size])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                for resource_id, when in pending.items():
+                    if self._pending.get(resource_id, when) <= when:
+                        self._pending[resource_id] = when
+            raise
+        return len(rows)
+
+    def _run(self) -> None:
+        while True:
+            stopping = self._stop.wait(self.interval)
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    current_app.logger.error(f"Access tracker flush failed: {e}")
+                finally:
+                    db.session.remove()
+            if stopping:
+                return
+
+
+tracker = AccessTracker()
@@ -0,0 +1,324 @@
+"""Local embeddings for related-resource and goal suggestions.
+
+Resources are embedded offline by a signed hashing vectorizer over word
+unigrams and bigrams of their title, tags, category, notes, extracted text
+and fetched link description; no model download or network call is needed.
+Vectors are L2-normalized float32 rows in ``resource_embeddings``, kept in
+step with resources by a session hook (and by the bulk importer, whose Core
+inserts bypass it).
+
+Queries load a user's vectors into one in-memory matrix, cached per process
+and patched with rows changed since it was loaded, and rank by a single
+matrix-vector product with ``argpartition`` top-k selection.
+"""
+import math
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import click
+import numpy as np
+from flask import Flask
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models import Goal, Resource, ResourceEmbedding
+
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into is it its of on or that the this to was what with your you".split()
+)
+_SUFFIXES = ("ingly", "edly", "ing", "ies", "ed", "es", "s")
+
+# Attributes whose change re-embeds a resource
+EMBEDDED_FIELDS = ("title", "tags", "category", "content", "extracted_text", "metadata_json")
+
+# Cached matrices are rebuilt from scratch this often, picking up rows that a
+# slow transaction committed with a timestamp older than the last refresh
+FULL_RELOAD_SECONDS = 600
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    words = [_stem(w) for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS and len(w) > 1]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class HashingVectorizer:
+    """Maps weighted text fields to a fixed-size, L2-normalized float32 vector"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hash-{dim}-v1"
+
+    def transform(self, fields: Iterable[Tuple[Optional[str], float]]) -> np.ndarray:
+        weights: Counter = Counter()
+        for text, weight in fields:
+            if not text:
+                continue
+            for token, count in Counter(tokenize(text)).items():
+                weights[token] += weight * (1 + math.log(count))
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not weights:
+            return vector
+        hashes = np.fromiter((zlib.crc32(t.encode()) for t in weights), dtype=np.uint32, count=len(weights))
+        values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+        # The top hash bit picks the sign so colliding tokens tend to cancel out
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, hashes % self.dim, signs * values)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def _tags_text(tags) -> str:
+    return " ".join(str(tag) for tag in tags or ())
+
+
+def resource_fields(resource, max_chars: int = 20_000) -> list:
+    """Weighted text of a Resource, or of any object with the same attributes"""
+    link = (getattr(resource, "metadata_json", None) or {}).get("link") or {}
+    return [
+        (resource.title, 3.0),
+        (_tags_text(resource.tags), 2.0),
+        (resource.category, 1.0),
+        (link.get("title"), 1.0),
+        (link.get("description"), 1.0),
+        ((resource.content or "")[:max_chars], 1.0),
+        ((getattr(resource, "extracted_text", None) or "")[:max_chars], 0.5),
+    ]
+
+
+def goal_fields(goal: Goal) -> list:
+    return [
+        (goal.title, 3.0),
+        (_tags_text(goal.tags), 2.0),
+        (goal.category, 1.0),
+        (goal.description, 1.0),
+    ]
+
+
+class _UserMatrix:
+    __slots__ = ("ids", "matrix", "positions", "loaded_until", "loaded_at")
+
+    def __init__(self, ids: np.ndarray, matrix: np.ndarray, loaded_until: Optional[datetime], loaded_at: float = None):
+        self.ids = ids
+        self.matrix = matrix
+        self.positions = {int(rid): i for i, rid in enumerate(ids)}
+        self.loaded_until = loaded_until
+        self.loaded_at = loaded_at or time.monotonic()
+
+
+class EmbeddingIndex:
+    def __init__(self):
+        self.vectorizer = HashingVectorizer()
+        self.max_chars = 20_000
+        self.min_score = 0.1
+        self.cache_users = 32
+        self._matrices: "OrderedDict[int, _UserMatrix]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.vectorizer = HashingVectorizer(app.config.get("EMBEDDING_DIM", 256))
+        self.max_chars = app.config.get("EMBEDDING_MAX_CHARS", 20_000)
+        self.min_score = app.config.get("EMBEDDING_MIN_SCORE", 0.1)
+        self.cache_users = app.config.get("EMBEDDING_CACHE_USERS", 32)
+        self._matrices.clear()
+        if not event.contains(Session, "after_flush", _embed_after_flush):
+            event.listen(Session, "after_flush", _embed_after_flush)
+        app.extensions["resource_embeddings"] = self
+
+        @app.cli.command("embeddings")
+        @click.option("--all", "rebuild_all", is_flag=True, help="Re-embed every resource, not just missing ones.")
+        def embeddings_command(rebuild_all):
+            """Compute resource embeddings for related-resource suggestions"""
+            total = self.backfill(rebuild_all=rebuild_all)
+            click.echo(f"Embedded {total} resources with {self.vectorizer.name}")
+
+        @app.cli.command("embeddings-benchmark")
+        @click.option("--vectors", default=100_000, show_default=True, help="Number of random vectors.")
+        def embeddings_benchmark_command(vectors):
+            """Time top-k similarity queries over an in-memory matrix"""
+            click.echo(self.benchmark(vectors))
+
+    def embed(self, fields) -> np.ndarray:
+        return self.vectorizer.transform(fields)
+
+    def store(self, connection, items: Sequence[Tuple[int, int, object]]) -> None:
+        """Upsert embeddings for ``(resource_id, user_id, resource-like)`` items"""
+        if not items:
+            return
+        now = datetime.utcnow()
+        table = ResourceEmbedding.__table__
+        rows = [
+            {
+                "resource_id": resource_id,
+                "user_id": user_id,
+                "model": self.vectorizer.name,
+                "vector": self.embed(resource_fields(resource, self.max_chars)).tobytes(),
+                "updated_at": now,
+            }
+            for resource_id, user_id, resource in items
+        ]
+        connection.execute(db.delete(table).where(table.c.resource_id.in_([row["resource_id"] for row in rows])))
+        connection.execute(db.insert(table), rows)
+
+    def backfill(self, rebuild_all: bool = False, batch_size: int = 500) -> int:
+        """Embed resources that have no embedding from the current vectorizer"""
+        total = 0
+        last_id = 0
+        while True:
+            query = db.select(Resource).where(Resource.id > last_id).order_by(Resource.id).limit(batch_size)
+            if not rebuild_all:
+                current = db.select(ResourceEmbedding.resource_id).where(ResourceEmbedding.model == self.vectorizer.name)
+                query = query.where(~Resource.id.in_(current))
+            resources = db.session.scalars(query).all()
+            if not resources:
+                break
+            self.store(db.session.connection(), [(r.id, r.user_id, r) for r in resources])
+            db.session.commit()
+            total += len(resources)
+            last_id = resources[-1].id
+        return total
+
+    def _load(self, user_id: int, since: Optional[datetime] = None):
+        query = (
+            db.select(ResourceEmbedding.resource_id, ResourceEmbedding.vector, ResourceEmbedding.updated_at)
+            .where(ResourceEmbedding.user_id == user_id, ResourceEmbedding.model == self.vectorizer.name)
+        )
+        if since is not None:
+            query = query.where(ResourceEmbedding.updated_at > since)
+        rows = db.session.execute(query).all()
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        matrix = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), self.vectorizer.dim)
+        loaded_until = max((row[2] for row in rows), default=since)
+        return ids, matrix, loaded_until
+
+    def _patch(self, cached: _UserMatrix, user_id: int) -> _UserMatrix:
+        ids, matrix, loaded_until = self._load(user_id, since=cached.loaded_until)
+        if not len(ids):
+            return cached
+        updated = cached.matrix.copy()
+        new = []
+        for i, resource_id in enumerate(ids):
+            position = cached.positions.get(int(resource_id))
+            if position is None:
+                new.append(i)
+            else:
+                updated[position] = matrix[i]
+        if not new:
+            return _UserMatrix(cached.ids, updated, loaded_until, cached.loaded_at)
+        return _UserMatrix(
+            np.concatenate([cached.ids, ids[new]]), np.vstack([updated, matrix[new]]), loaded_until, cached.loaded_at
+        )
+
+    def matrix_for(self, user_id: int) -> _UserMatrix:
+        """The user's embedding matrix, patched with rows changed since it was cached"""
+        with self._lock:
+            cached = self._matrices.get(user_id)
+        entry = None
+        fresh = cached is not None and time.monotonic() - cached.loaded_at < FULL_RELOAD_SECONDS
+        if fresh and cached.loaded_until is not None:
+            count = db.session.scalar(
+                db.select(db.func.count()).select_from(ResourceEmbedding)
+                .where(ResourceEmbedding.user_id == user_id, ResourceEmbedding.model == self.vectorizer.name)
+            )
+            entry = self._patch(cached, user_id)
+            if len(entry.ids) != count:
+                # Rows were deleted; reload from scratch
+                entry = None
+        if entry is None:
+            entry = _UserMatrix(*self._load(user_id))
+        with self._lock:
+            self._matrices[user_id] = entry
+            self._matrices.move_to_end(user_id)
+            while len(self._matrices) > self.cache_users:
+                self._matrices.popitem(last=False)
+        return entry
+
+    def top_k(self, user_id: int, vector: np.ndarray, k: int = 10, exclude: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """``(resource_id, cosine similarity)`` of the best ``k`` matches, best first"""
+        entry = self.matrix_for(user_id)
+        if not len(entry.ids) or not vector.any():
+            return []
+        scores = entry.matrix @ vector
+        for resource_id in exclude:
+            position = entry.positions.get(resource_id)
+            if position is not None:
+                scores[position] = -np.inf
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(entry.ids[i]), float(scores[i])) for i in best if scores[i] >= self.min_score]
+
+    def vector_for(self, resource: Resource) -> np.ndarray:
+        stored = db.session.get(ResourceEmbedding, resource.id)
+        if stored is not None and stored.model == self.vectorizer.name:
+            return np.frombuffer(stored.vector, dtype=np.float32)
+        return self.embed(resource_fields(resource, self.max_chars))
+
+    def _resolve(self, user_id: int, matches: List[Tuple[int, float]]) -> List[Tuple[Resource, float]]:
+        if not matches:
+            return []
+        resources = {
+            r.id: r for r in db.session.scalars(
+                db.select(Resource).where(Resource.user_id == user_id, Resource.id.in_([rid for rid, _ in matches]))
+            )
+        }
+        return [(resources[rid], score) for rid, score in matches if rid in resources]
+
+    def related(self, resource: Resource, k: int = 10) -> List[Tuple[Resource, float]]:
+        """Resources of the same user most similar to ``resource``"""
+        matches = self.top_k(resource.user_id, self.vector_for(resource), k, exclude=(resource.id,))
+        return self._resolve(resource.user_id, matches)
+
+    def for_goal(self, goal: Goal, k: int = 10) -> List[Tuple[Resource, float]]:
+        """Resources not yet attached to ``goal`` that best match its title, description and tags"""
+        attached = db.session.scalars(db.select(Resource.id).where(Resource.goal_id == goal.id)).all()
+        matches = self.top_k(goal.user_id, self.embed(goal_fields(goal)), k, exclude=attached)
+        return self._resolve(goal.user_id, matches)
+
+    def benchmark(self, n: int = 100_000, queries: int = 100, k: int = 10) -> dict:
+        """Time top-k queries over ``n`` random unit vectors (no database)"""
+        rng = np.random.default_rng(0)
+        matrix = rng.standard_normal((n, self.vectorizer.dim), dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        start = time.perf_counter()
+        for vector in matrix[:queries]:
+            scores = matrix @ vector
+            best = np.argpartition(-scores, k - 1)[:k]
+            best[np.argsort(-scores[best])]
+        elapsed = (time.perf_counter() - start) / queries
+        return {"vectors": n, "dim": self.vectorizer.dim, "matrix_mb": round(matrix.nbytes / 2**20, 1),
+                "query_ms": round(elapsed * 1000, 3)}
+
+
+index = EmbeddingIndex()
+
+
+def _embed_after_flush(session: Session, flush_context) -> None:
+    changed = [obj for obj in session.new if isinstance(obj, Resource)]
+    changed += [
+        obj for obj in session.dirty
+        if isinstance(obj, Resource) and any(inspect(obj).attrs[name].history.has_changes() for name in EMBEDDED_FIELDS)
+    ]
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Resource)]
+    if not changed and not deleted:
+        return
+    connection = session.connection()
+    if changed:
+        index.store(connection, [(obj.id, obj.user_id, obj) for obj in changed])
+    if deleted:
+        table = ResourceEmbedding.__table__
+        connection.execute(db.delete(table).where(table.c.resource_id.in_(deleted)))
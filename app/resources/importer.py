@@ -0,0 +1,306 @@
+"""Bulk resource import from CSV, JSON and Netscape bookmark exports.
+
+Parsers stream rows out of the file; rows are validated with
+:class:`ResourceCreateSchema` a batch at a time, URLs are normalized and
+de-duplicated against the user's existing resources, and each batch is
+written with a single Core INSERT.
+"""
+import codecs
+import csv
+import io
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from html.parser import HTMLParser
+from types import SimpleNamespace
+from typing import Iterable, Iterator, List, Optional
+
+import click
+from flask import Flask, current_app
+
+from ..extensions import db
+from ..models import Resource, User
+from ..schemas import ResourceCreateSchema
+from ..tags.index import add_links
+from .embeddings import index as embeddings
+from .links import enqueue_enrichment
+from .urls import normalize_url
+
+
+FORMATS = ("csv", "json", "bookmarks")
+READ_SIZE = 64 * 1024
+
+_WHITESPACE_RE = re.compile(r"[\s,]*")
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    errors: List[dict] = field(default_factory=list)
+    max_errors: int = 1000
+
+    def error(self, row: int, messages) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "errors": messages})
+
+    def to_dict(self) -> dict:
+        return {
+            "created": self.created,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def detect_format(filename: str, head: bytes) -> Optional[str]:
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if extension in ("csv", "json", "jsonl"):
+        return "json" if extension == "jsonl" else extension
+    if extension in ("html", "htm"):
+        return "bookmarks"
+    start = head.lstrip(b"\xef\xbb\xbf \t\r\n")[:200].lower()
+    if start.startswith((b"[", b"{")):
+        return "json"
+    if b"netscape-bookmark" in start or start.startswith((b"<!doctype", b"<dl", b"<html")):
+        return "bookmarks"
+    return None
+
+
+def iter_csv(stream) -> Iterator[dict]:
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        row = {key.strip().lower(): value for key, value in row.items() if key}
+        # Skip blank lines padded with delimiters
+        if any(value and value.strip() for value in row.values()):
+            yield row
+
+
+def iter_json(stream) -> Iterator[dict]:
+    """Objects of a top-level JSON array, or of JSON Lines, without loading the whole file"""
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer, pos, eof, in_array = "", 0, False, None
+    while True:
+        pos = _WHITESPACE_RE.match(buffer, pos).end()
+        if in_array is None and pos < len(buffer):
+            in_array = buffer[pos] == "["
+            if in_array:
+                pos = _WHITESPACE_RE.match(buffer, pos + 1).end()
+        if in_array and buffer[pos:pos + 1] == "]":
+            return
+        if pos < len(buffer):
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+                yield item
+                continue
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ImportFormatError(f"Malformed JSON: {e.msg}")
+        elif eof:
+            if in_array:
+                raise ImportFormatError("Malformed JSON: unterminated array")
+            return
+        chunk = stream.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + text.decode(chunk or b"", final=eof)
+        pos = 0
+
+
+class _BookmarkParser(HTMLParser):
+    """Netscape bookmark file: ``<DT><H3>`` folders wrap ``<DL>`` lists of ``<DT><A>`` links"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[dict] = []
+        self._folders: List[Optional[str]] = []
+        self._pending_folder: Optional[str] = None
+        self._link: Optional[dict] = None
+        self._in_folder_name = False
+        self._text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "a":
+            self._link = {"url": attrs.get("href"), "tags": attrs.get("tags"), "add_date": attrs.get("add_date")}
+            self._text = []
+        elif tag == "h3":
+            self._in_folder_name = True
+            self._text = []
+        elif tag == "dl":
+            self._folders.append(self._pending_folder)
+            self._pending_folder = None
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._link is not None:
+            folder = next((name for name in reversed(self._folders) if name), None)
+            self.rows.append({**self._link, "title": "".join(self._text).strip(), "category": folder})
+            self._link = None
+        elif tag == "h3" and self._in_folder_name:
+            self._pending_folder = "".join(self._text).strip() or None
+            self._in_folder_name = False
+        elif tag == "dl" and self._folders:
+            self._folders.pop()
+
+    def handle_data(self, data):
+        if self._link is not None or self._in_folder_name:
+            self._text.append(data)
+
+
+def iter_bookmarks(stream) -> Iterator[dict]:
+    parser = _BookmarkParser()
+    text = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    while True:
+        chunk = stream.read(READ_SIZE)
+        parser.feed(text.decode(chunk or b"", final=not chunk))
+        yield from parser.rows
+        parser.rows = []
+        if not chunk:
+            parser.close()
+            yield from parser.rows
+            return
+
+
+PARSERS = {"csv": iter_csv, "json": iter_json, "bookmarks": iter_bookmarks}
+
+
+def _split_tags(value) -> List[str]:
+    if isinstance(value, str):
+        value = re.split(r"[,;|]", value)
+    if not isinstance(value, list):
+        return []
+    return [str(tag).strip() for tag in value if str(tag).strip()]
+
+
+def _parse_date(value) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    try:
+        if isinstance(value, (int, float)) or str(value).isdigit():
+            return datetime.utcfromtimestamp(int(value))
+        return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def _prepare(raw, default_category: str) -> dict:
+    """Map one parsed row onto ResourceCreateSchema's fields"""
+    if not isinstance(raw, dict):
+        return {}
+    url = raw.get("url") or raw.get("href") or raw.get("link") or None
+    title = raw.get("title") or raw.get("name") or url
+    data = {
+        "title": str(title)[:255] if title else title,
+        "type": raw.get("type") or ("link" if url else "note"),
+        "url": url,
+        "content": raw.get("content") or raw.get("description") or raw.get("notes") or None,
+        "category": str(raw.get("category") or raw.get("folder") or default_category)[:100],
+        "tags": _split_tags(raw.get("tags")),
+    }
+    return data
+
+
+def existing_urls(user_id: int) -> set:
+    rows = db.session.scalars(
+        db.select(Resource.url).where(Resource.user_id == user_id, Resource.url.is_not(None))
+    )
+    return {normalize_url(url) or url for url in rows}
+
+
+def _insert_batch(user_id: int, batch: list, seen: set, report: ImportReport, default_category: str) -> None:
+    prepared = [_prepare(raw, default_category) for _, raw in batch]
+    errors = ResourceCreateSchema(many=True).validate(prepared)
+    now = datetime.utcnow()
+    rows = []
+    for index, (number, raw) in enumerate(batch):
+        if not isinstance(raw, dict):
+            report.error(number, {"_schema": ["Expected an object"]})
+            continue
+        if index in errors:
+            report.error(number, errors[index])
+            continue
+        data = prepared[index]
+        if data["url"]:
+            url = normalize_url(data["url"])
+            if url is None or len(url) > 1024:
+                report.error(number, {"url": ["Not a valid web URL"]})
+                continue
+            if url in seen:
+                report.duplicates += 1
+                continue
+            seen.add(url)
+            data["url"] = url
+        created_at = _parse_date(raw.get("created_at") or raw.get("add_date")) or now
+        rows.append({**data, "user_id": user_id, "created_at": created_at, "updated_at": now})
+    if not rows:
+        return
+
+    table = Resource.__table__
+    connection = db.session.connection()
+    ids = connection.execute(
+        db.insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    # Core inserts skip the session hooks that maintain the tag index and embeddings
+    add_links(connection, Resource, user_id, {rid: row["tags"] for rid, row in zip(ids, rows) if row["tags"]})
+    embeddings.store(connection, [(rid, user_id, SimpleNamespace(**row)) for rid, row in zip(ids, rows)])
+    enqueue_enrichment([rid for rid, row in zip(ids, rows) if row["url"]])
+    db.session.commit()
+    report.created += len(rows)
+
+
+def import_resources(user_id: int, rows: Iterable, batch_size: int = 1000, default_category: str = "imported") -> ImportReport:
+    """Validate and insert parsed rows; numbering in the report starts at 1"""
+    report = ImportReport(max_errors=current_app.config.get("IMPORT_MAX_ERRORS", 1000))
+    seen = existing_urls(user_id)
+    batch = []
+    number = 0
+    try:
+        for number, raw in enumerate(rows, start=1):
+            batch.append((number, raw))
+            if len(batch) >= batch_size:
+                _insert_batch(user_id, batch, seen, report, default_category)
+                batch = []
+    except (ImportFormatError, csv.Error, UnicodeDecodeError) as e:
+        # Keep what parsed cleanly and report where the file broke
+        report.error(number + 1, {"_file": [str(e)]})
+    if batch:
+        _insert_batch(user_id, batch, seen, report, default_category)
+    return report
+
+
+def import_file(user_id: int, stream, fmt: str, default_category: str = "imported") -> ImportReport:
+    return import_resources(
+        user_id, PARSERS[fmt](stream),
+        batch_size=current_app.config.get("IMPORT_BATCH_SIZE", 1000),
+        default_category=default_category,
+    )
+
+
+def init_app(app: Flask) -> None:
+    @app.cli.command("import-resources")
+    @click.argument("user_email")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(FORMATS), help="Defaults to detection by extension/content.")
+    @click.option("--category", default="imported", help="Category for rows without one.")
+    def import_resources_command(user_email, path, fmt, category):
+        """Import resources for a user from a CSV, JSON or bookmarks file"""
+        user = db.session.scalar(db.select(User).where(User.email == user_email))
+        if user is None:
+            raise click.ClickException(f"No user {user_email}")
+        with open(path, "rb") as f:
+            fmt = fmt or detect_format(path, f.read(512))
+            if fmt is None:
+                raise click.ClickException("Can't tell the file format; pass --format")
+            f.seek(0)
+            report = import_file(user.id, f, fmt, category)
+        click.echo(f"Created {report.created}, skipped {report.duplicates} duplicates, {report.failed} rows failed")
+        for error in report.errors[:20]:
+            click.echo(f"  row {error['row']}: {error['errors']}")
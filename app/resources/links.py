@@ -0,0 +1,391 @@
+"""Link metadata enrichment for URL resources.
+
+A background task fetches each page's title, description, favicon and
+canonical URL through one pooled ``requests`` session. Fetches are capped
+in total and per host, only read the start of the document, and results
+are cached in :class:`LinkMetadata` by normalized URL so every user saving
+the same link shares one fetch. Stale entries are re-fetched conditionally
+with ``If-None-Match``/``If-Modified-Since``.
+
+Unless ``LINK_FETCH_ALLOW_PRIVATE`` is set, connections are opened only to
+addresses checked at connect time, so a hostname that re-resolves to an
+internal address after a check can't be used to reach it.
+"""
+import hashlib
+import ipaddress
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from flask import Flask, current_app
+from requests.adapters import HTTPAdapter
+from sqlalchemy.exc import IntegrityError
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util import connection
+
+from ..extensions import db
+from ..models import LinkMetadata, Resource
+from ..taskqueue import enqueue
+from .urls import normalize_url
+
+
+MAX_REDIRECTS = 5
+METADATA_FIELDS = ("title", "description", "favicon", "canonical_url")
+
+
+class FetchError(Exception):
+    pass
+
+
+class PrivateAddressError(OSError):
+    pass
+
+
+def public_addresses(host: str, port: int) -> List[str]:
+    """Resolve ``host``, refusing it if any address isn't publicly routable"""
+    addresses = []
+    for *_, sockaddr in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+        ip = ipaddress.ip_address(sockaddr[0].split("%", 1)[0])
+        if not ip.is_global:
+            raise PrivateAddressError(f"Refusing to fetch a private address ({host})")
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+class _PublicConnectionMixin:
+    """Connects only to the addresses it resolved and checked itself.
+
+    TLS still uses the URL's hostname for SNI and certificate checks.
+    """
+
+    def _new_conn(self):
+        try:
+            addresses = public_addresses(self.host, self.port)
+        except socket.gaierror as e:
+            raise NewConnectionError(self, f"DNS lookup failed: {e}") from e
+        except PrivateAddressError as e:
+            raise NewConnectionError(self, str(e)) from e
+        error = None
+        for address in addresses:
+            try:
+                return connection.create_connection(
+                    (address, self.port),
+                    self.timeout,
+                    source_address=self.source_address,
+                    socket_options=self.socket_options,
+                )
+            except socket.timeout:
+                error = ConnectTimeoutError(self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})")
+            except OSError as e:
+                error = NewConnectionError(self, f"Failed to establish a new connection: {e}")
+        raise error or NewConnectionError(self, f"No addresses found for {self.host}")
+
+
+class _PublicHTTPConnection(_PublicConnectionMixin, HTTPConnection):
+    pass
+
+
+class _PublicHTTPSConnection(_PublicConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _PublicHTTPConnection
+
+
+class _PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _PublicHTTPSConnection
+
+
+class PublicOnlyAdapter(HTTPAdapter):
+    """Transport adapter whose connections refuse private and loopback addresses"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _PublicHTTPConnectionPool,
+            "https": _PublicHTTPSConnectionPool,
+        }
+
+
+def url_hash(normalized_url: str) -> str:
+    return hashlib.sha256(normalized_url.encode()).hexdigest()
+
+
+class _HeadParser(HTMLParser):
+    """Collects metadata from ``<head>``; stops caring once the body starts"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta: Dict[str, str] = {}
+        self.icons: List[str] = []
+        self.canonical: Optional[str] = None
+        self.done = False
+        self._title: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        attrs = {key: value or "" for key, value in attrs}
+        if tag == "title" and "title" not in self.meta:
+            self._title = []
+        elif tag == "meta":
+            key = (attrs.get("property") or attrs.get("name") or "").lower()
+            if key and attrs.get("content"):
+                self.meta.setdefault(key, attrs["content"].strip())
+        elif tag == "link":
+            rel = attrs.get("rel", "").lower().split()
+            if "canonical" in rel and attrs.get("href"):
+                self.canonical = attrs["href"]
+            elif ("icon" in rel or "apple-touch-icon" in rel) and attrs.get("href"):
+                self.icons.append(attrs["href"])
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self._title is not None:
+            self.meta.setdefault("title", " ".join("".join(self._title).split()))
+            self._title = None
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._title is not None:
+            self._title.append(data)
+
+
+def parse_metadata(html: str, base_url: str) -> dict:
+    parser = _HeadParser()
+    parser.feed(html)
+    meta = parser.meta
+    favicon = parser.icons[0] if parser.icons else "/favicon.ico"
+    canonical = parser.canonical or meta.get("og:url")
+    return {
+        "title": (meta.get("og:title") or meta.get("title") or None),
+        "description": meta.get("og:description") or meta.get("description") or meta.get("twitter:description"),
+        "favicon": urljoin(base_url, favicon),
+        "canonical_url": urljoin(base_url, canonical) if canonical else None,
+    }
+
+
+class LinkFetcher:
+    def __init__(self):
+        self.session: Optional[requests.Session] = None
+        self.per_host = 2
+        self.concurrency = 8
+        self.timeout = (3.0, 5.0)
+        self.max_bytes = 512 * 1024
+        self.allow_private = False
+        self._active: Dict[str, int] = {}
+        self._cond = threading.Condition()
+
+    def init_app(self, app: Flask) -> None:
+        self.per_host = app.config.get("LINK_FETCH_PER_HOST", 2)
+        self.concurrency = app.config.get("LINK_FETCH_CONCURRENCY", 8)
+        self.timeout = (app.config.get("LINK_FETCH_CONNECT_TIMEOUT", 3.0), app.config.get("LINK_FETCH_READ_TIMEOUT", 5.0))
+        self.max_bytes = app.config.get("LINK_FETCH_MAX_BYTES", 512 * 1024)
+        self.allow_private = app.config.get("LINK_FETCH_ALLOW_PRIVATE", False)
+        # One session per process so connections are kept alive and reused
+        session = requests.Session()
+        # Proxy variables would send fetches around the address check
+        session.trust_env = False
+        adapter_class = HTTPAdapter if self.allow_private else PublicOnlyAdapter
+        adapter = adapter_class(pool_connections=32, pool_maxsize=max(self.concurrency, 10))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = app.config.get("LINK_FETCH_USER_AGENT", "LearningDashboard-LinkPreview/1.0")
+        session.headers["Accept"] = "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5"
+        self.session = session
+        app.extensions["link_fetcher"] = self
+
+    @contextmanager
+    def _host_slot(self, host: str):
+        with self._cond:
+            while self._active.get(host, 0) >= self.per_host:
+                self._cond.wait()
+            self._active[host] = self._active.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active[host] -= 1
+                if not self._active[host]:
+                    del self._active[host]
+                self._cond.notify_all()
+
+    def _read_head(self, response) -> str:
+        chunks, size = [], 0
+        for chunk in response.iter_content(16 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes or b"</head>" in chunk.lower():
+                break
+        # requests assumes ISO-8859-1 for text/* without a charset; most pages are UTF-8
+        encoding = response.encoding if "charset" in response.headers.get("Content-Type", "").lower() else "utf-8"
+        return b"".join(chunks).decode(encoding or "utf-8", errors="replace")
+
+    def fetch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> dict:
+        """Fetch ``url``'s metadata; ``{"status_code": 304}`` if unchanged"""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                raise FetchError(f"Unsupported URL: {url[:100]}")
+            with self._host_slot(parts.hostname):
+                try:
+                    with self.session.get(url, headers=headers, timeout=self.timeout, stream=True, allow_redirects=False) as response:
+                        if response.is_redirect:
+                            url = urljoin(url, response.headers["Location"])
+                            continue
+                        result = {
+                            "status_code": response.status_code,
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                        }
+                        if response.status_code == 304 or response.status_code >= 400:
+                            return result
+                        if "html" in response.headers.get("Content-Type", "html").lower():
+                            result.update(parse_metadata(self._read_head(response), response.url))
+                        return result
+                except requests.RequestException as e:
+                    raise FetchError(f"{type(e).__name__}: {e}"[:255])
+        raise FetchError("Too many redirects")
+
+    def fetch_many(self, jobs: Dict[str, dict]) -> Dict[str, dict]:
+        """Fetch ``{key: {"url", "etag", "last_modified"}}`` concurrently; errors become ``{"error"}``"""
+        def run(job):
+            try:
+                return self.fetch(job["url"], job.get("etag"), job.get("last_modified"))
+            except FetchError as e:
+                return {"error": str(e)}
+
+        if not jobs:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(jobs)), thread_name_prefix="link-fetch") as pool:
+            futures = {key: pool.submit(run, job) for key, job in jobs.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+
+fetcher = LinkFetcher()
+
+
+def _is_fresh(entry: LinkMetadata, now: datetime) -> bool:
+    failed = entry.error or (entry.status_code or 0) >= 400
+    hours = current_app.config.get("LINK_METADATA_ERROR_TTL_HOURS" if failed else "LINK_METADATA_TTL_HOURS", 168)
+    return entry.fetched_at > now - timedelta(hours=hours)
+
+
+def _store(key: str, url: str, entry: Optional[LinkMetadata], result: dict, now: datetime) -> LinkMetadata:
+    if entry is not None and result.get("status_code") == 304:
+        entry.fetched_at = now
+        entry.error = None
+        return entry
+    values = {name: result.get(name) for name in METADATA_FIELDS}
+    values["title"] = values["title"][:500] if values["title"] else None
+    for name in ("favicon", "canonical_url"):
+        if values[name] and len(values[name]) > 1024:
+            values[name] = None
+    values.update(
+        status_code=result.get("status_code"),
+        error=result.get("error"),
+        etag=(result.get("etag") or "")[:255] or None,
+        last_modified=(result.get("last_modified") or "")[:100] or None,
+        fetched_at=now,
+    )
+    if entry is None:
+        entry = LinkMetadata(url_hash=key, url=url, **values)
+        try:
+            with db.session.begin_nested():
+                db.session.add(entry)
+            return entry
+        except IntegrityError:
+            # Another worker cached the same URL meanwhile
+            entry = db.session.get(LinkMetadata, key)
+    for name, value in values.items():
+        setattr(entry, name, value)
+    return entry
+
+
+def _summary(entry: LinkMetadata) -> dict:
+    data = {name: getattr(entry, name) for name in METADATA_FIELDS}
+    data["fetched_at"] = entry.fetched_at.isoformat()
+    if entry.error or (entry.status_code or 0) >= 400:
+        data["error"] = entry.error or f"HTTP {entry.status_code}"
+    return data
+
+
+def enrich_links(resource_ids: Iterable[int]) -> int:
+    """Attach cached or freshly fetched link metadata to resources"""
+    resources = db.session.scalars(
+        db.select(Resource).where(Resource.id.in_(list(resource_ids)), Resource.url.is_not(None))
+    ).all()
+    by_key: Dict[str, List[Resource]] = {}
+    urls: Dict[str, str] = {}
+    for resource in resources:
+        url = normalize_url(resource.url)
+        if url:
+            key = url_hash(url)
+            by_key.setdefault(key, []).append(resource)
+            urls[key] = url
+    if not by_key:
+        return 0
+
+    now = datetime.utcnow()
+    cached = {
+        entry.url_hash: entry
+        for entry in db.session.scalars(db.select(LinkMetadata).where(LinkMetadata.url_hash.in_(list(by_key))))
+    }
+    resource_ids = [resource.id for resource in resources]
+    jobs = {}
+    for key, url in urls.items():
+        entry = cached.get(key)
+        if entry is None or not _is_fresh(entry, now):
+            jobs[key] = {"url": url}
+            if entry is not None and not entry.error:
+                jobs[key].update(etag=entry.etag, last_modified=entry.last_modified)
+    # Nothing is written while fetching, so don't hold a transaction open
+    db.session.commit()
+    results = fetcher.fetch_many(jobs)
+
+    for key, result in results.items():
+        cached[key] = _store(key, urls[key], cached.get(key), result, now)
+    summaries = {key: _summary(cached[key]) for key in by_key}
+    # Resources may have been edited during the fetch: merge into fresh rows,
+    # skipping any whose URL no longer matches what was fetched
+    enriched = 0
+    for resource in db.session.scalars(
+        db.select(Resource)
+        .where(Resource.id.in_(resource_ids))
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ):
+        url = normalize_url(resource.url) if resource.url else None
+        summary = summaries.get(url_hash(url)) if url else None
+        if summary is None:
+            continue
+        resource.metadata_json = {**(resource.metadata_json or {}), "link": summary}
+        enriched += 1
+    db.session.commit()
+    return enriched
+
+
+def enqueue_enrichment(resource_ids: List[int]) -> None:
+    """Queue metadata fetches inside the caller's transaction"""
+    if not current_app.config.get("LINK_ENRICHMENT_ENABLED", True):
+        return
+    batch_size = current_app.config.get("LINK_ENRICH_BATCH_SIZE", 100)
+    for i in range(0, len(resource_ids), batch_size):
+        enqueue("enrich_link_metadata", {"resource_ids": resource_ids[i:i + batch_size]}, commit=False)
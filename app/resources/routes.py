@@ -1,13 +1,26 @@
 import os
-from datetime import datetime
-from flask import Blueprint, request, current_app
+from flask import Blueprint, request, current_app, send_file
 from flask_restful import Api, Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from marshmallow import ValidationError
 from werkzeug.utils import secure_filename
 
 from ..extensions import db
-from ..models import Resource as ResourceModel
-from ..schemas import ResourceCreateSchema, ResourceUpdateSchema
+from ..extraction.extractors import ExtractionError
+from ..models import Goal, Resource as ResourceModel, Tag, UploadSession, resource_tags
+from ..previews.service import get_preview, preview_kind, preview_sizes
+from ..schemas import ResourceCreateSchema, ResourceUpdateSchema, UploadInitSchema
+from ..tags.index import filter_by_tags, parse_tag_filter
+from ..taskqueue import enqueue
+from .access import isoformat, tracker as access_tracker
+from .embeddings import index as embeddings
+from .importer import FORMATS as IMPORT_FORMATS, detect_format, import_file
+from .links import enqueue_enrichment
+from .search import apply_search, render_snippet
+from .storage import (
+    ChunkTimeout, OffsetMismatch, UploadError, abort_upload, complete_upload, create_upload, discard,
+    guess_content_type, send_stored_file, store_stream, write_chunk,
+)
 
 
 bp = Blueprint("resources", __name__)
@@ -25,6 +38,57 @@ def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def _create_file_resource(filename: str, content_type: str, sha256: str, size: int, path: str, fields: dict) -> ResourceModel:
+    res = ResourceModel(
+        user_id=_user_id(),
+        type="file",
+        title=filename,
+        path=path,
+        category=fields.get("category") or "general",
+        goal_id=fields.get("goal_id"),
+        tags=[tag.strip() for tag in fields.get("tags") or [] if tag.strip()],
+        file_size=size,
+        file_type=content_type,
+        file_sha256=sha256,
+        metadata_json={"extraction": {"status": "pending"}}
+    )
+    db.session.add(res)
+    db.session.flush()
+    # Text/metadata extraction is CPU-heavy; hand it to the task queue
+    enqueue("extract_resource_content", {"resource_id": res.id}, commit=False)
+    if current_app.config.get("PREVIEW_EAGER", True) and preview_kind(res):
+        enqueue("generate_resource_previews", {"resource_id": res.id}, commit=False)
+    return res
+
+
+def _get_upload(upload_id: str):
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None or upload.user_id != _user_id():
+        return None
+    return upload
+
+
+def _serialize(r: ResourceModel) -> dict:
+    return {
+        "id": r.id,
+        "type": r.type,
+        "title": r.title,
+        "url": r.url,
+        "path": r.path,
+        "content": r.content,
+        "category": r.category,
+        "tags": r.tags or [],
+        "rating": r.rating,
+        "is_favorite": r.is_favorite,
+        "last_accessed": isoformat(access_tracker.last_accessed(r)),
+        "file_size": r.file_size,
+        "file_type": r.file_type,
+        "goal_id": r.goal_id,
+        "created_at": r.created_at.isoformat(),
+        "updated_at": r.updated_at.isoformat(),
+    }
+
+
 class ResourcesListResource(Resource):
     @jwt_required()
     def get(self):
@@ -49,38 +113,30 @@ class ResourcesListResource(Resource):
         if favorites_only:
             query = query.where(ResourceModel.is_favorite == True)
             
+        tags, match_all = parse_tag_filter(request.args)
+        if tags:
+            query = filter_by_tags(query, ResourceModel, _user_id(), tags, match_all)
+            
         if search:
-            search_term = f"%{search}%"
-            query = query.where(
-                db.or_(
-                    ResourceModel.title.ilike(search_term),
-                    ResourceModel.content.ilike(search_term)
-                )
-            )
+            # Ranked full-text matches, best first
+            query, snippet = apply_search(query, search)
+            limit = min(request.args.get('limit', 50, type=int), current_app.config.get("SEARCH_MAX_RESULTS", 200))
+            rows = db.session.execute(query.limit(limit)).all()
+            results = []
+            for row in rows:
+                item = _serialize(row[0])
+                if snippet is not None:
+                    item["snippet"] = render_snippet(row.snippet)
+                results.append(item)
+            return results
         
-        rows = db.session.scalars(query.order_by(ResourceModel.created_at.desc())).all()
+        if request.args.get('sort') == 'recent':
+            # Views still buffered in the access tracker count too
+            rows = access_tracker.recent(query, request.args.get('limit', type=int))
+        else:
+            rows = db.session.scalars(query.order_by(ResourceModel.created_at.desc())).all()
         
-        return [
-            {
-                "id": r.id,
-                "type": r.type,
-                "title": r.title,
-                "url": r.url,
-                "path": r.path,
-                "content": r.content,
-                "category": r.category,
-                "tags": r.tags or [],
-                "rating": r.rating,
-                "is_favorite": r.is_favorite,
-                "last_accessed": r.last_accessed.isoformat() if r.last_accessed else None,
-                "file_size": r.file_size,
-                "file_type": r.file_type,
-                "goal_id": r.goal_id,
-                "created_at": r.created_at.isoformat(),
-                "updated_at": r.updated_at.isoformat(),
-            }
-            for r in rows
-        ]
+        return [_serialize(r) for r in rows]
 
     @jwt_required()
     def post(self):
@@ -100,6 +156,9 @@ class ResourcesListResource(Resource):
             tags=data.get("tags", [])
         )
         db.session.add(res)
+        if res.url:
+            db.session.flush()
+            enqueue_enrichment([res.id])
         db.session.commit()
         return {"id": res.id}, 201
 
@@ -111,28 +170,10 @@ class ResourceItemResource(Resource):
         if res.user_id != _user_id():
             return {"message": "Not found"}, 404
             
-        # Update last accessed time
-        res.last_accessed = datetime.utcnow()
-        db.session.commit()
+        # Buffered; written in batches by the access tracker
+        access_tracker.record(res.id)
         
-        return {
-            "id": res.id,
-            "type": res.type,
-            "title": res.title,
-            "url": res.url,
-            "path": res.path,
-            "content": res.content,
-            "category": res.category,
-            "tags": res.tags or [],
-            "rating": res.rating,
-            "is_favorite": res.is_favorite,
-            "last_accessed": res.last_accessed.isoformat() if res.last_accessed else None,
-            "file_size": res.file_size,
-            "file_type": res.file_type,
-            "goal_id": res.goal_id,
-            "created_at": res.created_at.isoformat(),
-            "updated_at": res.updated_at.isoformat(),
-        }
+        return _serialize(res)
     
     @jwt_required()
     def put(self, resource_id: int):
@@ -145,9 +186,12 @@ class ResourceItemResource(Resource):
         if errors:
             return {"errors": errors}, 400
             
+        url_changed = "url" in data and data["url"] != res.url
         for key in ["title", "url", "content", "category", "tags", "rating", "is_favorite"]:
             if key in data:
                 setattr(res, key, data[key])
+        if url_changed and res.url:
+            enqueue_enrichment([res.id])
                 
         db.session.commit()
         return {"message": "updated"}, 200
@@ -157,11 +201,10 @@ class ResourceItemResource(Resource):
         res = db.get_or_404(ResourceModel, resource_id)
         if res.user_id != _user_id():
             return {"message": "Not found"}, 404
-        if res.path and os.path.exists(res.path):
-            try:
-                os.remove(res.path)
-            except OSError:
-                pass
+        if not res.file_sha256 and res.path and os.path.exists(res.path):
+            # Uploaded before content-addressed storage
+            discard(res.path)
+        # Stored file references are released by a flush hook in .storage
         db.session.delete(res)
         db.session.commit()
         return {"message": "deleted"}, 200
@@ -179,57 +222,227 @@ class ResourceUploadResource(Resource):
             return {"message": "File type not allowed"}, 400
             
         filename = secure_filename(file.filename)
-        upload_dir = os.path.join(current_app.root_path, "..", "uploads")
-        os.makedirs(upload_dir, exist_ok=True)
-        timestamped = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{filename}"
-        save_path = os.path.abspath(os.path.join(upload_dir, timestamped))
-        file.save(save_path)
+        try:
+            sha256, size, path, _ = store_stream(file.stream, current_app.config.get("UPLOAD_MAX_SIZE", 2 * 1024 ** 3))
+        except UploadError as e:
+            return {"message": str(e)}, 413
         
         # Get additional form data
-        category = request.form.get('category', 'general')
         goal_id = request.form.get('goal_id')
-        tags = request.form.get('tags', '').split(',') if request.form.get('tags') else []
-        
-        res = ResourceModel(
-            user_id=_user_id(),
-            type="file",
-            title=filename,
-            path=save_path,
-            category=category,
-            goal_id=int(goal_id) if goal_id else None,
-            tags=[tag.strip() for tag in tags if tag.strip()],
-            file_size=os.path.getsize(save_path),
-            file_type=file.content_type
-        )
-        db.session.add(res)
+        fields = {
+            "category": request.form.get('category', 'general'),
+            "goal_id": int(goal_id) if goal_id else None,
+            "tags": request.form.get('tags', '').split(',') if request.form.get('tags') else [],
+        }
+        res = _create_file_resource(filename, guess_content_type(filename, file.content_type), sha256, size, path, fields)
         db.session.commit()
         return {"id": res.id, "path": res.path}, 201
 
 
+class ResourceImportResource(Resource):
+    @jwt_required()
+    def post(self):
+        """Import resources from a CSV, JSON or browser bookmarks file"""
+        if "file" not in request.files:
+            return {"message": "No file"}, 400
+        file = request.files["file"]
+        fmt = request.form.get("format") or detect_format(file.filename or "", file.stream.read(512))
+        file.stream.seek(0)
+        if fmt not in IMPORT_FORMATS:
+            return {"message": f"Unknown format; use one of {', '.join(IMPORT_FORMATS)}"}, 400
+        report = import_file(_user_id(), file.stream, fmt, request.form.get("category") or "imported")
+        return report.to_dict(), 200
+
+
+class UploadsResource(Resource):
+    @jwt_required()
+    def post(self):
+        """Start a resumable upload"""
+        try:
+            data = UploadInitSchema().load(request.get_json(silent=True) or {})
+        except ValidationError as e:
+            return {"errors": e.messages}, 400
+        data["filename"] = secure_filename(data["filename"])
+        if not allowed_file(data["filename"]):
+            return {"message": "File type not allowed"}, 400
+        if data["size"] > current_app.config.get("UPLOAD_MAX_SIZE", 2 * 1024 ** 3):
+            return {"message": "File too large"}, 413
+        upload = create_upload(_user_id(), data)
+        db.session.commit()
+        return {"upload_id": upload.id, "offset": 0, "chunk_size": current_app.config.get("UPLOAD_CHUNK_SIZE")}, 201
+
+
+class UploadSessionResource(Resource):
+    @jwt_required()
+    def get(self, upload_id: str):
+        """Where to resume an interrupted upload"""
+        upload = _get_upload(upload_id)
+        if upload is None:
+            return {"message": "Not found"}, 404
+        return {"upload_id": upload.id, "offset": upload.received, "size": upload.size}
+
+    @jwt_required()
+    def put(self, upload_id: str):
+        """Write the raw request body at ``?offset=``"""
+        upload = _get_upload(upload_id)
+        if upload is None:
+            return {"message": "Not found"}, 404
+        offset = request.args.get("offset", type=int)
+        if offset is None:
+            return {"message": "offset is required"}, 400
+        size = upload.size
+        try:
+            received = write_chunk(upload, offset, request.stream, current_app.config.get("UPLOAD_MAX_CHUNK_BYTES", 16 * 1024 * 1024))
+        except OffsetMismatch as e:
+            return {"message": str(e), "offset": e.offset}, 409
+        except ChunkTimeout as e:
+            return {"message": str(e)}, 408
+        except UploadError as e:
+            return {"message": str(e)}, 413
+        return {"upload_id": upload_id, "offset": received, "size": size}
+
+    @jwt_required()
+    def delete(self, upload_id: str):
+        upload = _get_upload(upload_id)
+        if upload is None:
+            return {"message": "Not found"}, 404
+        abort_upload(upload)
+        db.session.commit()
+        return {"message": "deleted"}, 200
+
+
+class UploadCompleteResource(Resource):
+    @jwt_required()
+    def post(self, upload_id: str):
+        """Turn a fully received upload into a resource"""
+        upload = _get_upload(upload_id)
+        if upload is None:
+            return {"message": "Not found"}, 404
+        filename, content_type, size, fields = upload.filename, upload.content_type, upload.size, upload.fields or {}
+        try:
+            sha256, path, deduplicated = complete_upload(upload)
+        except OffsetMismatch as e:
+            return {"message": "Upload is incomplete", "offset": e.offset}, 409
+        except UploadError as e:
+            return {"message": str(e)}, 409
+        res = _create_file_resource(filename, content_type, sha256, size, path, fields)
+        db.session.commit()
+        return {"id": res.id, "deduplicated": deduplicated}, 201
+
+
+class ResourceFileResource(Resource):
+    @jwt_required()
+    def get(self, resource_id: int):
+        """Download an uploaded file; ``?download=1`` sends it as an attachment"""
+        res = db.get_or_404(ResourceModel, resource_id)
+        if res.user_id != _user_id():
+            return {"message": "Not found"}, 404
+        if not res.path or not os.path.isfile(res.path):
+            return {"message": "No file for this resource"}, 404
+        # Content-addressed files get the digest as a strong ETag
+        return send_stored_file(
+            res.path,
+            etag=res.file_sha256,
+            mimetype=res.file_type or "application/octet-stream",
+            download_name=res.title,
+            as_attachment=request.args.get("download") == "1",
+        )
+
+
+class ResourcePreviewResource(Resource):
+    @jwt_required()
+    def get(self, resource_id: int):
+        """Serve a cached thumbnail, rendering it on first request"""
+        res = db.get_or_404(ResourceModel, resource_id)
+        if res.user_id != _user_id():
+            return {"message": "Not found"}, 404
+        size = request.args.get("size", "medium")
+        if size not in preview_sizes():
+            return {"message": f"Unknown size; use one of {', '.join(preview_sizes())}"}, 400
+        try:
+            path = get_preview(res, size)
+        except ExtractionError as e:
+            current_app.logger.warning(f"Preview for resource {resource_id} failed: {e}")
+            return {"message": "Preview not available yet"}, 503, {"Retry-After": "30"}
+        if path is None:
+            return {"message": "No preview available"}, 404
+
+        # The file name is the content digest, so a given URL never changes content
+        response = send_file(
+            path,
+            mimetype=f"image/{current_app.config.get('PREVIEW_FORMAT', 'webp')}",
+            etag=os.path.splitext(os.path.basename(path))[0],
+            max_age=current_app.config.get("PREVIEW_MAX_AGE", 31536000),
+            conditional=True,
+        )
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        return response
+
+
+def _suggestion_limit() -> int:
+    return max(1, min(request.args.get("limit", 10, type=int), 50))
+
+
+class ResourceRelatedResource(Resource):
+    @jwt_required()
+    def get(self, resource_id: int):
+        """The user's resources most similar to this one"""
+        res = db.get_or_404(ResourceModel, resource_id)
+        if res.user_id != _user_id():
+            return {"message": "Not found"}, 404
+        return [
+            {**_serialize(r), "score": round(score, 4)}
+            for r, score in embeddings.related(res, _suggestion_limit())
+        ]
+
+
+class ResourceSuggestionsResource(Resource):
+    @jwt_required()
+    def get(self):
+        """Resources matching a goal (``?goal_id=``) that aren't attached to it yet"""
+        goal = db.session.get(Goal, request.args.get("goal_id", type=int) or 0)
+        if goal is None or goal.user_id != _user_id():
+            return {"message": "Goal not found"}, 404
+        return [
+            {**_serialize(r), "score": round(score, 4)}
+            for r, score in embeddings.for_goal(goal, _suggestion_limit())
+        ]
+
+
 class ResourceCategoriesResource(Resource):
     @jwt_required()
     def get(self):
         """Get all unique categories for user's resources"""
         categories = db.session.scalars(
             db.select(ResourceModel.category).where(ResourceModel.user_id == _user_id()).distinct()
+        ).all()
+        return list(categories)
+
+
 class ResourceTagsResource(Resource):
     @jwt_required()
     def get(self):
         """Get all unique tags for user's resources"""
-        resources = db.session.scalars(
-            db.select(ResourceModel).where(ResourceModel.user_id == _user_id())
+        tags = db.session.scalars(
+            db.select(Tag.name)
+            .where(Tag.user_id == _user_id(), Tag.id.in_(db.select(resource_tags.c.tag_id)))
+            .order_by(Tag.name)
         ).all()
-        
-        all_tags = set()
-        for resource in resources:
-            if resource.tags:
-                all_tags.update(resource.tags)
-        
-        return list(all_tags)
-        ).all()
-        return list(categories)
+        return list(tags)
+
+
 api.add_resource(ResourcesListResource, "/")
 api.add_resource(ResourceItemResource, "/<int:resource_id>")
 api.add_resource(ResourceUploadResource, "/upload")
+api.add_resource(ResourceImportResource, "/import")
+api.add_resource(UploadsResource, "/uploads")
+api.add_resource(UploadSessionResource, "/uploads/<string:upload_id>")
+api.add_resource(UploadCompleteResource, "/uploads/<string:upload_id>/complete")
+api.add_resource(ResourceFileResource, "/<int:resource_id>/file")
+api.add_resource(ResourcePreviewResource, "/<int:resource_id>/preview")
+api.add_resource(ResourceRelatedResource, "/<int:resource_id>/related")
+api.add_resource(ResourceSuggestionsResource, "/suggested")
 api.add_resource(ResourceCategoriesResource, "/categories")
 api.add_resource(ResourceTagsResource, "/tags")
\ No newline at end of file
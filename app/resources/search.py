@@ -0,0 +1,225 @@
+"""Full-text search over resources.
+
+SQLite uses an external-content FTS5 table (``resources_fts``) kept in sync
+by triggers; PostgreSQL uses a generated ``search_vector`` tsvector column
+with a GIN index. Both are installed when the ``resources`` table is created
+and by ``flask search-index`` for existing databases. Other databases, or a
+database without the index, fall back to substring matching.
+
+Queries accept bare words (stemmed), ``"quoted phrases"`` and ``prefix*``
+terms; the last bare word is also matched as a prefix for search-as-you-type.
+"""
+import html
+import re
+from typing import List, Optional, Tuple
+
+import click
+from flask import Flask, current_app
+from sqlalchemy import event, inspect
+
+from ..extensions import db
+from ..models import Resource as ResourceModel
+
+
+# The database brackets matches with private-use characters; render_snippet
+# escapes the stored text and only then turns them into <mark> tags
+SNIPPET_START = "\ue000"
+SNIPPET_END = "\ue001"
+
+# Column weights: title, content, tags, extracted_text
+SQLITE_BM25_WEIGHTS = (10.0, 1.0, 5.0, 0.5)
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS resources_fts USING fts5(
+        title, content, tags, extracted_text,
+        content='resources', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resources_fts_ai AFTER INSERT ON resources BEGIN
+        INSERT INTO resources_fts(rowid, title, content, tags, extracted_text)
+        VALUES (new.id, new.title, new.content, new.tags, new.extracted_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resources_fts_ad AFTER DELETE ON resources BEGIN
+        INSERT INTO resources_fts(resources_fts, rowid, title, content, tags, extracted_text)
+        VALUES ('delete', old.id, old.title, old.content, old.tags, old.extracted_text);
+    END
+    """,
+    # Only indexed columns re-index a row; last_accessed and friends don't
+    """
+    CREATE TRIGGER IF NOT EXISTS resources_fts_au AFTER UPDATE OF title, content, tags, extracted_text ON resources BEGIN
+        INSERT INTO resources_fts(resources_fts, rowid, title, content, tags, extracted_text)
+        VALUES ('delete', old.id, old.title, old.content, old.tags, old.extracted_text);
+        INSERT INTO resources_fts(rowid, title, content, tags, extracted_text)
+        VALUES (new.id, new.title, new.content, new.tags, new.extracted_text);
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    ALTER TABLE resources ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(tags::text, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(extracted_text, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_resources_search ON resources USING GIN (search_vector)",
+]
+
+_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Engine URL -> whether the index exists, checked once per process
+_available = {}
+
+
+def parse_query(text: str) -> List[Tuple[List[str], bool]]:
+    """Split a query into (words, is_prefix) terms; phrases have several words"""
+    terms = []
+    for match in _TOKEN_RE.finditer(text):
+        phrase, bare = match.groups()
+        words = _WORD_RE.findall(phrase if phrase is not None else bare)
+        if words:
+            terms.append((words, phrase is None and bare.endswith("*")))
+    if terms and len(terms[-1][0]) == 1 and not text.rstrip().endswith('"'):
+        terms[-1] = (terms[-1][0], True)
+    return terms
+
+
+def _fts5_query(terms) -> str:
+    parts = []
+    for words, prefix in terms:
+        quoted = '"' + " ".join(words) + '"'
+        parts.append(quoted + "*" if prefix else quoted)
+    return " ".join(parts)
+
+
+def _tsquery(terms) -> str:
+    parts = []
+    for words, prefix in terms:
+        lexemes = [f"'{w}'" for w in words]
+        if prefix:
+            lexemes[-1] += ":*"
+        parts.append("(" + " <-> ".join(lexemes) + ")" if len(lexemes) > 1 else lexemes[0])
+    return " & ".join(parts)
+
+
+def install(connection) -> bool:
+    """Create the search index objects for this database, if supported"""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        statements = SQLITE_DDL
+    elif dialect == "postgresql":
+        statements = POSTGRES_DDL
+    else:
+        return False
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+    _available.pop(str(connection.engine.url), None)
+    return True
+
+
+def rebuild(connection) -> None:
+    """Re-index every resource (SQLite; the Postgres column is generated)"""
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("INSERT INTO resources_fts(resources_fts) VALUES ('rebuild')")
+
+
+def _after_create(target, connection, **kwargs) -> None:
+    try:
+        install(connection)
+    except Exception as e:
+        # e.g. SQLite built without FTS5; searches fall back to LIKE
+        current_app.logger.warning(f"Full-text search index not installed: {e}")
+
+
+event.listen(ResourceModel.__table__, "after_create", _after_create)
+
+
+def _backend() -> Optional[str]:
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _available:
+        dialect = engine.dialect.name
+        available = False
+        if dialect == "sqlite":
+            available = inspect(engine).has_table("resources_fts")
+        elif dialect == "postgresql":
+            available = "search_vector" in {c["name"] for c in inspect(engine).get_columns("resources")}
+        if not available:
+            current_app.logger.warning("Resource search index missing; run `flask search-index`")
+        _available[key] = dialect if available else None
+    return _available[key]
+
+
+def render_snippet(snippet: Optional[str]) -> Optional[str]:
+    """HTML for a raw snippet: resource text escaped, matches in ``<mark>``"""
+    if snippet is None:
+        return None
+    escaped = html.escape(snippet, quote=False)
+    return escaped.replace(SNIPPET_START, "<mark>").replace(SNIPPET_END, "</mark>")
+
+
+def apply_search(query, text: str):
+    """Restrict a Resource select to matches of ``text``, best first.
+
+    Returns ``(query, snippet_column)``; the snippet column is None on the
+    substring fallback. Pass its values through :func:`render_snippet`.
+    """
+    terms = parse_query(text)
+    if not terms:
+        return query.where(db.false()), None
+
+    backend = _backend()
+    if backend == "sqlite":
+        fts = db.table("resources_fts", db.column("rowid"))
+        weights = ", ".join(str(w) for w in SQLITE_BM25_WEIGHTS)
+        snippet = db.literal_column(
+            f"snippet(resources_fts, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16)"
+        ).label("snippet")
+        query = (
+            query.add_columns(snippet)
+            .join(fts, fts.c.rowid == ResourceModel.id)
+            .where(db.text("resources_fts MATCH :fts_query").bindparams(fts_query=_fts5_query(terms)))
+            .order_by(db.literal_column(f"bm25(resources_fts, {weights})"))
+        )
+        return query, snippet
+
+    if backend == "postgresql":
+        tsquery = db.func.to_tsquery("english", _tsquery(terms))
+        vector = db.literal_column("resources.search_vector")
+        document = db.func.coalesce(ResourceModel.content, ResourceModel.extracted_text, ResourceModel.title)
+        snippet = db.func.ts_headline(
+            "english", document, tsquery,
+            f"StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxFragments=1, MaxWords=24, MinWords=8"
+        ).label("snippet")
+        query = (
+            query.add_columns(snippet)
+            .where(vector.op("@@")(tsquery))
+            .order_by(db.func.ts_rank_cd(vector, tsquery).desc())
+        )
+        return query, snippet
+
+    pattern = f"%{text}%"
+    query = query.where(db.or_(ResourceModel.title.ilike(pattern), ResourceModel.content.ilike(pattern)))
+    return query.order_by(ResourceModel.created_at.desc()), None
+
+
+def init_app(app: Flask) -> None:
+    @app.cli.command("search-index")
+    @click.option("--rebuild/--no-rebuild", "do_rebuild", default=True, help="Re-index existing resources.")
+    def search_index_command(do_rebuild):
+        """Install the resource full-text index on an existing database"""
+        with db.engine.begin() as connection:
+            if not install(connection):
+                click.echo(f"Full-text search is not supported on {connection.dialect.name}")
+                return
+            if do_rebuild:
+                rebuild(connection)
+        click.echo("Resource search index ready")
@@ -0,0 +1,406 @@
+"""Content-addressed storage for uploaded files.
+
+Each distinct file is stored once at ``<UPLOAD_DIR>/objects/ab/cd/<sha256>``
+and :class:`StoredFile` counts the resources pointing at it, so duplicate
+uploads cost no disk and deleting a resource only removes the file with
+its last reference.
+
+Resumable uploads are assembled in ``<UPLOAD_DIR>/partial/<upload id>``.
+A request leases the chunk offset in ``upload_sessions`` before writing it,
+and chunks are hashed as they arrive; a worker process that didn't see the
+earlier chunks re-hashes the partial file once to catch up.
+
+Files only move into (or out of) the object store after the transaction
+that references (or releases) them commits, so a rollback leaves the disk
+matching the database.
+"""
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from urllib.parse import quote
+
+from flask import Flask, current_app, request, send_file
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models import Resource, StoredFile, UploadSession
+
+
+READ_SIZE = 64 * 1024
+
+# A chunk's lease outlives the writer's own deadline by this much, so the
+# writer has stopped touching the file before anyone else can claim it
+LEASE_GRACE_SECONDS = 30
+
+# session.info keys for file moves and removals waiting on the commit
+_PENDING_MOVES = "stored_files_pending_moves"
+_PENDING_REMOVALS = "stored_files_pending_removals"
+
+# Upload id -> (bytes hashed, sha256 state) for chunks seen by this process
+_hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadError(ValueError):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    """The chunk doesn't start where the upload left off"""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Expected offset {offset}")
+        self.offset = offset
+
+
+class ChunkInProgress(OffsetMismatch):
+    """Another request is still writing the chunk at this offset"""
+
+    def __init__(self, offset: int):
+        UploadError.__init__(self, f"A chunk at offset {offset} is still being written")
+        self.offset = offset
+
+
+class ChunkTimeout(UploadError):
+    pass
+
+
+def upload_dir() -> str:
+    return os.path.abspath(current_app.config.get("UPLOAD_DIR") or os.path.join(current_app.root_path, "..", "uploads"))
+
+
+def object_path(sha256: str) -> str:
+    return os.path.join(upload_dir(), "objects", sha256[:2], sha256[2:4], sha256)
+
+
+def partial_path(upload_id: str) -> str:
+    return os.path.join(upload_dir(), "partial", upload_id)
+
+
+def guess_content_type(filename: str, content_type: Optional[str] = None) -> Optional[str]:
+    # Stored objects have no extension, so the type has to be recorded
+    if content_type and content_type != "application/octet-stream":
+        return content_type
+    return mimetypes.guess_type(filename)[0] or content_type
+
+
+def _hash_prefix(path: str, length: int):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while length > 0:
+            data = f.read(min(READ_SIZE, length))
+            if not data:
+                break
+            hasher.update(data)
+            length -= len(data)
+    return hasher
+
+
+def _hasher_at(upload_id: str, offset: int):
+    with _hashers_lock:
+        state = _hashers.get(upload_id)
+    if state and state[0] == offset:
+        return state[1].copy()
+    return _hash_prefix(partial_path(upload_id), offset)
+
+
+def _copy_stream(stream, f, hasher, limit: int, deadline: Optional[float] = None) -> int:
+    """Copy up to ``limit`` bytes from ``stream``; raise if it holds more or passes ``deadline``"""
+    written = 0
+    while True:
+        data = stream.read(min(READ_SIZE, limit + 1 - written))
+        if not data:
+            return written
+        written += len(data)
+        if written > limit:
+            raise UploadError(f"Chunk exceeds {limit} bytes")
+        if deadline is not None and time.monotonic() > deadline:
+            raise ChunkTimeout("Chunk took too long to upload; resend it")
+        f.write(data)
+        hasher.update(data)
+
+
+def create_upload(user_id: int, data: dict) -> UploadSession:
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        filename=data["filename"],
+        content_type=guess_content_type(data["filename"], data.get("content_type")),
+        size=data["size"],
+        fields={key: data.get(key) for key in ("category", "tags", "goal_id")},
+    )
+    path = partial_path(upload.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    db.session.add(upload)
+    return upload
+
+
+def _current_offset(upload_id: str) -> int:
+    received = db.session.scalar(db.select(UploadSession.received).where(UploadSession.id == upload_id))
+    if received is None:
+        raise UploadError("Upload was cancelled")
+    return received
+
+
+def _release_lease(upload_id: str, token: str) -> None:
+    db.session.execute(
+        db.update(UploadSession)
+        .where(UploadSession.id == upload_id, UploadSession.writer == token)
+        .values(writer=None, writing_until=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def write_chunk(upload: UploadSession, offset: int, stream, max_bytes: int) -> int:
+    """Write a chunk at ``offset`` and return the new offset"""
+    if offset != upload.received:
+        raise OffsetMismatch(upload.received)
+    upload_id, size = upload.id, upload.size
+    token = uuid.uuid4().hex
+    lease = current_app.config.get("UPLOAD_CHUNK_LEASE_SECONDS", 600)
+    now = datetime.utcnow()
+    # Lease the offset before touching the file, so two requests for the
+    # same chunk can't interleave their bytes
+    claimed = db.session.execute(
+        db.update(UploadSession)
+        .where(
+            UploadSession.id == upload_id,
+            UploadSession.received == offset,
+            db.or_(UploadSession.writer.is_(None), UploadSession.writing_until < now),
+        )
+        .values(writer=token, writing_until=now + timedelta(seconds=lease + LEASE_GRACE_SECONDS))
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    # Don't hold a transaction open while the body streams in
+    db.session.commit()
+    if not claimed:
+        current = _current_offset(upload_id)
+        raise ChunkInProgress(current) if current == offset else OffsetMismatch(current)
+
+    try:
+        hasher = _hasher_at(upload_id, offset)
+        with open(partial_path(upload_id), "r+b") as f:
+            f.seek(offset)
+            written = _copy_stream(stream, f, hasher, min(max_bytes, size - offset), time.monotonic() + lease)
+    except BaseException:
+        _release_lease(upload_id, token)
+        raise
+
+    received = offset + written
+    finished = db.session.execute(
+        db.update(UploadSession)
+        .where(UploadSession.id == upload_id, UploadSession.writer == token)
+        .values(received=received, writer=None, writing_until=None, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    db.session.commit()
+    if not finished:
+        # The upload was cancelled while this chunk streamed in
+        raise OffsetMismatch(_current_offset(upload_id))
+    with _hashers_lock:
+        _hashers[upload_id] = (received, hasher)
+    return received
+
+
+def add_reference(sha256: str, size: int, source: str, temporary: bool = True) -> bool:
+    """Reference content ``sha256`` and move ``source`` into the store once committed.
+
+    Returns True when the content was already stored. The caller commits; on
+    rollback a ``temporary`` source is deleted and any other is left in place.
+    """
+    increment = (
+        db.update(StoredFile)
+        .where(StoredFile.sha256 == sha256)
+        .values(ref_count=StoredFile.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    target = object_path(sha256)
+    existed = db.session.execute(increment).rowcount == 1
+    if not existed:
+        try:
+            with db.session.begin_nested():
+                db.session.add(StoredFile(sha256=sha256, size=size, ref_count=1))
+        except IntegrityError:
+            # Another upload of the same bytes got there first
+            existed = db.session.execute(increment).rowcount == 1
+    db.session.info.setdefault(_PENDING_MOVES, []).append((source, target, temporary))
+    return existed
+
+
+def release(session: Session, sha256s) -> None:
+    """Drop one reference per digest; unreferenced objects are deleted once committed"""
+    connection = session.connection()
+    table = StoredFile.__table__
+    for sha256 in sha256s:
+        connection.execute(
+            db.update(table).where(table.c.sha256 == sha256).values(ref_count=table.c.ref_count - 1)
+        )
+        removed = connection.execute(
+            db.delete(table).where(table.c.sha256 == sha256, table.c.ref_count <= 0)
+        ).rowcount
+        if removed:
+            session.info.setdefault(_PENDING_REMOVALS, []).append(object_path(sha256))
+
+
+def discard(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _release_deleted_resources(session: Session, flush_context) -> None:
+    # Covers resources deleted directly and by cascade (e.g. with their user)
+    sha256s = [obj.file_sha256 for obj in session.deleted if isinstance(obj, Resource) and obj.file_sha256]
+    if sha256s:
+        release(session, sha256s)
+
+
+def _apply_after_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    for source, target, _ in session.info.pop(_PENDING_MOVES, ()):
+        try:
+            if os.path.exists(target):
+                discard(source)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(source, target)
+        except OSError as e:
+            current_app.logger.error(f"Failed to move {source} into the file store: {e}")
+    for path in session.info.pop(_PENDING_REMOVALS, ()):
+        discard(path)
+
+
+def _discard_after_rollback(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    for source, _, temporary in session.info.pop(_PENDING_MOVES, ()):
+        if temporary:
+            discard(source)
+    session.info.pop(_PENDING_REMOVALS, None)
+
+
+def store_stream(stream, max_bytes: int) -> Tuple[str, int, str, bool]:
+    """Store a whole file from ``stream``; returns (sha256, size, path, deduplicated)"""
+    path = partial_path(uuid.uuid4().hex)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    hasher = hashlib.sha256()
+    try:
+        with open(path, "wb") as f:
+            size = _copy_stream(stream, f, hasher, max_bytes)
+        sha256 = hasher.hexdigest()
+        deduplicated = add_reference(sha256, size, path)
+    except Exception:
+        discard(path)
+        raise
+    return sha256, size, object_path(sha256), deduplicated
+
+
+def complete_upload(upload: UploadSession) -> Tuple[str, str, bool]:
+    """Reference a fully received upload in the store; returns (sha256, path, deduplicated)"""
+    upload_id, size = upload.id, upload.size
+    if upload.received != size:
+        raise OffsetMismatch(upload.received)
+    # Claim the session first so a repeated request can't take a second reference
+    claimed = db.session.execute(
+        db.delete(UploadSession)
+        .where(UploadSession.id == upload_id, UploadSession.received == size)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if not claimed:
+        raise UploadError("Upload is already complete")
+    path = partial_path(upload_id)
+    hasher = _hasher_at(upload_id, size)
+    # Drop bytes left over from an interrupted chunk that was re-sent shorter
+    os.truncate(path, size)
+    sha256 = hasher.hexdigest()
+    # Kept on rollback: the upload session comes back and can be completed again
+    deduplicated = add_reference(sha256, size, path, temporary=False)
+    db.session.expunge(upload)
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+    return sha256, object_path(sha256), deduplicated
+
+
+def init_app(app: Flask) -> None:
+    if not event.contains(Session, "after_flush", _release_deleted_resources):
+        event.listen(Session, "after_flush", _release_deleted_resources)
+        event.listen(Session, "after_commit", _apply_after_commit)
+        event.listen(Session, "after_rollback", _discard_after_rollback)
+
+
+def abort_upload(upload: UploadSession) -> None:
+    discard(partial_path(upload.id))
+    with _hashers_lock:
+        _hashers.pop(upload.id, None)
+    db.session.delete(upload)
+
+
+def purge_stale_uploads() -> int:
+    """Remove uploads that haven't received a chunk within the TTL"""
+    cutoff = datetime.utcnow() - timedelta(hours=current_app.config.get("UPLOAD_SESSION_TTL_HOURS", 24))
+    stale = db.session.scalars(db.select(UploadSession).where(UploadSession.updated_at < cutoff)).all()
+    for upload in stale:
+        abort_upload(upload)
+    db.session.commit()
+    return len(stale)
+
+
+def send_stored_file(path: str, etag: Optional[str], mimetype: Optional[str], download_name: str, as_attachment: bool = False):
+    """Respond with a stored file without copying it through Python.
+
+    Directly served files go out via ``wsgi.file_wrapper`` (sendfile under
+    gunicorn) with Range and conditional request support. With
+    ``FILE_DOWNLOAD_OFFLOAD`` set, only the headers are sent and nginx
+    (``x-accel-redirect``) or Apache/lighttpd (``x-sendfile``) streams the
+    file and handles Range itself.
+    """
+    offload = current_app.config.get("FILE_DOWNLOAD_OFFLOAD")
+    internal_url = None
+    if offload == "x-accel-redirect":
+        relative = os.path.relpath(path, upload_dir())
+        if not relative.startswith(os.pardir):
+            internal_url = current_app.config.get("FILE_ACCEL_REDIRECT_PREFIX", "/protected-uploads").rstrip("/")
+            internal_url += "/" + quote(relative.replace(os.sep, "/"))
+        else:
+            offload = None
+    elif offload != "x-sendfile":
+        offload = None
+
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        etag=etag or True,
+        max_age=current_app.config.get("FILE_DOWNLOAD_MAX_AGE", 3600),
+        conditional=offload is None,
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if offload:
+        response.close()
+        response.response = []
+        response.headers.pop("Content-Length", None)
+        if offload == "x-sendfile":
+            response.headers["X-Sendfile"] = path
+        else:
+            response.headers["X-Accel-Redirect"] = internal_url
+        # Answer If-None-Match here; the proxy serves the bytes and Range
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            response.headers.pop("X-Sendfile", None)
+            response.headers.pop("X-Accel-Redirect", None)
+    return response
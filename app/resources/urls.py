@@ -0,0 +1,52 @@
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+
+
+ALLOWED_SCHEMES = {"http", "https", "ftp"}
+DEFAULT_PORTS = {"http": 80, "https": 443, "ftp": 21}
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref_src"}
+
+
+def _is_tracking(key: str) -> bool:
+    return key.startswith("utm_") or key in TRACKING_PARAMS
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """Canonical form of a web URL for de-duplication, or None if it isn't one.
+
+    Lowercases the scheme and host, drops default ports, fragments and
+    tracking parameters (``utm_*``, ``fbclid``...) and gives bare hosts a
+    ``/`` path. Scheme-less URLs are assumed to be http.
+    """
+    url = (url or "").strip()
+    if not url:
+        return None
+    if "://" not in url:
+        if ":" in url.split("/", 1)[0] and not url.split(":", 1)[1][:1].isdigit():
+            # javascript:, place:, mailto: and friends
+            return None
+        url = "http://" + url
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in ALLOWED_SCHEMES or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower()
+    if ":" in host:
+        host = f"[{host}]"
+    if port is not None and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{userinfo}@{host}"
+
+    # Filter the raw pairs so the remaining ones keep their exact encoding
+    query = [
+        pair for pair in parts.query.split("&")
+        if pair and not _is_tracking(pair.split("=", 1)[0].lower())
+    ]
+    return urlunsplit((scheme, host, parts.path or "/", "&".join(query), ""))
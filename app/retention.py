@@ -0,0 +1,163 @@
+import gzip
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from flask import current_app
+
+from .extensions import db
+from .metrics import RETENTION_ARCHIVED, RETENTION_DELETED
+from .models import Notification
+from .sync.changes import record_tombstones
+from .unread import adjust_unread
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    notification_type: str  # "*" matches any type without its own policy
+    is_read: bool
+    max_age_days: Optional[int]  # None keeps rows forever
+
+    @property
+    def name(self) -> str:
+        return f"{self.notification_type}:{'read' if self.is_read else 'unread'}"
+
+
+# Config key NOTIFICATION_RETENTION_POLICIES maps "type:read|unread" to days
+DEFAULT_POLICIES = {
+    "reminder:read": 30,
+    "reminder:unread": 90,
+    "deadline:read": 30,
+    "deadline:unread": 60,
+    "achievement:read": 365,
+    "achievement:unread": None,
+    "*:read": 30,
+    "*:unread": 180,
+}
+
+
+def load_policies(config: Dict[str, Optional[int]]) -> List[RetentionPolicy]:
+    policies = []
+    for key, days in config.items():
+        notification_type, _, state = key.partition(":")
+        if state not in ("read", "unread"):
+            raise ValueError(f"Invalid retention policy key: {key}")
+        policies.append(RetentionPolicy(notification_type, state == "read", days))
+    return policies
+
+
+def _serialize(n: Notification) -> dict:
+    return {
+        "id": n.id,
+        "user_id": n.user_id,
+        "title": n.title,
+        "message": n.message,
+        "notification_type": n.notification_type,
+        "is_read": n.is_read,
+        "action_url": n.action_url,
+        "metadata": n.metadata_json,
+        "created_at": n.created_at.isoformat(),
+        "read_at": n.read_at.isoformat() if n.read_at else None,
+    }
+
+
+def archive_rows(rows: List[Notification], archive_dir: str) -> None:
+    """Append rows to gzip NDJSON files partitioned by creation date"""
+    partitions = defaultdict(list)
+    for n in rows:
+        partitions[n.created_at.date()].append(n)
+    for day, items in partitions.items():
+        directory = os.path.join(archive_dir, f"{day:%Y}", f"{day:%m}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"notifications-{day:%Y-%m-%d}.ndjson.gz")
+        # Appending starts a new gzip member; readers treat them as one stream
+        with gzip.open(path, "at", encoding="utf-8") as fh:
+            for n in items:
+                fh.write(json.dumps(_serialize(n), ensure_ascii=False) + "\n")
+
+
+def _policy_filter(policy: RetentionPolicy, cutoff: datetime, explicit_types: List[str]):
+    conditions = [Notification.is_read == policy.is_read, Notification.created_at < cutoff]
+    if policy.notification_type == "*":
+        if explicit_types:
+            conditions.append(Notification.notification_type.not_in(explicit_types))
+    else:
+        conditions.append(Notification.notification_type == policy.notification_type)
+    return conditions
+
+
+def apply_policy(
+    policy: RetentionPolicy,
+    explicit_types: List[str],
+    chunk_size: int = 500,
+    pause: float = 0.2,
+    archive_dir: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> int:
+    """Delete (and optionally archive) expired rows for one policy in small chunks"""
+    if policy.max_age_days is None:
+        return 0
+    cutoff = (now or datetime.utcnow()) - timedelta(days=policy.max_age_days)
+    conditions = _policy_filter(policy, cutoff, explicit_types)
+
+    deleted = 0
+    last_key = None
+    while True:
+        query = db.select(Notification).where(*conditions)
+        if last_key is not None:
+            query = query.where(db.tuple_(Notification.created_at, Notification.id) > last_key)
+        rows = db.session.scalars(
+            query.order_by(Notification.created_at, Notification.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        last_key = (rows[-1].created_at, rows[-1].id)
+
+        if archive_dir:
+            archive_rows(rows, archive_dir)
+            RETENTION_ARCHIVED.labels(policy.name).inc(len(rows))
+        ids = [n.id for n in rows]
+        record_tombstones(db.session.connection(), Notification, [Notification.id.in_(ids)])
+        count = db.session.execute(
+            db.delete(Notification).where(Notification.id.in_(ids)).execution_options(synchronize_session=False)
+        ).rowcount
+        if not policy.is_read:
+            # Deleting unread rows must lower the badge in the same transaction
+            per_user = Counter(n.user_id for n in rows)
+            adjust_unread(db.session.connection(), {user_id: -removed for user_id, removed in per_user.items()})
+        # Short transactions so the write lock is released between chunks
+        db.session.commit()
+        db.session.expunge_all()
+        deleted += count
+        RETENTION_DELETED.labels(policy.name).inc(count)
+
+        if len(rows) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def run_retention(now: Optional[datetime] = None) -> int:
+    """Apply every configured retention policy, returning rows deleted"""
+    config = current_app.config
+    policies = load_policies(config.get("NOTIFICATION_RETENTION_POLICIES") or DEFAULT_POLICIES)
+    explicit_types = sorted({p.notification_type for p in policies if p.notification_type != "*"})
+    total = 0
+    for policy in policies:
+        deleted = apply_policy(
+            policy,
+            explicit_types,
+            chunk_size=config.get("NOTIFICATION_RETENTION_CHUNK_SIZE", 500),
+            pause=config.get("NOTIFICATION_RETENTION_PAUSE", 0.2),
+            archive_dir=config.get("NOTIFICATION_ARCHIVE_DIR"),
+            now=now,
+        )
+        if deleted:
+            current_app.logger.info(f"Retention policy {policy.name} removed {deleted} notifications")
+        total += deleted
+    return total
@@ -1,4 +1,8 @@
-from marshmallow import Schema, fields, validate
+from datetime import timezone
+
+from marshmallow import EXCLUDE, Schema, ValidationError, fields, post_load, validate
+
+from .reminders.recurrence import RecurrenceError, compile_rule
 
 
 class RegisterSchema(Schema):
@@ -49,6 +53,39 @@ class MilestoneCreateSchema(Schema):
     order_index = fields.Integer(load_default=0)
 
 
+class GoalPlanRequestSchema(Schema):
+    create_milestones = fields.Boolean(load_default=False)
+    hours_per_week = fields.Float(load_default=None, validate=validate.Range(min=0.5, max=100))
+
+
+class PlanMilestoneSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    title = fields.String(required=True, validate=validate.Length(min=1, max=200))
+    description = fields.String(load_default="")
+    week = fields.Integer(load_default=None)
+    estimated_hours = fields.Float(load_default=None)
+
+
+class PlanWeekSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    week = fields.Integer(required=True)
+    focus = fields.String(required=True)
+    hours = fields.Float(load_default=None)
+
+
+class GoalPlanSchema(Schema):
+    """The JSON a model is asked to return for a goal plan"""
+    class Meta:
+        unknown = EXCLUDE
+
+    milestones = fields.List(fields.Nested(PlanMilestoneSchema), required=True, validate=validate.Length(min=1))
+    schedule = fields.List(fields.Nested(PlanWeekSchema), load_default=[])
+
+
 class MilestoneUpdateSchema(Schema):
     title = fields.String(validate=validate.Length(min=1, max=200))
     description = fields.String()
@@ -66,6 +103,15 @@ class ResourceCreateSchema(Schema):
     goal_id = fields.Integer(load_default=None)
 
 
+class UploadInitSchema(Schema):
+    filename = fields.String(required=True, validate=validate.Length(min=1, max=255))
+    size = fields.Integer(required=True, validate=validate.Range(min=1))
+    content_type = fields.String(load_default=None)
+    category = fields.String(load_default="general", validate=validate.Length(min=1, max=100))
+    tags = fields.List(fields.String(), load_default=[])
+    goal_id = fields.Integer(load_default=None)
+
+
 class ResourceUpdateSchema(Schema):
     title = fields.String()
     url = fields.String(allow_none=True)
@@ -84,23 +130,78 @@ class ProgressLogSchema(Schema):
     activity_type = fields.String(load_default="study")
 
 
+def _naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
 class ReminderCreateSchema(Schema):
+    """Loads a new reminder and compiles its recurrence rule.
+
+    Pass ``context={"timezone": ...}`` to set the rule's default timezone.
+    """
     title = fields.String(required=True, validate=validate.Length(min=1, max=200))
     message = fields.String(load_default="")
     reminder_type = fields.String(required=True, validate=validate.OneOf(["daily", "weekly", "custom", "deadline"]))
-    frequency = fields.String(load_default=None)
+    frequency = fields.String(load_default=None, validate=validate.Length(max=255))
     next_reminder = fields.DateTime(required=True)
     goal_id = fields.Integer(load_default=None)
     email_enabled = fields.Boolean(load_default=True)
     in_app_enabled = fields.Boolean(load_default=True)
 
+    @post_load
+    def compile_recurrence(self, data, **kwargs):
+        data["next_reminder"] = _naive_utc(data["next_reminder"])
+        try:
+            data["recurrence"] = compile_rule(
+                data["reminder_type"], data.get("frequency"), data["next_reminder"], self.context.get("timezone")
+            )
+        except RecurrenceError as e:
+            raise ValidationError(str(e), field_name="frequency")
+        return data
+
 
 class ReminderUpdateSchema(Schema):
+    """Loads a reminder update, recompiling the rule if the schedule changed.
+
+    Pass ``context={"reminder": reminder, "timezone": ...}``.
+    """
     title = fields.String(validate=validate.Length(min=1, max=200))
     message = fields.String()
     reminder_type = fields.String(validate=validate.OneOf(["daily", "weekly", "custom", "deadline"]))
-    frequency = fields.String()
+    frequency = fields.String(allow_none=True, validate=validate.Length(max=255))
     next_reminder = fields.DateTime()
     is_active = fields.Boolean()
     email_enabled = fields.Boolean()
-    in_app_enabled = fields.Boolean()
\ No newline at end of file
+    in_app_enabled = fields.Boolean()
+
+    @post_load
+    def compile_recurrence(self, data, **kwargs):
+        if "next_reminder" in data:
+            data["next_reminder"] = _naive_utc(data["next_reminder"])
+        reminder = self.context.get("reminder")
+        if reminder is None or not {"reminder_type", "frequency", "next_reminder"} & data.keys():
+            return data
+        try:
+            data["recurrence"] = compile_rule(
+                data.get("reminder_type", reminder.reminder_type),
+                data.get("frequency", reminder.frequency),
+                data.get("next_reminder", reminder.next_reminder),
+                self.context.get("timezone")
+            )
+        except RecurrenceError as e:
+            raise ValidationError(str(e), field_name="frequency")
+        return data
+
+
+class NotificationBulkSchema(Schema):
+    """Selects notifications for a bulk update; omitted filters match everything"""
+    ids = fields.List(fields.Integer(), load_default=None, validate=validate.Length(min=1))
+    notification_type = fields.String(load_default=None)
+    before = fields.DateTime(load_default=None)
+
+    @post_load
+    def normalize(self, data, **kwargs):
+        data["before"] = _naive_utc(data["before"])
+        return data
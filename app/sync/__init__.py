@@ -0,0 +1 @@
+# Delta sync for offline-capable clients
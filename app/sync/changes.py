@@ -0,0 +1,176 @@
+"""Change feed behind ``/api/v1/sync``.
+
+Rows are selected by ``(updated_at, id)`` per user-owned table, deletes by
+``(deleted_at, id)`` from :class:`SyncTombstone`. A sync token is an opaque
+base64 cursor::
+
+    {"s": since, "u": until, "n": stream index, "t": last timestamp, "i": last id}
+
+``until`` is fixed when a sync starts so paging sees a stable window. The
+token returned with the last page starts the next window ``SYNC_SETTLE_SECONDS``
+before ``until``, so rows committed late by slow transactions are re-sent
+rather than missed; clients apply changes as idempotent upserts.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models import Achievement, Goal, Milestone, Notification, ProgressLog, Reminder, Resource, SyncTombstone
+
+
+SYNCED_MODELS = {
+    model.__tablename__: model
+    for model in (Goal, Milestone, Resource, ProgressLog, Reminder, Notification, Achievement)
+}
+STREAMS = list(SYNCED_MODELS) + ["tombstones"]
+_SYNCED_TYPES = tuple(SYNCED_MODELS.values())
+
+# Server-side details that clients never need
+EXCLUDED_COLUMNS = {"resources": {"path", "extracted_text"}}
+
+
+class SyncTokenError(ValueError):
+    pass
+
+
+@dataclass
+class SyncCursor:
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    stream: int = 0
+    last_ts: Optional[datetime] = None
+    last_id: Optional[int] = None
+
+    def encode(self) -> str:
+        data = {
+            "s": self.since.isoformat() if self.since else None,
+            "u": self.until.isoformat() if self.until else None,
+            "n": self.stream,
+            "t": self.last_ts.isoformat() if self.last_ts else None,
+            "i": self.last_id,
+        }
+        raw = json.dumps(data, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "SyncCursor":
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            data = json.loads(raw)
+            stream = int(data["n"])
+            if not 0 <= stream < len(STREAMS):
+                raise ValueError(stream)
+            return cls(
+                since=datetime.fromisoformat(data["s"]) if data["s"] else None,
+                until=datetime.fromisoformat(data["u"]) if data["u"] else None,
+                stream=stream,
+                last_ts=datetime.fromisoformat(data["t"]) if data["t"] else None,
+                last_id=int(data["i"]) if data["i"] is not None else None,
+            )
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise SyncTokenError("Invalid sync token")
+
+
+def serialize_row(obj) -> dict:
+    excluded = EXCLUDED_COLUMNS.get(obj.__tablename__, ())
+    data = {}
+    for column in obj.__table__.columns:
+        if column.key in excluded:
+            continue
+        value = getattr(obj, column.key)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        data[column.key] = value
+    return data
+
+
+def _stream_query(name: str, user_id: int, cursor: SyncCursor, limit: int):
+    if name == "tombstones":
+        model, ts_column = SyncTombstone, SyncTombstone.deleted_at
+    else:
+        model = SYNCED_MODELS[name]
+        ts_column = model.updated_at
+    query = db.select(model).where(model.user_id == user_id, ts_column <= cursor.until)
+    if cursor.since is not None:
+        query = query.where(ts_column > cursor.since)
+    if cursor.last_ts is not None:
+        query = query.where(db.tuple_(ts_column, model.id) > (cursor.last_ts, cursor.last_id))
+    return query.order_by(ts_column, model.id).limit(limit)
+
+
+def collect_changes(user_id: int, cursor: SyncCursor, limit: int) -> dict:
+    """Return up to ``limit`` changed or deleted rows after ``cursor``"""
+    changes: Dict[str, List[dict]] = {}
+    deleted: Dict[str, List[int]] = {}
+    remaining = limit
+    for index in range(cursor.stream, len(STREAMS)):
+        name = STREAMS[index]
+        if name == "tombstones" and cursor.since is None:
+            # A full sync has nothing to delete
+            break
+        if index != cursor.stream:
+            cursor.last_ts = cursor.last_id = None
+        rows = db.session.scalars(_stream_query(name, user_id, cursor, remaining)).all()
+        for row in rows:
+            if name == "tombstones":
+                deleted.setdefault(row.entity, []).append(row.entity_id)
+            else:
+                changes.setdefault(name, []).append(serialize_row(row))
+        remaining -= len(rows)
+        if remaining == 0:
+            last = rows[-1]
+            page_cursor = SyncCursor(
+                since=cursor.since,
+                until=cursor.until,
+                stream=index,
+                last_ts=last.deleted_at if name == "tombstones" else last.updated_at,
+                last_id=last.id,
+            )
+            return {"changes": changes, "deleted": deleted, "next": page_cursor.encode(), "has_more": True}
+
+    settle = timedelta(seconds=current_app.config.get("SYNC_SETTLE_SECONDS", 5))
+    final_cursor = SyncCursor(since=cursor.until - settle)
+    return {"changes": changes, "deleted": deleted, "next": final_cursor.encode(), "has_more": False}
+
+
+def record_tombstones(connection, model, conditions: list) -> None:
+    """Copy rows matched by a bulk DELETE into the tombstone table first"""
+    connection.execute(
+        db.insert(SyncTombstone).from_select(
+            ["user_id", "entity", "entity_id", "deleted_at"],
+            db.select(model.user_id, db.literal(model.__tablename__), model.id, db.literal(datetime.utcnow()))
+            .where(*conditions)
+        )
+    )
+
+
+def purge_tombstones() -> int:
+    """Drop tombstones older than the longest supported offline period"""
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config.get("SYNC_TOMBSTONE_TTL_DAYS", 30))
+    count = db.session.execute(db.delete(SyncTombstone).where(SyncTombstone.deleted_at < cutoff)).rowcount
+    db.session.commit()
+    return count
+
+
+def _tombstones_after_flush(session: Session, flush_context) -> None:
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": obj.user_id, "entity": obj.__tablename__, "entity_id": obj.id, "deleted_at": now}
+        for obj in session.deleted
+        if isinstance(obj, _SYNCED_TYPES)
+    ]
+    if rows:
+        session.connection().execute(db.insert(SyncTombstone), rows)
+
+
+def init_app(app: Flask) -> None:
+    if not event.contains(Session, "after_flush", _tombstones_after_flush):
+        event.listen(Session, "after_flush", _tombstones_after_flush)
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, request
+from flask_restful import Api, Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from .changes import SyncCursor, SyncTokenError, collect_changes
+
+bp = Blueprint("sync", __name__)
+api = Api(bp)
+
+
+def _user_id() -> int:
+    return int(get_jwt_identity())
+
+
+class SyncResource(Resource):
+    @jwt_required()
+    def get(self):
+        """Rows created, updated or deleted since the ``since`` token.
+
+        Keep calling with ``next`` while ``has_more`` is true, then store
+        ``next`` for the following sync. ``reset`` means local data must be
+        replaced by this (full) sync.
+        """
+        config = current_app.config
+        limit = request.args.get("limit", config["SYNC_PAGE_SIZE"], type=int)
+        limit = max(1, min(limit, config["SYNC_MAX_PAGE_SIZE"]))
+
+        token = request.args.get("since")
+        try:
+            cursor = SyncCursor.decode(token) if token else SyncCursor()
+        except SyncTokenError as e:
+            return {"message": str(e)}, 400
+
+        now = datetime.utcnow()
+        reset = not token
+        if cursor.since is not None and cursor.since < now - timedelta(days=config["SYNC_TOMBSTONE_TTL_DAYS"]):
+            # Tombstones this old have been purged; deletes could be missed
+            cursor = SyncCursor()
+            reset = True
+        if cursor.until is None:
+            cursor.until = now
+
+        result = collect_changes(_user_id(), cursor, limit)
+        result["reset"] = reset
+        return result, 200
+
+
+api.add_resource(SyncResource, "")
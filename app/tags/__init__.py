@@ -0,0 +1 @@
+# Normalized tag index for resources and goals
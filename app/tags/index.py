@@ -0,0 +1,193 @@
+"""Normalized tag index for resources and goals.
+
+The ``tags`` JSON columns stay the source of truth for display; a session
+hook mirrors them into ``tags`` plus the ``resource_tags``/``goal_tags``
+association tables whenever a row is created, its tags change or it is
+deleted, so tag filters and counts can use indexed joins.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import click
+from flask import Flask
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models import Goal, Resource, Tag, goal_tags, resource_tags
+
+
+MAX_TAG_LENGTH = 100
+
+# Model -> (association table, its column pointing at the model)
+LINK_TABLES = {
+    Resource: (resource_tags, resource_tags.c.resource_id),
+    Goal: (goal_tags, goal_tags.c.goal_id),
+}
+_TAGGED_TYPES = tuple(LINK_TABLES)
+
+
+def normalize_tag(name) -> str:
+    return " ".join(str(name).split()).lower()[:MAX_TAG_LENGTH]
+
+
+def normalize_tags(names: Iterable) -> List[str]:
+    if isinstance(names, str):
+        names = [names]
+    seen = {}
+    for name in names or ():
+        tag = normalize_tag(name)
+        if tag:
+            seen.setdefault(tag, None)
+    return list(seen)
+
+
+def _insert_ignore(connection, table, rows: List[dict]) -> None:
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        statement = sqlite.insert(table).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        statement = postgresql.insert(table).on_conflict_do_nothing()
+    else:
+        statement = db.insert(table)
+    connection.execute(statement, rows)
+
+
+def _tag_ids(connection, user_id: int, names: List[str]) -> Dict[str, int]:
+    query = db.select(Tag.name, Tag.id).where(Tag.user_id == user_id, Tag.name.in_(names))
+    ids = dict(connection.execute(query).all())
+    missing = [name for name in names if name not in ids]
+    if missing:
+        _insert_ignore(connection, Tag.__table__, [{"user_id": user_id, "name": name} for name in missing])
+        ids = dict(connection.execute(query).all())
+    return ids
+
+
+def set_links(connection, model, object_id: int, user_id: int, tags) -> None:
+    """Replace the association rows of one resource or goal"""
+    table, column = LINK_TABLES[model]
+    connection.execute(db.delete(table).where(column == object_id))
+    names = normalize_tags(tags)
+    if names:
+        ids = _tag_ids(connection, user_id, names)
+        connection.execute(
+            db.insert(table), [{column.key: object_id, "tag_id": ids[name]} for name in names]
+        )
+
+
+def add_links(connection, model, user_id: int, tags_by_id: Dict[int, list]) -> None:
+    """Link freshly inserted rows (no existing links) to their tags in bulk"""
+    table, column = LINK_TABLES[model]
+    wanted = {object_id: normalize_tags(tags) for object_id, tags in tags_by_id.items()}
+    names = normalize_tags(name for tags in wanted.values() for name in tags)
+    if not names:
+        return
+    ids = _tag_ids(connection, user_id, names)
+    connection.execute(
+        db.insert(table),
+        [{column.key: object_id, "tag_id": ids[name]} for object_id, tags in wanted.items() for name in tags]
+    )
+
+
+def _sync_after_flush(session: Session, flush_context) -> None:
+    changed = [obj for obj in session.new if isinstance(obj, _TAGGED_TYPES) and obj.tags]
+    changed += [
+        obj for obj in session.dirty
+        if isinstance(obj, _TAGGED_TYPES) and inspect(obj).attrs.tags.history.has_changes()
+    ]
+    deleted = [obj for obj in session.deleted if isinstance(obj, _TAGGED_TYPES)]
+    if not changed and not deleted:
+        return
+    connection = session.connection()
+    for obj in changed:
+        set_links(connection, type(obj), obj.id, obj.user_id, obj.tags)
+    for obj in deleted:
+        table, column = LINK_TABLES[type(obj)]
+        connection.execute(db.delete(table).where(column == obj.id))
+
+
+def parse_tag_filter(args) -> Tuple[List[str], bool]:
+    """Read ``?tag=a&tag=b`` (or ``tag=a,b``) and ``tag_mode=all|any``"""
+    names = []
+    for value in args.getlist("tag"):
+        names.extend(value.split(","))
+    return normalize_tags(names), args.get("tag_mode", "any") == "all"
+
+
+def filter_by_tags(query, model, user_id: int, names: List[str], match_all: bool = False):
+    """Restrict a select of ``model`` to rows tagged with any (or all) ``names``"""
+    if not names:
+        return query
+    table, column = LINK_TABLES[model]
+    matches = (
+        db.select(column)
+        .join(Tag, Tag.id == table.c.tag_id)
+        .where(Tag.user_id == user_id, Tag.name.in_(names))
+    )
+    if match_all:
+        matches = matches.group_by(column).having(db.func.count(Tag.id) == len(names))
+    return query.where(model.id.in_(matches))
+
+
+def tag_counts(user_id: int) -> List[dict]:
+    """Usage counts of every tag the user has on resources or goals"""
+    counts = defaultdict(lambda: {"resources": 0, "goals": 0})
+    for model, key in ((Resource, "resources"), (Goal, "goals")):
+        table, column = LINK_TABLES[model]
+        rows = db.session.execute(
+            db.select(Tag.name, db.func.count(column))
+            .join(table, table.c.tag_id == Tag.id)
+            .where(Tag.user_id == user_id)
+            .group_by(Tag.id, Tag.name)
+        ).all()
+        for name, count in rows:
+            counts[name][key] = count
+    result = [{"name": name, **c, "total": c["resources"] + c["goals"]} for name, c in counts.items()]
+    result.sort(key=lambda item: (-item["total"], item["name"]))
+    return result
+
+
+def purge_unused_tags() -> int:
+    """Delete tags no longer attached to anything"""
+    count = db.session.execute(
+        db.delete(Tag).where(
+            ~Tag.id.in_(db.select(resource_tags.c.tag_id)),
+            ~Tag.id.in_(db.select(goal_tags.c.tag_id))
+        )
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+def rebuild_tag_index(batch_size: int = 500) -> int:
+    """Re-derive every association row from the JSON ``tags`` columns"""
+    total = 0
+    for model in LINK_TABLES:
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                db.select(model.id, model.user_id, model.tags)
+                .where(model.id > last_id).order_by(model.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            connection = db.session.connection()
+            for object_id, user_id, tags in rows:
+                set_links(connection, model, object_id, user_id, tags)
+            db.session.commit()
+            total += len(rows)
+            last_id = rows[-1].id
+    return total
+
+
+def init_app(app: Flask) -> None:
+    if not event.contains(Session, "after_flush", _sync_after_flush):
+        event.listen(Session, "after_flush", _sync_after_flush)
+
+    @app.cli.command("tag-index")
+    def tag_index_command():
+        """Rebuild the normalized tag index from the JSON tag columns"""
+        total = rebuild_tag_index()
+        purged = purge_unused_tags()
+        click.echo(f"Indexed tags of {total} rows, removed {purged} unused tags")
@@ -0,0 +1,22 @@
+from flask import Blueprint
+from flask_restful import Api, Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from .index import tag_counts
+
+bp = Blueprint("tags", __name__)
+api = Api(bp)
+
+
+def _user_id() -> int:
+    return int(get_jwt_identity())
+
+
+class TagCountsResource(Resource):
+    @jwt_required()
+    def get(self):
+        """Tags in use with the number of resources and goals carrying each"""
+        return tag_counts(_user_id()), 200
+
+
+api.add_resource(TagCountsResource, "")
@@ -0,0 +1,306 @@
+import os
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import click
+from flask import Flask, current_app
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models import QueuedTask
+
+
+TASK_REGISTRY: Dict[str, Callable[..., Any]] = {}
+
+_workers: List["Worker"] = []
+
+
+def task(name: Optional[str] = None):
+    """Register a function as a queue task under ``name``"""
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        TASK_REGISTRY[name or func.__name__] = func
+        return func
+    return decorator
+
+
+def enqueue(
+    name: str,
+    args: Optional[dict] = None,
+    priority: int = 0,
+    run_at: Optional[datetime] = None,
+    delay: Optional[timedelta] = None,
+    max_attempts: Optional[int] = None,
+    commit: bool = True,
+    dedupe_key: Optional[str] = None,
+) -> QueuedTask:
+    """Add a task to the queue.
+
+    Pass ``commit=False`` to enqueue inside the caller's transaction so the
+    task only becomes visible if the surrounding work commits. A task with a
+    ``dedupe_key`` is only queued once; later calls return the existing row.
+    """
+    if name not in TASK_REGISTRY:
+        raise ValueError(f"Unknown task: {name}")
+    if run_at is None:
+        run_at = datetime.utcnow() + (delay or timedelta())
+    queued = QueuedTask(
+        name=name,
+        args=args or {},
+        priority=priority,
+        run_at=run_at,
+        max_attempts=max_attempts or current_app.config.get("TASK_QUEUE_MAX_ATTEMPTS", 3),
+        dedupe_key=dedupe_key,
+    )
+    if dedupe_key is None:
+        db.session.add(queued)
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.add(queued)
+        except IntegrityError:
+            queued = db.session.scalar(db.select(QueuedTask).where(QueuedTask.dedupe_key == dedupe_key))
+    if commit:
+        db.session.commit()
+    return queued
+
+
+def _claimable(now: datetime):
+    # Running tasks whose visibility timeout expired belong to a dead worker
+    return db.or_(
+        db.and_(QueuedTask.status == "queued", QueuedTask.run_at <= now),
+        db.and_(QueuedTask.status == "running", QueuedTask.locked_until <= now),
+    )
+
+
+def claim_tasks(worker_id: str, limit: int = 10, visibility_timeout: int = 300) -> List[QueuedTask]:
+    """Lock up to ``limit`` due tasks for ``worker_id``"""
+    now = datetime.utcnow()
+    locked_until = now + timedelta(seconds=visibility_timeout)
+    query = (
+        db.select(QueuedTask)
+        .where(_claimable(now))
+        .order_by(QueuedTask.priority.desc(), QueuedTask.run_at, QueuedTask.id)
+        .limit(limit)
+    )
+
+    if db.engine.dialect.name in ("postgresql", "mysql"):
+        tasks = db.session.scalars(query.with_for_update(skip_locked=True)).all()
+        for queued in tasks:
+            queued.status = "running"
+            queued.attempts += 1
+            queued.locked_by = worker_id
+            queued.locked_until = locked_until
+        db.session.commit()
+        return tasks
+
+    # SQLite has no row locks; claim each candidate with a compare-and-set
+    # UPDATE so two workers can never both win the same row.
+    candidate_ids = db.session.scalars(query.with_only_columns(QueuedTask.id)).all()
+    claimed_ids = []
+    for task_id in candidate_ids:
+        result = db.session.execute(
+            db.update(QueuedTask)
+            .where(QueuedTask.id == task_id, _claimable(now))
+            .values(
+                status="running",
+                attempts=QueuedTask.attempts + 1,
+                locked_by=worker_id,
+                locked_until=locked_until,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            claimed_ids.append(task_id)
+    db.session.commit()
+    if not claimed_ids:
+        return []
+    return db.session.scalars(
+        db.select(QueuedTask).where(QueuedTask.id.in_(claimed_ids)).order_by(QueuedTask.priority.desc(), QueuedTask.id)
+    ).all()
+
+
+def _owned(task_id: int, worker_id: str):
+    return db.and_(QueuedTask.id == task_id, QueuedTask.status == "running", QueuedTask.locked_by == worker_id)
+
+
+class LeaseHeartbeat:
+    """Keeps extending a running task's lock while its handler works"""
+
+    def __init__(self, app: Flask, task_id: int, worker_id: str, visibility_timeout: int):
+        self.app = app
+        self.task_id = task_id
+        self.worker_id = worker_id
+        self.visibility_timeout = visibility_timeout
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"task-lease-{task_id}", daemon=True)
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(max(self.visibility_timeout / 3, 1)):
+            try:
+                with self.app.app_context(), db.engine.begin() as connection:
+                    extended = connection.execute(
+                        db.update(QueuedTask)
+                        .where(_owned(self.task_id, self.worker_id))
+                        .values(locked_until=datetime.utcnow() + timedelta(seconds=self.visibility_timeout))
+                    ).rowcount
+            except Exception as e:
+                self.app.logger.warning(f"Could not extend the lease on task {self.task_id}: {e}")
+                continue
+            if not extended:
+                return
+
+
+def run_task(queued: QueuedTask, visibility_timeout: int = 300) -> bool:
+    """Execute a claimed task and record the outcome if this worker still owns it"""
+    # Read everything up front: handlers commit and roll back, expiring ``queued``
+    task_id, name, args = queued.id, queued.name, queued.args or {}
+    attempts, max_attempts, worker_id = queued.attempts, queued.max_attempts, queued.locked_by
+    handler = TASK_REGISTRY.get(name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for task {name}")
+        with LeaseHeartbeat(current_app._get_current_object(), task_id, worker_id, visibility_timeout):
+            handler(**args)
+    except Exception as e:
+        db.session.rollback()
+        values = {
+            "last_error": "".join(traceback.format_exception_only(type(e), e)).strip(),
+            "locked_by": None,
+            "locked_until": None,
+        }
+        if attempts >= max_attempts or handler is None:
+            values.update(status="failed", finished_at=datetime.utcnow())
+            message = f"Task {task_id} ({name}) failed permanently: {e}"
+        else:
+            # Exponential backoff: 30s, 60s, 120s, ...
+            backoff = current_app.config.get("TASK_QUEUE_RETRY_BACKOFF", 30) * 2 ** (attempts - 1)
+            values.update(status="queued", run_at=datetime.utcnow() + timedelta(seconds=backoff))
+            message = f"Task {task_id} ({name}) failed, retrying in {backoff}s: {e}"
+        if _finish(task_id, worker_id, values):
+            if values["status"] == "failed":
+                current_app.logger.error(message)
+            else:
+                current_app.logger.warning(message)
+        return False
+
+    return _finish(task_id, worker_id, {
+        "status": "done",
+        "finished_at": datetime.utcnow(),
+        "locked_by": None,
+        "locked_until": None,
+        "last_error": None,
+    })
+
+
+def _finish(task_id: int, worker_id: str, values: dict) -> bool:
+    recorded = db.session.execute(
+        db.update(QueuedTask)
+        .where(_owned(task_id, worker_id))
+        .values(updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    db.session.commit()
+    if not recorded:
+        current_app.logger.warning(f"Task {task_id} lost its lease to another worker; not recording the outcome")
+    return recorded
+
+
+def purge_finished_tasks(older_than: timedelta = timedelta(days=7)) -> int:
+    """Delete completed tasks older than ``older_than``"""
+    deleted = db.session.execute(
+        db.delete(QueuedTask).where(
+            QueuedTask.status == "done",
+            QueuedTask.finished_at < datetime.utcnow() - older_than,
+        )
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+class Worker:
+    """Polls the queue and runs due tasks until stopped"""
+
+    def __init__(self, app: Flask, name: Optional[str] = None):
+        self.app = app
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.poll_interval = app.config.get("TASK_QUEUE_POLL_INTERVAL", 2.0)
+        self.max_idle_interval = app.config.get("TASK_QUEUE_MAX_IDLE_INTERVAL", 30.0)
+        self.batch_size = app.config.get("TASK_QUEUE_BATCH_SIZE", 10)
+        self.visibility_timeout = app.config.get("TASK_QUEUE_VISIBILITY_TIMEOUT", 300)
+        self._stop = threading.Event()
+
+    def run_once(self) -> int:
+        """Run up to ``batch_size`` due tasks, returning the number processed"""
+        with self.app.app_context():
+            processed = 0
+            try:
+                # One claim per task, so each lease starts when its task does
+                while processed < self.batch_size:
+                    tasks = claim_tasks(self.name, 1, self.visibility_timeout)
+                    if not tasks:
+                        break
+                    run_task(tasks[0], self.visibility_timeout)
+                    processed += 1
+                return processed
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Task worker {self.name} error: {e}")
+                return processed
+            finally:
+                db.session.remove()
+
+    def run(self) -> None:
+        # Back off while the queue is empty so an idle worker barely touches the DB
+        interval = self.poll_interval
+        while not self._stop.is_set():
+            if self.run_once():
+                interval = self.poll_interval
+                continue
+            self._stop.wait(interval)
+            interval = min(interval * 2, self.max_idle_interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def start_worker_threads(app: Flask) -> None:
+    """Start in-process worker threads as configured by TASK_QUEUE_WORKER_THREADS"""
+    if _workers:
+        return
+    for i in range(app.config.get("TASK_QUEUE_WORKER_THREADS", 0)):
+        worker = Worker(app, name=f"{socket.gethostname()}:{os.getpid()}:task-worker-{i}")
+        thread = threading.Thread(target=worker.run, name=f"task-worker-{i}", daemon=True)
+        thread.start()
+        _workers.append(worker)
+
+
+def init_app(app: Flask) -> None:
+    @app.cli.command("worker")
+    @click.option("--burst", is_flag=True, help="Exit once the queue is empty.")
+    def worker_command(burst):
+        """Run a task queue worker in the foreground"""
+        worker = Worker(app)
+        if burst:
+            while worker.run_once():
+                pass
+            return
+        click.echo(f"Task worker {worker.name} started")
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            worker.stop()
+
+    if app.config.get("TASK_QUEUE_WORKER_THREADS", 0):
+        start_worker_threads(app)
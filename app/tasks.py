@@ -4,23 +4,50 @@ from flask import current_app
 from .extensions import scheduler, db
 from .models import Reminder, Notification, User, Goal
 from .email import send_email
+from .taskqueue import task, enqueue, purge_finished_tasks
+from .retention import run_retention
+from .sync.changes import purge_tombstones
+from .tags.index import purge_unused_tags
+from .unread import reconcile_unread_counts
+from .achievements import rebuild_counters, evaluate_all
+from .extraction.pipeline import extract_resource
+from .previews.cache import cache as preview_cache
+from .previews.service import generate_previews
+from .resources.links import enrich_links
+from .resources.storage import purge_stale_uploads
+from .metrics import track_job
+from .reminders.dispatcher import dispatcher as reminder_dispatcher
+from .reminders.recurrence import next_occurrences
 
 
-def schedule_jobs():
+def _job(app, name, func):
+    """Run ``func`` inside the app context with job metrics recorded"""
+    tracked = track_job(name, func)
+
+    def run():
+        with app.app_context():
+            return tracked()
+    return run
+
+
+def schedule_jobs(app):
     """Schedule all background jobs"""
     if not scheduler.get_job("heartbeat"):
         scheduler.add_job(
             id="heartbeat", 
-            func=heartbeat, 
+            func=_job(app, "heartbeat", heartbeat), 
             trigger="interval", 
             minutes=30, 
             replace_existing=True
         )
     
-    if not scheduler.get_job("process_reminders"):
+    if app.config.get("REMINDER_DISPATCHER_ENABLED", True):
+        # Reminders fire at their due time from the in-process dispatcher
+        reminder_dispatcher.start()
+    elif not scheduler.get_job("process_reminders"):
         scheduler.add_job(
             id="process_reminders", 
-            func=process_reminders, 
+            func=_job(app, "process_reminders", process_reminders), 
             trigger="interval", 
             minutes=5, 
             replace_existing=True
@@ -29,16 +56,26 @@ def schedule_jobs():
     if not scheduler.get_job("check_goal_deadlines"):
         scheduler.add_job(
             id="check_goal_deadlines", 
-            func=check_goal_deadlines, 
+            func=_job(app, "check_goal_deadlines", check_goal_deadlines), 
             trigger="interval", 
             hours=1, 
             replace_existing=True
         )
     
+    if not scheduler.get_job("cleanup_notifications"):
+        # Every process schedules this; the dedupe key lets only one queue the cleanup
+        scheduler.add_job(
+            id="cleanup_notifications",
+            func=_job(app, "cleanup_notifications", queue_nightly_cleanup),
+            trigger="cron",
+            hour=3,  # 3 AM daily, off-peak
+            replace_existing=True
+        )
+    
     if not scheduler.get_job("generate_daily_reminders"):
         scheduler.add_job(
             id="generate_daily_reminders",
-            func=generate_daily_reminders,
+            func=_job(app, "generate_daily_reminders", generate_daily_reminders),
             trigger="cron",
             hour=9,  # 9 AM daily
             replace_existing=True
@@ -48,28 +85,59 @@ def schedule_jobs():
 def heartbeat():
     """Simple heartbeat to keep scheduler alive"""
     current_app.logger.info(f"Scheduler heartbeat at {datetime.utcnow().isoformat()}Z")
+    return 0
+
 
+def _claim_reminder(reminder, next_time) -> bool:
+    """Atomically move a due reminder to its next occurrence"""
+    values = {"occurrence_count": Reminder.occurrence_count + 1}
+    if next_time:
+        values["next_reminder"] = next_time
+    else:
+        # One-shot reminder or exhausted rule
+        values["is_active"] = False
+    claimed = db.session.execute(
+        db.update(Reminder).where(
+            Reminder.id == reminder.id,
+            Reminder.is_active == True,
+            Reminder.next_reminder == reminder.next_reminder
+        ).values(**values).execution_options(synchronize_session=False)
+    ).rowcount == 1
+    db.session.commit()
+    return claimed
 
-def process_reminders():
-    """Process due reminders and send notifications"""
+
+def process_reminders(reminder_ids=None):
+    """Process due reminders and send notifications
+
+    ``reminder_ids`` restricts the run to a batch handed over by the reminder dispatcher.
+    """
     try:
         with current_app.app_context():
             now = datetime.utcnow()
-            due_reminders = db.session.scalars(
-                db.select(Reminder).where(
-                    Reminder.is_active == True,
-                    Reminder.next_reminder <= now
-                )
-            ).all()
+            query = db.select(Reminder).where(
+                Reminder.is_active == True,
+                Reminder.next_reminder <= now
+            )
+            if reminder_ids is not None:
+                query = query.where(Reminder.id.in_(reminder_ids))
+            due_reminders = db.session.scalars(query).all()
+            next_times = next_occurrences(due_reminders, now)
             
+            processed = 0
             for reminder in due_reminders:
+                reminder_id = reminder.id
                 try:
+                    # Claim this occurrence before sending so concurrent dispatchers never send it twice
+                    if not _claim_reminder(reminder, next_times[reminder.id]):
+                        continue
+                    
                     # Create in-app notification if enabled
                     if reminder.in_app_enabled:
                         notification = Notification(
                             user_id=reminder.user_id,
                             title=reminder.title,
-                            message=reminder.message,
+                            message=reminder.message or "",
                             notification_type="reminder",
                             action_url=f"/goals/{reminder.goal_id}" if reminder.goal_id else None,
                             metadata_json={"reminder_id": reminder.id}
@@ -107,43 +175,15 @@ def process_reminders():
                             except Exception as e:
                                 current_app.logger.error(f"Failed to send reminder email: {e}")
                     
-                    # Update next reminder time based on frequency
-                    if reminder.reminder_type == "daily":
-                        reminder.next_reminder = now + timedelta(days=1)
-                    elif reminder.reminder_type == "weekly":
-                        reminder.next_reminder = now + timedelta(weeks=1)
-                    elif reminder.reminder_type == "custom" and reminder.frequency:
-                        # Parse custom frequency (e.g., "3 days", "2 hours")
-                        try:
-                            parts = reminder.frequency.split()
-                            if len(parts) == 2:
-                                amount = int(parts[0])
-                                unit = parts[1].lower()
-                                if unit.startswith('day'):
-                                    reminder.next_reminder = now + timedelta(days=amount)
-                                elif unit.startswith('hour'):
-                                    reminder.next_reminder = now + timedelta(hours=amount)
-                                elif unit.startswith('week'):
-                                    reminder.next_reminder = now + timedelta(weeks=amount)
-                                else:
-                                    # Default to daily if unit not recognized
-                                    reminder.next_reminder = now + timedelta(days=1)
-                            else:
-                                # Default to daily if parsing fails
-                                reminder.next_reminder = now + timedelta(days=1)
-                        except (ValueError, IndexError):
-                            # Default to daily if parsing fails
-                            reminder.next_reminder = now + timedelta(days=1)
-                    else:
-                        # For deadline reminders, deactivate after sending
-                        reminder.is_active = False
-                    
                     db.session.commit()
+                    processed += 1
                     current_app.logger.info(f"Processed reminder {reminder.id} for user {reminder.user_id}")
                     
                 except Exception as e:
-                    current_app.logger.error(f"Error processing reminder {reminder.id}: {e}")
                     db.session.rollback()
+                    current_app.logger.error(f"Error processing reminder {reminder_id}: {e}")
+            
+            return processed
                     
     except Exception as e:
         current_app.logger.error(f"Error in process_reminders: {e}")
@@ -155,6 +195,7 @@ def check_goal_deadlines():
         with current_app.app_context():
             from datetime import date
             
+            created = 0
             # Check for goals due in 1 day, 3 days, and 7 days
             for days_ahead in [1, 3, 7]:
                 target_date = date.today() + timedelta(days=days_ahead)
@@ -202,6 +243,7 @@ def check_goal_deadlines():
                             }
                         )
                         db.session.add(notification)
+                        created += 1
                         
                         # Also send email if user has email notifications enabled
                         user = db.session.get(User, goal.user_id)
@@ -240,6 +282,7 @@ def check_goal_deadlines():
             
             db.session.commit()
             current_app.logger.info("Completed goal deadline check")
+            return created
             
     except Exception as e:
         current_app.logger.error(f"Error in check_goal_deadlines: {e}")
@@ -258,6 +301,7 @@ def generate_daily_reminders():
                 )
             ).all()
             
+            created = 0
             for user in active_users:
                 # Check if user has any active goals
                 active_goals = db.session.scalars(
@@ -312,14 +356,17 @@ def generate_daily_reminders():
                             }
                         )
                         db.session.add(notification)
+                        created += 1
             
             db.session.commit()
             current_app.logger.info(f"Generated daily reminders for {len(active_users)} active users")
+            return created
             
     except Exception as e:
         current_app.logger.error(f"Error in generate_daily_reminders: {e}")
 
 
+@task()
 def create_achievement_notification(user_id: int, achievement_type: str, title: str, message: str):
     """Create an achievement notification"""
     try:
@@ -338,105 +385,67 @@ def create_achievement_notification(user_id: int, achievement_type: str, title:
         current_app.logger.error(f"Error creating achievement notification: {e}")
 
 
+@task()
 def check_achievements(user_id: int):
-    """Check and award achievements for a user"""
+    """Rebuild a user's achievement counters from history and award anything missing"""
     try:
         with current_app.app_context():
-            user = db.session.get(User, user_id)
-            if not user:
+            if not db.session.get(User, user_id):
                 return
-            
-            goals = db.session.scalars(
-                db.select(Goal).where(Goal.user_id == user_id)
-            ).all()
-            
-            completed_goals = [g for g in goals if g.is_completed]
-            streak = user.get_learning_streak()
-            
-            # First goal completion
-            if len(completed_goals) == 1:
-                create_achievement_notification(
-                    user_id,
-                    "first_goal",
-                    "🎯 First Goal Complete!",
-                    "Congratulations on completing your first learning goal! This is just the beginning of your journey."
-                )
-            
-            # Multiple goal milestones
-            elif len(completed_goals) == 5:
-                create_achievement_notification(
-                    user_id,
-                    "goal_master",
-                    "🏆 Goal Master!",
-                    "Amazing! You've completed 5 learning goals. You're becoming a learning champion!"
-                )
-            
-            elif len(completed_goals) == 10:
-                create_achievement_notification(
-                    user_id,
-                    "learning_champion",
-                    "🌟 Learning Champion!",
-                    "Incredible! You've completed 10 learning goals. Your dedication is truly inspiring!"
-                )
-            
-            # Streak achievements
-            if streak == 7:
-                create_achievement_notification(
-                    user_id,
-                    "week_streak",
-                    "🔥 Week Streak!",
-                    "You've maintained a 7-day learning streak! Consistency is the key to success."
-                )
-            
-            elif streak == 30:
-                create_achievement_notification(
-                    user_id,
-                    "month_streak",
-                    "💪 Month Streak!",
-                    "Outstanding! You've maintained a 30-day learning streak. You're unstoppable!"
-                )
-            
-            elif streak == 100:
-                create_achievement_notification(
-                    user_id,
-                    "century_streak",
-                    "🏅 Century Streak!",
-                    "Legendary! 100 days of continuous learning. You're an inspiration to others!"
-                )
-            
+            rebuild_counters(user_id)
+            evaluate_all(user_id)
+            db.session.commit()
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Error checking achievements for user {user_id}: {e}")
 
 
+def queue_nightly_cleanup():
+    """Queue tonight's housekeeping once, however many processes run the scheduler"""
+    try:
+        with current_app.app_context():
+            enqueue("cleanup_old_notifications", dedupe_key=f"nightly-cleanup:{datetime.utcnow().date().isoformat()}")
+            return 1
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error queueing nightly cleanup: {e}")
+
+
+@task()
 def cleanup_old_notifications():
-    """Clean up old notifications (older than 30 days)"""
+    """Nightly housekeeping: notification retention, finished tasks, sync tombstones, unused tags, preview cache, stale uploads, unread counters"""
     try:
         with current_app.app_context():
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            
-            deleted_count = db.session.execute(
-                db.delete(Notification).where(
-                    Notification.created_at < thirty_days_ago,
-                    Notification.is_read == True
-                )
-            ).rowcount
-            
-            db.session.commit()
-            current_app.logger.info(f"Cleaned up {deleted_count} old notifications")
+            deleted_count = run_retention()
+            purged = purge_finished_tasks()
+            purge_tombstones()
+            purge_unused_tags()
+            preview_cache.evict()
+            purge_stale_uploads()
+            fixed = reconcile_unread_counts()
+            if fixed:
+                current_app.logger.warning(f"Repaired {fixed} drifted unread notification counters")
+            current_app.logger.info(f"Cleaned up {deleted_count} old notifications and {purged} finished tasks")
+            return deleted_count
             
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Error in cleanup_old_notifications: {e}")
 
 
-# Schedule cleanup job to run weekly
-def schedule_cleanup():
-    """Schedule the cleanup job"""
-    if not scheduler.get_job("cleanup_notifications"):
-        scheduler.add_job(
-            id="cleanup_notifications",
-            func=cleanup_old_notifications,
-            trigger="cron",
-            day_of_week=0,  # Sunday
-            hour=2,  # 2 AM
-            replace_existing=True
-        )
\ No newline at end of file
+@task()
+def extract_resource_content(resource_id: int):
+    """Pull text and metadata out of an uploaded file in a child process"""
+    extract_resource(resource_id)
+
+
+@task()
+def generate_resource_previews(resource_id: int):
+    """Render thumbnails for an uploaded file ahead of the first request"""
+    generate_previews(resource_id)
+
+
+@task()
+def enrich_link_metadata(resource_ids: list):
+    """Fetch title, description, favicon and canonical URL for link resources"""
+    enrich_links(resource_ids)
@@ -0,0 +1,98 @@
+from collections import Counter
+from typing import Dict
+
+from flask import Flask
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import Notification, NotificationCounter
+
+
+# A user without a counter row has not been counted yet; the first badge
+# read counts their notifications once and every later change adjusts it.
+
+
+def _count_unread(user_id: int) -> int:
+    return db.session.scalar(
+        db.select(db.func.count(Notification.id)).where(
+            Notification.user_id == user_id,
+            Notification.is_read == False
+        )
+    ) or 0
+
+
+def get_unread_count(user_id: int) -> int:
+    """Unread notifications for a user: one primary-key lookup once counted"""
+    counter = db.session.get(NotificationCounter, user_id)
+    if counter is not None:
+        return counter.unread
+    counter = NotificationCounter(user_id=user_id, unread=_count_unread(user_id))
+    try:
+        with db.session.begin_nested():
+            db.session.add(counter)
+    except IntegrityError:
+        # A concurrent first read counted them; use its row
+        counter = db.session.get(NotificationCounter, user_id)
+    db.session.commit()
+    return counter.unread
+
+
+def adjust_unread(connection, deltas: Dict[int, int]) -> None:
+    """Apply per-user unread deltas in the caller's transaction"""
+    for user_id, delta in deltas.items():
+        if not delta:
+            continue
+        connection.execute(
+            db.update(NotificationCounter)
+            .where(NotificationCounter.user_id == user_id)
+            .values(unread=NotificationCounter.unread + delta)
+        )
+
+
+def reconcile_unread_counts() -> int:
+    """Recount every stored counter from the notifications table, repairing drift"""
+    actual = (
+        db.select(db.func.count(Notification.id))
+        .where(Notification.user_id == NotificationCounter.user_id, Notification.is_read == False)
+        .scalar_subquery()
+    )
+    fixed = db.session.execute(
+        db.update(NotificationCounter).where(NotificationCounter.unread != actual).values(unread=actual)
+    ).rowcount
+    db.session.commit()
+    return fixed
+
+
+def _unread_deltas(session: Session) -> Counter:
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, Notification):
+            continue
+        history = inspect(obj).attrs.is_read.history
+        if not history.added or not history.deleted:
+            continue
+        was_read, is_read = bool(history.deleted[0]), bool(history.added[0])
+        if was_read != is_read:
+            deltas[obj.user_id] += -1 if is_read else 1
+    return deltas
+
+
+def _adjust_after_flush(session: Session, flush_context) -> None:
+    # Runs inside the flush's transaction, so the counter commits or rolls
+    # back together with the notification rows that changed it.
+    deltas = _unread_deltas(session)
+    if deltas:
+        adjust_unread(session.connection(), deltas)
+
+
+def init_app(app: Flask) -> None:
+    if not event.contains(Session, "after_flush", _adjust_after_flush):
+        event.listen(Session, "after_flush", _adjust_after_flush)
@@ -90,9 +90,22 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # the resource search index is created with raw DDL rather than from
+    # the models, so autogenerate must not offer to drop it
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'table' and reflected and compare_to is None:
+            return not name.startswith('resources_fts')
+        if type_ == 'column' and reflected and compare_to is None:
+            return name != 'search_vector'
+        if type_ == 'index' and reflected and compare_to is None:
+            return name != 'ix_resources_search'
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
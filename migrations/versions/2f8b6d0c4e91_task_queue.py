@@ -0,0 +1,44 @@
+"""task queue
+
+Revision ID: 2f8b6d0c4e91
+Revises: ddc38f111011
+Create Date: 2026-10-19 09:09:36.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f8b6d0c4e91'
+down_revision = 'ddc38f111011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('task_queue',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('args', sa.JSON(), nullable=True),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('locked_by', sa.String(length=100), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_task_queue_claim', 'task_queue', ['status', 'run_at', 'priority'], unique=False)
+    op.create_index('ix_task_queue_name', 'task_queue', ['name'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_task_queue_name', table_name='task_queue')
+    op.drop_index('ix_task_queue_claim', table_name='task_queue')
+    op.drop_table('task_queue')
@@ -0,0 +1,40 @@
+"""reminder recurrence
+
+Revision ID: 3e9a6c4f8b17
+Revises: 8c2f5d1e7a63
+Create Date: 2026-10-19 09:14:52.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e9a6c4f8b17'
+down_revision = '8c2f5d1e7a63'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(connection, table):
+    return sa.inspect(connection).has_table(table)
+
+
+def upgrade():
+    # Where this schema already has reminders. Existing rules keep a NULL
+    # recurrence and are compiled from frequency when they next fire.
+    if not _has_table(op.get_bind(), 'reminders'):
+        return
+    with op.batch_alter_table('reminders', schema=None) as batch_op:
+        batch_op.alter_column('frequency', existing_type=sa.String(length=50), type_=sa.String(length=255), existing_nullable=True)
+        batch_op.add_column(sa.Column('recurrence', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('occurrence_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    if not _has_table(op.get_bind(), 'reminders'):
+        return
+    with op.batch_alter_table('reminders', schema=None) as batch_op:
+        batch_op.drop_column('occurrence_count')
+        batch_op.drop_column('recurrence')
+        batch_op.alter_column('frequency', existing_type=sa.String(length=255), type_=sa.String(length=50), existing_nullable=True)
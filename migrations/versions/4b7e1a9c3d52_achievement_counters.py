@@ -0,0 +1,55 @@
+"""achievement counters
+
+Revision ID: 4b7e1a9c3d52
+Revises: 2f8b6d0c4e91
+Create Date: 2026-10-19 09:10:51.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e1a9c3d52'
+down_revision = '2f8b6d0c4e91'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(connection, table):
+    return sa.inspect(connection).has_table(table)
+
+
+def upgrade():
+    # Filled in lazily: a user's row is recounted from the source tables the first time it is read
+    op.create_table('user_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('goals_completed', sa.Integer(), nullable=False),
+    sa.Column('milestones_completed', sa.Integer(), nullable=False),
+    sa.Column('progress_logs', sa.Integer(), nullable=False),
+    sa.Column('minutes_total', sa.Integer(), nullable=False),
+    sa.Column('current_streak', sa.Integer(), nullable=False),
+    sa.Column('longest_streak', sa.Integer(), nullable=False),
+    sa.Column('last_activity_date', sa.Date(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Where this schema already has achievements; awards are once per type,
+    # so keep the earliest of any duplicates
+    if _has_table(op.get_bind(), 'achievements'):
+        op.execute(
+            "DELETE FROM achievements WHERE id NOT IN "
+            "(SELECT id FROM (SELECT MIN(id) AS id FROM achievements GROUP BY user_id, achievement_type) AS keep)"
+        )
+        with op.batch_alter_table('achievements', schema=None) as batch_op:
+            batch_op.create_unique_constraint('uq_achievements_user_type', ['user_id', 'achievement_type'])
+
+
+def downgrade():
+    if _has_table(op.get_bind(), 'achievements'):
+        with op.batch_alter_table('achievements', schema=None) as batch_op:
+            batch_op.drop_constraint('uq_achievements_user_type', type_='unique')
+
+    op.drop_table('user_counters')
@@ -0,0 +1,31 @@
+"""notification retention index
+
+Revision ID: 5f1d8b3a6e24
+Revises: 3e9a6c4f8b17
+Create Date: 2026-10-19 09:15:39.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f1d8b3a6e24'
+down_revision = '3e9a6c4f8b17'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(connection, table):
+    return sa.inspect(connection).has_table(table)
+
+
+def upgrade():
+    # Where this schema already has notifications
+    if _has_table(op.get_bind(), 'notifications'):
+        op.create_index('ix_notifications_retention', 'notifications', ['notification_type', 'is_read', 'created_at'], unique=False)
+
+
+def downgrade():
+    if _has_table(op.get_bind(), 'notifications'):
+        op.drop_index('ix_notifications_retention', table_name='notifications')
@@ -0,0 +1,72 @@
+"""delta sync
+
+Revision ID: 61c3f9a8e2d7
+Revises: 6a2c9e7d4f15
+Create Date: 2026-10-19 09:21:43.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '61c3f9a8e2d7'
+down_revision = '6a2c9e7d4f15'
+branch_labels = None
+depends_on = None
+
+
+# Tables served by /api/v1/sync, each read by (user_id, updated_at)
+SYNCED_TABLES = ['goals', 'milestones', 'resources', 'progress_logs', 'reminders', 'notifications', 'achievements']
+
+
+def _columns(connection, table):
+    inspector = sa.inspect(connection)
+    if not inspector.has_table(table):
+        return set()
+    return {c["name"] for c in inspector.get_columns(table)}
+
+
+def upgrade():
+    op.create_table('sync_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sync_tombstones_user_deleted', 'sync_tombstones', ['user_id', 'deleted_at'], unique=False)
+
+    connection = op.get_bind()
+    for table in ('notifications', 'progress_logs'):
+        columns = _columns(connection, table)
+        if not columns or 'updated_at' in columns:
+            continue
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = created_at")
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+    for table in SYNCED_TABLES:
+        if {'user_id', 'updated_at'} <= _columns(connection, table):
+            op.create_index(f'ix_{table}_user_updated', table, ['user_id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    for table in SYNCED_TABLES:
+        if not inspector.has_table(table):
+            continue
+        if f'ix_{table}_user_updated' in {i["name"] for i in inspector.get_indexes(table)}:
+            op.drop_index(f'ix_{table}_user_updated', table_name=table)
+
+    for table in ('notifications', 'progress_logs'):
+        if 'updated_at' in _columns(connection, table):
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.drop_column('updated_at')
+
+    op.drop_index('ix_sync_tombstones_user_deleted', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
@@ -0,0 +1,31 @@
+"""notification counters
+
+Revision ID: 6a2c9e7d4f15
+Revises: 5f1d8b3a6e24
+Create Date: 2026-10-19 09:19:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a2c9e7d4f15'
+down_revision = '5f1d8b3a6e24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled in lazily: a user's count is taken from notifications the first time it is read
+    op.create_table('notification_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('notification_counters')
@@ -0,0 +1,103 @@
+"""normalized tags
+
+Revision ID: 7c1e4b2a9d30
+Revises: e7a1d4c9b826
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4b2a9d30'
+down_revision = 'e7a1d4c9b826'
+branch_labels = None
+depends_on = None
+
+
+def _normalize(names):
+    if isinstance(names, str):
+        try:
+            names = json.loads(names)
+        except ValueError:
+            names = [names]
+    if isinstance(names, str):
+        names = [names]
+    seen = {}
+    for name in names or ():
+        tag = " ".join(str(name).split()).lower()[:100]
+        if tag:
+            seen.setdefault(tag, None)
+    return list(seen)
+
+
+def _backfill(connection, source, link, link_column):
+    columns = {c["name"] for c in sa.inspect(connection).get_columns(source)}
+    if "tags" not in columns:
+        return
+    tags = sa.Table(
+        "tags", sa.MetaData(),
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer),
+        sa.Column("name", sa.String(100)),
+        sa.Column("created_at", sa.DateTime),
+    )
+    links = sa.table(link, sa.column(link_column), sa.column("tag_id"))
+    rows = connection.execute(sa.text(f"SELECT id, user_id, tags FROM {source} WHERE tags IS NOT NULL")).all()
+    known = {(r.user_id, r.name): r.id for r in connection.execute(sa.select(tags.c.id, tags.c.user_id, tags.c.name))}
+    for object_id, user_id, raw in rows:
+        pairs = []
+        for name in _normalize(raw):
+            tag_id = known.get((user_id, name))
+            if tag_id is None:
+                tag_id = connection.execute(
+                    sa.insert(tags).values(user_id=user_id, name=name, created_at=sa.func.now())
+                ).inserted_primary_key[0]
+                known[(user_id, name)] = tag_id
+            pairs.append({link_column: object_id, "tag_id": tag_id})
+        if pairs:
+            connection.execute(sa.insert(links), pairs)
+
+
+def upgrade():
+    op.create_table('tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'name', name='uq_tags_user_name')
+    )
+    op.create_table('resource_tags',
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('resource_id', 'tag_id')
+    )
+    op.create_index('ix_resource_tags_tag', 'resource_tags', ['tag_id', 'resource_id'], unique=False)
+    op.create_table('goal_tags',
+    sa.Column('goal_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['goal_id'], ['goals.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('goal_id', 'tag_id')
+    )
+    op.create_index('ix_goal_tags_tag', 'goal_tags', ['tag_id', 'goal_id'], unique=False)
+
+    # Populate from the JSON tag lists, where this schema already has them
+    connection = op.get_bind()
+    _backfill(connection, 'resources', 'resource_tags', 'resource_id')
+    _backfill(connection, 'goals', 'goal_tags', 'goal_id')
+
+
+def downgrade():
+    op.drop_index('ix_goal_tags_tag', table_name='goal_tags')
+    op.drop_table('goal_tags')
+    op.drop_index('ix_resource_tags_tag', table_name='resource_tags')
+    op.drop_table('resource_tags')
+    op.drop_table('tags')
@@ -0,0 +1,66 @@
+"""reminder dispatch
+
+Revision ID: 8c2f5d1e7a63
+Revises: 4b7e1a9c3d52
+Create Date: 2026-10-19 09:13:06.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2f5d1e7a63'
+down_revision = '4b7e1a9c3d52'
+branch_labels = None
+depends_on = None
+
+
+def _columns(connection, table):
+    inspector = sa.inspect(connection)
+    if not inspector.has_table(table):
+        return set()
+    return {c["name"] for c in inspector.get_columns(table)}
+
+
+def upgrade():
+    # Only where this schema already has the reminder and notification tables
+    connection = op.get_bind()
+    columns = _columns(connection, 'reminders')
+    if columns:
+        with op.batch_alter_table('reminders', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('email_enabled', sa.Boolean(), server_default=sa.true(), nullable=False))
+            batch_op.add_column(sa.Column('in_app_enabled', sa.Boolean(), server_default=sa.true(), nullable=False))
+            for name in ('created_at', 'updated_at'):
+                if name not in columns:
+                    batch_op.add_column(sa.Column(name, sa.DateTime(), nullable=True))
+        op.execute("UPDATE reminders SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+        op.execute("UPDATE reminders SET updated_at = created_at WHERE updated_at IS NULL")
+        with op.batch_alter_table('reminders', schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+            batch_op.create_index('ix_reminders_active_next', ['is_active', 'next_reminder'], unique=False)
+
+    # The delivery switches belong to the reminder, not to each notification
+    columns = _columns(connection, 'notifications')
+    if {'email_enabled', 'in_app_enabled'} & columns:
+        with op.batch_alter_table('notifications', schema=None) as batch_op:
+            for name in ('email_enabled', 'in_app_enabled'):
+                if name in columns:
+                    batch_op.drop_column(name)
+
+
+def downgrade():
+    connection = op.get_bind()
+    if _columns(connection, 'notifications'):
+        with op.batch_alter_table('notifications', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('email_enabled', sa.Boolean(), server_default=sa.true(), nullable=False))
+            batch_op.add_column(sa.Column('in_app_enabled', sa.Boolean(), server_default=sa.true(), nullable=False))
+
+    if _columns(connection, 'reminders'):
+        with op.batch_alter_table('reminders', schema=None) as batch_op:
+            batch_op.drop_index('ix_reminders_active_next')
+            batch_op.drop_column('updated_at')
+            batch_op.drop_column('created_at')
+            batch_op.drop_column('in_app_enabled')
+            batch_op.drop_column('email_enabled')
@@ -0,0 +1,28 @@
+"""upload chunk leases
+
+Revision ID: a8e3f7b2c641
+Revises: f2a6c8e4d957
+Create Date: 2026-10-19 10:06:08.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e3f7b2c641'
+down_revision = 'f2a6c8e4d957'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('upload_sessions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('writer', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('writing_until', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('upload_sessions', schema=None) as batch_op:
+        batch_op.drop_column('writing_until')
+        batch_op.drop_column('writer')
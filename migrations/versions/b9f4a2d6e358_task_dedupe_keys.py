@@ -0,0 +1,28 @@
+"""task dedupe keys
+
+Revision ID: b9f4a2d6e358
+Revises: a8e3f7b2c641
+Create Date: 2026-10-19 10:07:46.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9f4a2d6e358'
+down_revision = 'a8e3f7b2c641'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('task_queue', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dedupe_key', sa.String(length=200), nullable=True))
+        batch_op.create_unique_constraint('uq_task_queue_dedupe_key', ['dedupe_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('task_queue', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_task_queue_dedupe_key', type_='unique')
+        batch_op.drop_column('dedupe_key')
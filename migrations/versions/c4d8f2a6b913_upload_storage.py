@@ -0,0 +1,75 @@
+"""upload storage
+
+Revision ID: c4d8f2a6b913
+Revises: 7c1e4b2a9d30
+Create Date: 2026-10-19 09:32:56.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8f2a6b913'
+down_revision = '7c1e4b2a9d30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stored_files',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_table('upload_sessions',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('content_type', sa.String(length=100), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('received', sa.BigInteger(), nullable=False),
+    sa.Column('fields', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_upload_sessions_updated_at', 'upload_sessions', ['updated_at'], unique=False)
+    op.create_index('ix_upload_sessions_user_id', 'upload_sessions', ['user_id'], unique=False)
+
+    # Files uploaded before this revision keep their own path and no digest
+    if op.get_bind().dialect.name == 'sqlite':
+        # A batch rebuild of resources would drop its search index triggers
+        op.execute("ALTER TABLE resources ADD COLUMN file_sha256 VARCHAR(64) REFERENCES stored_files (sha256)")
+    else:
+        op.add_column('resources', sa.Column(
+            'file_sha256', sa.String(length=64),
+            sa.ForeignKey('stored_files.sha256', name='fk_resources_file_sha256_stored_files'), nullable=True
+        ))
+    op.create_index('ix_resources_file_sha256', 'resources', ['file_sha256'], unique=False)
+
+
+def downgrade():
+    connection = op.get_bind()
+    op.drop_index('ix_resources_file_sha256', table_name='resources')
+    if connection.dialect.name == 'sqlite':
+        # SQLite can't drop a foreign key column in place; put the triggers
+        # back after batch mode rebuilds the table
+        triggers = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'resources'"
+        ).scalars().all()
+        with op.batch_alter_table('resources', schema=None) as batch_op:
+            batch_op.drop_column('file_sha256')
+        for statement in triggers:
+            op.execute(statement)
+    else:
+        op.drop_constraint('fk_resources_file_sha256_stored_files', 'resources', type_='foreignkey')
+        op.drop_column('resources', 'file_sha256')
+
+    op.drop_index('ix_upload_sessions_user_id', table_name='upload_sessions')
+    op.drop_index('ix_upload_sessions_updated_at', table_name='upload_sessions')
+    op.drop_table('upload_sessions')
+    op.drop_table('stored_files')
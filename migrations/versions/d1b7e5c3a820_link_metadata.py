@@ -0,0 +1,37 @@
+"""link metadata
+
+Revision ID: d1b7e5c3a820
+Revises: c4d8f2a6b913
+Create Date: 2026-10-19 09:38:40.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1b7e5c3a820'
+down_revision = 'c4d8f2a6b913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('link_metadata',
+    sa.Column('url_hash', sa.String(length=64), nullable=False),
+    sa.Column('url', sa.Text(), nullable=False),
+    sa.Column('title', sa.String(length=500), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('favicon', sa.String(length=1024), nullable=True),
+    sa.Column('canonical_url', sa.String(length=1024), nullable=True),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('error', sa.String(length=255), nullable=True),
+    sa.Column('etag', sa.String(length=255), nullable=True),
+    sa.Column('last_modified', sa.String(length=100), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('url_hash')
+    )
+
+
+def downgrade():
+    op.drop_table('link_metadata')
@@ -0,0 +1,100 @@
+"""resource search index
+
+Revision ID: e7a1d4c9b826
+Revises: 61c3f9a8e2d7
+Create Date: 2026-10-19 09:23:21.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a1d4c9b826'
+down_revision = '61c3f9a8e2d7'
+branch_labels = None
+depends_on = None
+
+
+# As in app.resources.search at this revision
+INDEXED_COLUMNS = {'title', 'content', 'tags', 'extracted_text'}
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS resources_fts USING fts5(
+        title, content, tags, extracted_text,
+        content='resources', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resources_fts_ai AFTER INSERT ON resources BEGIN
+        INSERT INTO resources_fts(rowid, title, content, tags, extracted_text)
+        VALUES (new.id, new.title, new.content, new.tags, new.extracted_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resources_fts_ad AFTER DELETE ON resources BEGIN
+        INSERT INTO resources_fts(resources_fts, rowid, title, content, tags, extracted_text)
+        VALUES ('delete', old.id, old.title, old.content, old.tags, old.extracted_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resources_fts_au AFTER UPDATE OF title, content, tags, extracted_text ON resources BEGIN
+        INSERT INTO resources_fts(resources_fts, rowid, title, content, tags, extracted_text)
+        VALUES ('delete', old.id, old.title, old.content, old.tags, old.extracted_text);
+        INSERT INTO resources_fts(rowid, title, content, tags, extracted_text)
+        VALUES (new.id, new.title, new.content, new.tags, new.extracted_text);
+    END
+    """,
+    # Index the rows that already exist
+    "INSERT INTO resources_fts(resources_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_DDL = [
+    # A stored generated column fills itself for existing rows
+    """
+    ALTER TABLE resources ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(tags::text, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(extracted_text, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_resources_search ON resources USING GIN (search_vector)",
+]
+
+
+def upgrade():
+    # Text pulled from uploaded files; indexed along with the resource's own fields
+    op.add_column('resources', sa.Column('extracted_text', sa.Text(), nullable=True))
+
+    connection = op.get_bind()
+    columns = {c["name"] for c in sa.inspect(connection).get_columns('resources')}
+    if not INDEXED_COLUMNS <= columns:
+        # Searches fall back to substring matching; `flask search-index` installs it later
+        return
+    if connection.dialect.name == 'sqlite':
+        if not connection.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar():
+            return
+        statements = SQLITE_DDL
+    elif connection.dialect.name == 'postgresql':
+        statements = POSTGRES_DDL
+    else:
+        return
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    connection = op.get_bind()
+    if connection.dialect.name == 'sqlite':
+        for trigger in ('resources_fts_au', 'resources_fts_ad', 'resources_fts_ai'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS resources_fts")
+    elif connection.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_resources_search")
+        op.execute("ALTER TABLE resources DROP COLUMN IF EXISTS search_vector")
+
+    with op.batch_alter_table('resources', schema=None) as batch_op:
+        batch_op.drop_column('extracted_text')
@@ -0,0 +1,36 @@
+"""resource embeddings
+
+Revision ID: f2a6c8e4d957
+Revises: d1b7e5c3a820
+Create Date: 2026-10-19 09:46:50.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6c8e4d957'
+down_revision = 'd1b7e5c3a820'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # New and edited resources are embedded on write; `flask embeddings` backfills the rest
+    op.create_table('resource_embeddings',
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('model', sa.String(length=50), nullable=False),
+    sa.Column('vector', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('resource_id')
+    )
+    op.create_index('ix_resource_embeddings_user_model_updated', 'resource_embeddings', ['user_id', 'model', 'updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_resource_embeddings_user_model_updated', table_name='resource_embeddings')
+    op.drop_table('resource_embeddings')
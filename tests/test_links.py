@@ -0,0 +1,144 @@
+"""Link enrichment against a local stub HTTP server."""
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from flask import Flask
+
+from app.config import Config
+from app.extensions import db
+from app.models import LinkMetadata, Resource, User
+from app.resources import links
+from app.resources.links import FetchError, LinkFetcher, enrich_links, fetcher
+
+
+PAGE = b"""<html><head>
+<title>Stub page</title>
+<meta name="description" content="Served by the test stub">
+<link rel="canonical" href="/canonical">
+</head><body>ignored</body></html>"""
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/moved":
+            self.send_response(302)
+            self.send_header("Location", "/page")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def make_app(**config) -> Flask:
+    app = Flask(__name__)
+    app.config.from_object(Config())
+    app.config.update(SQLALCHEMY_DATABASE_URI="sqlite://", **config)
+    db.init_app(app)
+    return app
+
+
+@pytest.fixture
+def app():
+    app = make_app(LINK_FETCH_ALLOW_PRIVATE=True)
+    fetcher.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email="links@example.com", name="links", password_hash="x"))
+        db.session.commit()
+        yield app
+        db.session.remove()
+    fetcher.init_app(make_app())
+
+
+def test_fetch_reads_head_metadata(stub_url):
+    local = LinkFetcher()
+    local.init_app(make_app(LINK_FETCH_ALLOW_PRIVATE=True))
+    result = local.fetch(f"{stub_url}/moved")
+    assert result["status_code"] == 200
+    assert result["title"] == "Stub page"
+    assert result["description"] == "Served by the test stub"
+    assert result["canonical_url"] == f"{stub_url}/canonical"
+    assert local.fetch(f"{stub_url}/page", etag=result["etag"]) == {
+        "status_code": 304, "etag": None, "last_modified": None,
+    }
+
+
+def test_private_addresses_are_refused(stub_url):
+    local = LinkFetcher()
+    local.init_app(make_app())
+    assert local.session.trust_env is False
+    with pytest.raises(FetchError, match="private address"):
+        local.fetch(f"{stub_url}/page")
+
+
+def test_address_is_checked_when_connecting(stub_url, monkeypatch):
+    # A name that resolved publicly during an earlier check now points at the stub
+    port = int(stub_url.rsplit(":", 1)[1])
+    real_getaddrinfo = socket.getaddrinfo
+
+    def rebinding(host, *args, **kwargs):
+        if host == "rebind.example.com":
+            return real_getaddrinfo("127.0.0.1", port, 0, socket.SOCK_STREAM)
+        return real_getaddrinfo(host, *args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", rebinding)
+    local = LinkFetcher()
+    local.init_app(make_app())
+    with pytest.raises(FetchError, match="private address"):
+        local.fetch(f"http://rebind.example.com:{port}/page")
+
+
+def test_enrich_links_caches_and_attaches_metadata(app, stub_url):
+    first = Resource(user_id=1, type="link", title="a", url=f"{stub_url}/page", category="c")
+    second = Resource(user_id=1, type="link", title="b", url=f"{stub_url}/page#section", category="c")
+    db.session.add_all([first, second])
+    db.session.commit()
+
+    assert enrich_links([first.id, second.id]) == 2
+    assert db.session.scalar(db.select(db.func.count()).select_from(LinkMetadata)) == 1
+    for resource in (first, second):
+        assert resource.metadata_json["link"]["title"] == "Stub page"
+
+
+def test_enrich_links_skips_resources_edited_during_fetch(app, stub_url, monkeypatch):
+    resource = Resource(user_id=1, type="link", title="a", url=f"{stub_url}/page", category="c",
+                        metadata_json={"note": "kept"})
+    db.session.add(resource)
+    db.session.commit()
+    resource_id = resource.id
+    fetch_many = fetcher.fetch_many
+
+    def edited_meanwhile(jobs):
+        results = fetch_many(jobs)
+        with db.engine.begin() as connection:
+            connection.execute(
+                db.update(Resource).where(Resource.id == resource_id)
+                .values(url=f"{stub_url}/other", metadata_json={"note": "edited"})
+            )
+        return results
+
+    monkeypatch.setattr(links.fetcher, "fetch_many", edited_meanwhile)
+    assert enrich_links([resource_id]) == 0
+    assert db.session.get(Resource, resource_id).metadata_json == {"note": "edited"}